@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark offline de los conversores de Spotify y YouTube
+
+Ejecuta los caminos reales de Spotify2MP3Converter.convert y YouTube2MP3Converter.convert
+contra los sustitutos locales de offline_fixtures y reporta:
+- Pistas por segundo
+- Latencia por etapa (media, p50, p95)
+- Pico de memoria residente (RSS) de cada lote
+
+Cada combinación plataforma/tamaño corre en un subproceso propio para que el pico
+de RSS sea el del lote y no el acumulado de los anteriores.
+
+Uso:
+    python benchmarks/bench_conversion.py                       # lotes de 1, 10 y 500
+    python benchmarks/bench_conversion.py --sizes 1 10 --platforms youtube
+    python benchmarks/bench_conversion.py --json resultados.json
+    python benchmarks/bench_conversion.py --baseline base.json  # exit 1 si hay regresión
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import contextlib
+import subprocess
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from offline_fixtures import FixtureCatalog, offline_environment
+
+DEFAULT_SIZES = [1, 10, 500]
+PLATFORMS = ["spotify", "youtube"]
+
+# Métodos de cada conversor que se miden como etapas
+STAGES = {
+    "spotify": {
+        "metadatos": ("get_track_info",),
+        "busqueda": ("search_on_youtube",),
+        "descarga+transcode": ("download_from_youtube",),
+        "huella": ("fingerprint_audio",),
+        "portada": ("download_album_art",),
+        "etiquetado": ("add_metadata_to_mp3",),
+        "confirmacion": ("_finalize_track",),
+    },
+    "youtube": {
+        "descarga": ("download_video",),
+        "transcode": ("convert_to_mp3",),
+        "huella": ("fingerprint_audio",),
+        "portada": ("download_thumbnail",),
+        "etiquetado": ("add_metadata_to_mp3",),
+        "confirmacion": ("_finalize_video",),
+    },
+}
+
+
+class StageTimer:
+    """Envuelve métodos de una instancia para acumular su latencia por etapa"""
+
+    def __init__(self):
+        self.samples = {}
+
+    def wrap(self, obj, method_name, stage):
+        original = getattr(obj, method_name)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.samples.setdefault(stage, []).append(time.perf_counter() - start)
+
+        setattr(obj, method_name, timed)
+
+    def summary(self):
+        result = {}
+        for stage, values in self.samples.items():
+            ordered = sorted(values)
+            result[stage] = {
+                'count': len(values),
+                'mean_ms': statistics.fmean(values) * 1000,
+                'p50_ms': ordered[len(ordered) // 2] * 1000,
+                'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+            }
+        return result
+
+
+def peak_rss_mb():
+    """Pico de RSS del proceso actual en MB (ru_maxrss está en KB en Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_batch(platform, size, duration):
+    """Ejecuta un lote dentro del proceso actual y devuelve sus métricas"""
+    catalog = FixtureCatalog(size, duration)
+
+    with offline_environment(catalog, duration=duration) as env:
+        # La salida por pista de los modelos no forma parte de lo que se mide en pantalla; el
+        # log de archivo sí (como en un lote real), dentro de la carpeta temporal
+        from model.logging_config import configure_logging, shutdown_logging
+        os.environ["EKHO_LOG_DIR"] = os.path.join(env.workdir, "logs")
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            configure_logging(stream=devnull)
+            if platform == "spotify":
+                from model.spotify2mp3_model import Spotify2MP3Converter
+                converter = Spotify2MP3Converter()
+                converter.start_download_session(is_batch=size > 1)
+                urls = [track['spotify_url'] for track in catalog.tracks]
+            else:
+                from model.youtube2mp3_model import YouTube2MP3Converter
+                converter = YouTube2MP3Converter()
+                urls = [track['youtube_url'] for track in catalog.tracks]
+
+            timer = StageTimer()
+            for stage, methods in STAGES[platform].items():
+                for method_name in methods:
+                    timer.wrap(converter, method_name, stage)
+
+            failures = []
+            start = time.perf_counter()
+            for url in urls:
+                try:
+                    converter.convert(url)
+                except Exception as e:
+                    failures.append({'url': url, 'error': str(e)})
+            elapsed = time.perf_counter() - start
+            shutdown_logging()
+
+    completed = size - len(failures)
+    return {
+        'platform': platform,
+        'size': size,
+        'completed': completed,
+        'failed': len(failures),
+        'errors': failures[:5],
+        'elapsed_s': elapsed,
+        'tracks_per_s': completed / elapsed if elapsed > 0 else 0.0,
+        'stages': timer.summary(),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def run_isolated(platform, size, duration):
+    """Lanza el lote en un subproceso para medir su pico de RSS de forma aislada"""
+    command = [sys.executable, os.path.abspath(__file__), "--single", platform, str(size),
+               "--duration", str(duration)]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Lote {platform}/{size} falló:\n{completed.stderr.strip()}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def print_report(results):
+    """Muestra una tabla legible con los resultados"""
+    print("\n" + "=" * 70)
+    print("  📊 BENCHMARK OFFLINE DE CONVERSORES")
+    print("=" * 70)
+    for result in results:
+        print(f"\n🎯 {result['platform']} x {result['size']} pistas")
+        print(f"   ✅ Completadas: {result['completed']}  ❌ Fallidas: {result['failed']}")
+        print(f"   ⏱️  Tiempo total: {result['elapsed_s']:.2f}s  "
+              f"🚀 {result['tracks_per_s']:.2f} pistas/s  "
+              f"💾 Pico RSS: {result['peak_rss_mb']:.1f} MB")
+        for stage, stats in result['stages'].items():
+            print(f"   • {stage:<20} media {stats['mean_ms']:8.1f} ms   "
+                  f"p50 {stats['p50_ms']:8.1f} ms   p95 {stats['p95_ms']:8.1f} ms")
+        for error in result['errors']:
+            print(f"   ⚠️ {error['url']}: {error['error']}")
+    print("\n" + "=" * 70)
+
+
+def compare_with_baseline(results, baseline_path, tolerance):
+    """Compara con un JSON previo; devuelve la lista de regresiones detectadas"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {(r['platform'], r['size']): r for r in json.load(f)}
+
+    regressions = []
+    for result in results:
+        previous = baseline.get((result['platform'], result['size']))
+        if not previous:
+            continue
+        key = f"{result['platform']}/{result['size']}"
+        if result['tracks_per_s'] < previous['tracks_per_s'] * (1 - tolerance):
+            regressions.append(f"{key}: pistas/s {previous['tracks_per_s']:.2f} -> {result['tracks_per_s']:.2f}")
+        if result['peak_rss_mb'] > previous['peak_rss_mb'] * (1 + tolerance):
+            regressions.append(f"{key}: RSS {previous['peak_rss_mb']:.1f} -> {result['peak_rss_mb']:.1f} MB")
+        if result['failed'] > previous['failed']:
+            regressions.append(f"{key}: fallos {previous['failed']} -> {result['failed']}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline de los conversores de Ekho")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="Tamaños de lote (por defecto: 1 10 500)")
+    parser.add_argument("--platforms", nargs="+", choices=PLATFORMS, default=PLATFORMS)
+    parser.add_argument("--duration", type=int, default=5,
+                        help="Duración en segundos del audio de prueba")
+    parser.add_argument("--json", dest="json_path", help="Guardar resultados en un archivo JSON")
+    parser.add_argument("--baseline", help="JSON de una ejecución previa para detectar regresiones")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Margen relativo permitido frente al baseline (0.2 = 20%%)")
+    parser.add_argument("--single", nargs=2, metavar=("PLATAFORMA", "TAMAÑO"),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.single:
+        result = run_batch(args.single[0], int(args.single[1]), args.duration)
+        print(json.dumps(result))
+        return 0
+
+    results = []
+    for platform in args.platforms:
+        for size in args.sizes:
+            print(f"⏳ Ejecutando {platform} x {size}...", flush=True)
+            results.append(run_isolated(platform, size, args.duration))
+
+    print_report(results)
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"💾 Resultados guardados en: {args.json_path}")
+
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.tolerance)
+        if regressions:
+            print("\n🚨 REGRESIONES DETECTADAS:")
+            for regression in regressions:
+                print(f"   ❌ {regression}")
+            return 1
+        print("\n✅ Sin regresiones frente al baseline")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark offline del modo distribuido (coordinador + varios procesos worker)
+
+Encola un catálogo sintético de pistas de Spotify en una base de datos compartida y lanza
+N procesos 'work' (cada uno con sus sustitutos locales de offline_fixtures) que las
+reclaman con lease. Para cada N reporta pistas por segundo y la eficiencia frente a un
+solo worker (1.0 = escalado lineal). Los workers arrancan a la vez cuando todos han
+preparado su entorno, para no medir la generación de fixtures.
+
+Uso:
+    python benchmarks/bench_distributed.py                        # 1, 2 y 4 workers, 40 pistas
+    python benchmarks/bench_distributed.py --workers 1 4 --tracks 80 --threads 2
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import datetime
+import tempfile
+import contextlib
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from offline_fixtures import FixtureCatalog, offline_environment
+
+DEFAULT_WORKERS = [1, 2, 4]
+
+
+def run_worker(db_path, tracks, threads, duration):
+    """Proceso worker: prepara el entorno offline, avisa y espera la señal de salida"""
+    from controller.distributed_controller import WorkerController
+
+    catalog = FixtureCatalog(tracks, duration)
+    with offline_environment(catalog, duration=duration):
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            controller = WorkerController(db_path=db_path, workers=threads, lease_seconds=30,
+                                          exit_when_idle=True)
+        print("ready", flush=True)
+        sys.stdin.readline()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            return controller.run()
+
+
+def run_round(workers, tracks, threads, duration):
+    """Encola el catálogo y lo convierte con `workers` procesos; devuelve sus métricas"""
+    from model.job_store import JobStore, JOB_DONE
+
+    workdir = tempfile.mkdtemp(prefix="ekho-dist-")
+    db_path = os.path.join(workdir, "jobs.db")
+    try:
+        store = JobStore(db_path)
+        catalog = FixtureCatalog(tracks, duration)
+        store.submit_many([(track['spotify_url'], None) for track in catalog.tracks])
+
+        command = [sys.executable, os.path.abspath(__file__), "--worker", db_path,
+                   "--tracks", str(tracks), "--threads", str(threads), "--duration", str(duration)]
+        processes = [subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                      stderr=subprocess.PIPE, text=True)
+                     for _ in range(workers)]
+        for process in processes:
+            if process.stdout.readline().strip() != "ready":
+                raise RuntimeError(f"Worker no arrancó:\n{process.stderr.read()}")
+
+        start = datetime.datetime.now()
+        for process in processes:
+            process.stdin.write("go\n")
+            process.stdin.flush()
+        for process in processes:
+            process.wait()
+
+        # Hasta la última pista terminada (sin contar el sondeo de salida de los workers)
+        jobs = store.list(limit=tracks)
+        done = store.counts().get(JOB_DONE, 0)
+        last = max(datetime.datetime.fromisoformat(job['finished_at']) for job in jobs if job['finished_at'])
+        elapsed = (last - start).total_seconds()
+        claimed_by = {}
+        for job in jobs:
+            process_name = (job['worker'] or "").rsplit(":", 1)[0]
+            claimed_by[process_name] = claimed_by.get(process_name, 0) + 1
+        store.close()
+        return {
+            'workers': workers,
+            'tracks': tracks,
+            'done': done,
+            'elapsed_s': elapsed,
+            'tracks_per_s': done / elapsed if elapsed > 0 else 0.0,
+            'per_worker': sorted(claimed_by.values(), reverse=True),
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline del modo distribuido de Ekho")
+    parser.add_argument("--workers", type=int, nargs="+", default=DEFAULT_WORKERS,
+                        help="Número de procesos worker a probar (por defecto: 1 2 4)")
+    parser.add_argument("--tracks", type=int, default=40, help="Pistas del catálogo")
+    parser.add_argument("--threads", type=int, default=1, help="Hilos de conversión por worker")
+    parser.add_argument("--duration", type=int, default=5,
+                        help="Duración en segundos del audio de prueba")
+    parser.add_argument("--json", dest="json_path", help="Guardar resultados en un archivo JSON")
+    parser.add_argument("--worker", metavar="DB", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        return run_worker(args.worker, args.tracks, args.threads, args.duration)
+
+    results = []
+    for workers in args.workers:
+        print(f"⏳ {workers} worker(s) x {args.threads} hilo(s), {args.tracks} pistas...", flush=True)
+        results.append(run_round(workers, args.tracks, args.threads, args.duration))
+
+    base = results[0]['tracks_per_s'] / results[0]['workers'] if results and results[0]['tracks_per_s'] else 0
+    print("\n" + "=" * 70)
+    print("  📊 BENCHMARK OFFLINE DEL MODO DISTRIBUIDO")
+    print("=" * 70)
+    for result in results:
+        efficiency = result['tracks_per_s'] / (base * result['workers']) if base else 0.0
+        print(f"⚙️  {result['workers']} worker(s): {result['done']}/{result['tracks']} pistas en "
+              f"{result['elapsed_s']:.2f}s  🚀 {result['tracks_per_s']:.2f} pistas/s  "
+              f"eficiencia {efficiency:.2f}  reparto {result['per_worker']}")
+    print(f"\n🖥️  Núcleos disponibles: {os.cpu_count()} (la transcodificación limita el escalado "
+          f"por encima de ese número de workers)")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Resultados guardados en: {args.json_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
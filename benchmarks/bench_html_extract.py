@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark de la extracción de metadatos de páginas de Spotify
+
+Carga las páginas guardadas en benchmarks/fixtures (página de pista y página embed),
+las rellena con scripts/estilos de relleno hasta un tamaño realista y mide el tiempo de
+CPU por consulta de:
+
+- legacy: un re.search por patrón sobre la página completa, como hacían antes los
+  métodos alternativos (patrones recompilados/buscados uno a uno, JSON recorrido entero)
+- scan:   html_metadata.scan_html, una pasada por zonas con patrones precompilados, parada
+  temprana y sin mirar más allá de MAX_HTML_BYTES
+
+Uso:
+    python benchmarks/bench_html_extract.py
+    python benchmarks/bench_html_extract.py --body-kb 1024 --iterations 500
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), "src"))
+from model.html_metadata import (EMBED_FIELDS, EMBED_META_FIELDS, MAIN_PAGE_FIELDS, MAX_HTML_BYTES,
+                                 pick_album, pick_image, scan_html)
+
+FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures")
+PAGES = {
+    "main_page": "spotify_track_page.html",
+    "main_sin_json": "spotify_track_page.html",
+    "embed": "spotify_embed_page.html",
+}
+# Las páginas reales no siempre traen el JSON con el álbum en claro: variante sin él
+_STATE_SCRIPT = re.compile(r'<script id="initial-state".*?</script>', re.DOTALL)
+
+_FILLER_SCRIPT = ('<script>!function(e){var t={};function n(r){if(t[r])return t[r].exports;'
+                  'var o=t[r]={i:r,l:!1,exports:{}};return e[r].call(o.exports,o,o.exports,n),'
+                  'o.l=!0,o.exports}n.m=e,n.c=t}([function(e,t){"use strict";e.exports='
+                  '{"featureFlags":{"enabled":true,"variant":"control"}}}]);</script>\n')
+_FILLER_STYLE = '<style>.encore-text{font-family:var(--font-family),sans-serif;color:#fff}</style>\n'
+
+
+def load_page(name, head_kb, body_kb):
+    """Página guardada con relleno en <head> (estilos) y al final de <body> (scripts)"""
+    with open(os.path.join(FIXTURES_DIR, PAGES[name]), "r", encoding="utf-8") as f:
+        html = f.read()
+    if name == "main_sin_json":
+        html = _STATE_SCRIPT.sub('', html)
+    head = _FILLER_STYLE * (head_kb * 1024 // len(_FILLER_STYLE))
+    body = _FILLER_SCRIPT * (body_kb * 1024 // len(_FILLER_SCRIPT))
+    return html.replace("<!--PADDING-->", head).replace("<!--BODY_PADDING-->", body)
+
+
+# --- Extracción anterior (referencia: misma lógica que tenían los métodos alternativos) ---
+
+def _legacy_album(html):
+    for pattern in [r'"album"[^}]*?"name"\s*:\s*"([^"]+)"', r'"albumName"\s*:\s*"([^"]+)"',
+                    r'data-testid="album"[^>]*>([^<]+)<', r'album.*?name.*?"([^"]+)"',
+                    r'<meta\s+property="music:album"\s+content="([^"]+)"', r'"collection_name"\s*:\s*"([^"]+)"']:
+        match = re.search(pattern, html, re.IGNORECASE | re.DOTALL)
+        if match:
+            album = match.group(1).strip()
+            if album and not album.isdigit() and len(album) > 1 and \
+                    album.lower() not in ['track', 'single', 'music:album:track']:
+                return album
+    return 'Unknown Album'
+
+
+def _legacy_image(html):
+    for pattern in [r'<meta\s+property="og:image"\s+content="([^"]+)"', r'"image"[^}]*?"url"\s*:\s*"([^"]+)"',
+                    r'"cover"[^}]*?"url"\s*:\s*"([^"]+)"']:
+        match = re.search(pattern, html, re.IGNORECASE)
+        if match:
+            return match.group(1)
+    return ''
+
+
+def legacy_main_page(html):
+    title_match = re.search(r'<title>([^<]+)</title>', html, re.IGNORECASE)
+    if title_match:
+        page_title = re.sub(r'\s*\|\s*Spotify.*$', '', title_match.group(1).strip())
+        for pattern in [r'^(.+?)\s*-\s*song\s+(?:and\s+lyrics\s+)?by\s+(.+?)$',
+                        r'^(.+?)\s*-\s*song\s+(?:and\s+lyrics\s+)?(?:by\s+)?(.+?)$',
+                        r'^(.+?)\s+by\s+(.+?)$', r'^(.+?)\s*·\s*(.+?)$', r'^(.+?)\s*-\s*(.+?)$']:
+            match = re.search(pattern, page_title, re.IGNORECASE)
+            if match:
+                return {'name': match.group(1).strip(), 'artist': match.group(2).strip(),
+                        'album': _legacy_album(html), 'image_url': _legacy_image(html)}
+    return None
+
+
+def _legacy_json_track(data, depth=0):
+    if depth > 8:
+        return None
+    if isinstance(data, dict):
+        if 'name' in data and ('artist' in data or 'artists' in data):
+            return {'name': data['name']}
+        for key, value in data.items():
+            if key in ['track', 'item', 'entity', 'data']:
+                result = _legacy_json_track(value, depth + 1)
+                if result:
+                    return result
+    elif isinstance(data, list) and data:
+        for item in data[:3]:
+            result = _legacy_json_track(item, depth + 1)
+            if result:
+                return result
+    return None
+
+
+def legacy_embed(html):
+    for match in re.finditer(r'<script[^>]*type=["\']application/json["\'][^>]*>([^<]+)</script>', html, re.DOTALL):
+        try:
+            track = _legacy_json_track(json.loads(match.group(1)))
+        except json.JSONDecodeError:
+            continue
+        if track:
+            return track
+    extracted = {}
+    for key, pattern in {'title': r'<title>([^<]+)</title>',
+                         'og_title': r'<meta property="og:title" content="([^"]*)"',
+                         'og_image': r'<meta property="og:image" content="([^"]*)"'}.items():
+        match = re.search(pattern, html, re.IGNORECASE)
+        if match:
+            extracted[key] = match.group(1).strip()
+    title = extracted.get('og_title', '') or extracted.get('title', '')
+    return {'name': title, 'image_url': extracted.get('og_image', '')} if title else None
+
+
+# --- Extracción actual ---
+
+def scan_main_page(html):
+    fields = scan_html(html, MAIN_PAGE_FIELDS)
+    return {'title': fields.get('title'), 'album': pick_album(fields), 'image_url': pick_image(fields)}
+
+
+def scan_embed(html):
+    track = scan_html(html, EMBED_FIELDS).get('json_track')
+    if track:
+        return track
+    fields = scan_html(html, EMBED_META_FIELDS)
+    return {'name': fields.get('og:title') or fields.get('title'), 'image_url': fields.get('og:image')}
+
+
+def _cpu_per_call(func, html, iterations):
+    start = time.process_time()
+    for _ in range(iterations):
+        func(html)
+    return (time.process_time() - start) / iterations
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmark de extracción de metadatos HTML")
+    parser.add_argument("--head-kb", type=int, default=32, help="Relleno en <head> (por defecto: 32 KB)")
+    parser.add_argument("--body-kb", type=int, default=600, help="Relleno al final de <body> (por defecto: 600 KB)")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    cases = {
+        "main_page": (legacy_main_page, scan_main_page),
+        "main_sin_json": (legacy_main_page, scan_main_page),
+        "embed": (legacy_embed, scan_embed),
+    }
+    print(f"📄 Relleno: head {args.head_kb} KB, body {args.body_kb} KB  "
+          f"✂️ Límite de lectura: {MAX_HTML_BYTES // 1024} KB  🔁 {args.iterations} iteraciones")
+    print(f"{'página':<15}{'tamaño':>10}{'legacy':>14}{'scan':>14}{'mejora':>10}")
+    for name, (legacy, scan) in cases.items():
+        html = load_page(name, args.head_kb, args.body_kb)
+        print(f"   legacy: {legacy(html)}\n   scan:   {scan(html)}", file=sys.stderr)
+        legacy_s = _cpu_per_call(legacy, html, args.iterations)
+        scan_s = _cpu_per_call(scan, html, args.iterations)
+        print(f"{name:<15}{len(html) // 1024:>8} KB{legacy_s * 1e6:>11.1f} µs{scan_s * 1e6:>11.1f} µs"
+              f"{legacy_s / scan_s:>9.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
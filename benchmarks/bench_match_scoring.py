@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark offline de la elección del vídeo de YouTube para cada pista de Spotify
+
+Usa los resultados de búsqueda guardados en benchmarks/fixtures/youtube_search_results.json
+(5 candidatos por pista con el correcto marcado) y compara:
+
+- legacy: la puntuación anterior (subcadenas del título, palabras clave fijas, sin duración)
+- scorer: model.match_scorer (tokens normalizados, duración de Spotify, canal oficial, ISRC)
+
+Mide el acierto (vídeo elegido == vídeo correcto) y la latencia: pista a pista frente a
+un único score_batch con todas las pistas de un lote.
+
+Uso:
+    python benchmarks/bench_match_scoring.py
+    python benchmarks/bench_match_scoring.py --batch 5000 --verbose
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), "src"))
+from model.match_scorer import best_matches, select_best
+
+RESULTS_FILE = os.path.join(BENCH_DIR, "fixtures", "youtube_search_results.json")
+
+
+def legacy_select(entries, track_name, artist_name):
+    """Misma puntuación que usaba _select_best_youtube_result antes del scorer"""
+    scored = []
+    for index, entry in enumerate(entries):
+        title = entry.get('title', '').lower()
+        uploader = entry.get('uploader', '').lower()
+        duration = entry.get('duration', 0)
+        score = 0
+        if duration:
+            if 30 <= duration <= 600:
+                score += 10
+            elif duration > 600:
+                score -= 5
+        if track_name and track_name.lower() in title:
+            score += 15
+        if artist_name and artist_name.lower() in title:
+            score += 15
+        for keyword in ['official', 'music', 'records', 'entertainment']:
+            if keyword in uploader:
+                score += 5
+                break
+        for keyword in ['cover', 'remix', 'live', 'concert', 'karaoke', 'instrumental']:
+            if keyword in title:
+                score -= 3
+        scored.append((score, index))
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return scored[0][1]
+
+
+def _timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de selección de resultados de YouTube")
+    parser.add_argument("--batch", type=int, default=1000,
+                        help="Pistas por lote para medir latencia (se repiten los casos guardados)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--verbose", action="store_true", help="Mostrar la elección de cada caso")
+    args = parser.parse_args(argv)
+
+    with open(RESULTS_FILE, "r", encoding="utf-8") as f:
+        cases = json.load(f)['cases']
+
+    # Acierto
+    legacy_ok = scorer_ok = 0
+    for case in cases:
+        track, candidates, expected = case['track'], case['candidates'], case['expected']
+        legacy_choice = legacy_select(candidates, track['name'], track['artist'])
+        entry, score = select_best(track, candidates)
+        scorer_choice = candidates.index(entry)
+        legacy_ok += legacy_choice == expected
+        scorer_ok += scorer_choice == expected
+        if args.verbose:
+            mark = lambda choice: "✅" if choice == expected else "❌"
+            print(f"{track['artist']} - {track['name']}\n"
+                  f"   legacy {mark(legacy_choice)} {candidates[legacy_choice]['title']}\n"
+                  f"   scorer {mark(scorer_choice)} {candidates[scorer_choice]['title']} ({score:.2f})")
+
+    total = len(cases)
+    print(f"🎯 Acierto en {total} búsquedas guardadas: legacy {legacy_ok}/{total} "
+          f"({legacy_ok / total:.0%})  scorer {scorer_ok}/{total} ({scorer_ok / total:.0%})")
+
+    # Latencia
+    batch = [cases[i % total] for i in range(args.batch)]
+    tracks = [case['track'] for case in batch]
+    candidate_lists = [case['candidates'] for case in batch]
+
+    legacy_s = _timed(lambda: [legacy_select(c['candidates'], c['track']['name'], c['track']['artist'])
+                               for c in batch], args.repeat)
+    per_track_s = _timed(lambda: [select_best(c['track'], c['candidates']) for c in batch], args.repeat)
+    batch_s = _timed(lambda: best_matches(tracks, candidate_lists), args.repeat)
+
+    print(f"⏱️ Lote de {args.batch} pistas x 5 candidatos:")
+    print(f"   • legacy                 {legacy_s * 1e3:9.1f} ms  ({legacy_s / args.batch * 1e6:7.1f} µs/pista)")
+    print(f"   • scorer pista a pista   {per_track_s * 1e3:9.1f} ms  ({per_track_s / args.batch * 1e6:7.1f} µs/pista)")
+    print(f"   • scorer en lote         {batch_s * 1e3:9.1f} ms  ({batch_s / args.batch * 1e6:7.1f} µs/pista)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
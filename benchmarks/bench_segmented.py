@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de la descarga segmentada frente a la descarga en una sola conexión
+
+Sirve un archivo grande desde el servidor local de offline_fixtures con un límite de
+velocidad por conexión (como el throttling de YouTube por stream) y mide cuánto tarda
+download_manager.resumable_download con 1, 2, 4 y 8 conexiones.
+
+Uso:
+    python benchmarks/bench_segmented.py
+    python benchmarks/bench_segmented.py --size-mb 32 --throttle-kbps 4096 --connections 1 4 16
+"""
+
+import os
+import sys
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from offline_fixtures import FixtureCatalog, LocalFixtureServer
+
+
+def _sha1(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de descarga segmentada")
+    parser.add_argument("--size-mb", type=int, default=16, help="Tamaño del archivo (por defecto: 16 MB)")
+    parser.add_argument("--throttle-kbps", type=int, default=2048,
+                        help="Límite por conexión en KB/s (por defecto: 2048)")
+    parser.add_argument("--connections", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="ekho-segmented-")
+    os.environ["EKHO_DATA_DIR"] = os.path.join(workdir, "data")
+    from model import download_manager
+
+    fixtures_dir = os.path.join(workdir, "fixtures")
+    os.makedirs(fixtures_dir)
+    source = os.path.join(fixtures_dir, "large.bin")
+    with open(source, "wb") as f:
+        f.write(os.urandom(args.size_mb * 1024 * 1024))
+    size = os.path.getsize(source)
+    expected_hash = _sha1(source)
+
+    print(f"📦 Archivo: {args.size_mb} MB  🐢 Límite por conexión: {args.throttle_kbps} KB/s")
+    download_manager.configure_connections(global_limit=max(args.connections))
+    baseline = None
+    try:
+        with LocalFixtureServer(FixtureCatalog(0), fixtures_dir,
+                                throttle_bps=args.throttle_kbps * 1024) as server:
+            url = f"{server.base_url}/audio/large.bin"
+            for connections in args.connections:
+                dest = os.path.join(workdir, f"out_{connections}.bin")
+                started = time.perf_counter()
+                download_manager.resumable_download(url, dest, expected_size=size,
+                                                    temp_dir=os.path.join(workdir, "tmp"),
+                                                    connections=connections)
+                elapsed = time.perf_counter() - started
+                baseline = baseline or elapsed
+                ok = "✅" if _sha1(dest) == expected_hash else "❌ contenido distinto"
+                print(f"   {connections:>2} conexión(es): {elapsed:6.2f}s  "
+                      f"{size / elapsed / 1024 / 1024:6.1f} MB/s  x{baseline / elapsed:4.1f}  {ok}")
+                os.remove(dest)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,469 @@
+# offline_fixtures.py
+"""
+Sustitutos locales de YouTube, Spotify y servidores de portadas para benchmarks offline
+
+Permite ejecutar el código real de Spotify2MP3Converter y YouTube2MP3Converter sin red:
+- Canciones de spotdl precocinadas (FakeSpotdl)
+- Extractores de yt-dlp que sirven audio local (OfflineSearchIE / OfflineVideoIE)
+- Sustituto de pytubefix.YouTube que descarga del servidor local
+- Servidor HTTP local para audio, portadas y oEmbed (con soporte de Range)
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+import contextlib
+import subprocess
+import urllib.parse
+import urllib.request
+from types import SimpleNamespace
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Añadir src al path para importar los modelos reales
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC_DIR = os.path.join(PROJECT_ROOT, "src")
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+# Variantes que devuelve la búsqueda además del resultado correcto (para que la selección trabaje)
+DECOY_SUFFIXES = [" (Live)", " (Cover)", " - Karaoke Version", " (Slowed + Reverb)"]
+
+# Multiplicador de los ritmos del limitador de peticiones en el entorno offline
+OFFLINE_RATE_LIMIT_SCALE = 1000.0
+
+
+def find_ffmpeg():
+    """Localiza un binario de FFmpeg (PATH o el incluido con imageio-ffmpeg)"""
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg:
+        return ffmpeg
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return None
+
+
+def ensure_ffmpeg_on_path(workdir):
+    """Garantiza que 'ffmpeg' esté en el PATH (yt-dlp lo busca por nombre)"""
+    if shutil.which("ffmpeg"):
+        return shutil.which("ffmpeg")
+
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        raise RuntimeError("FFmpeg es requerido para los benchmarks (pip install imageio-ffmpeg)")
+
+    bin_dir = os.path.join(workdir, "bin")
+    os.makedirs(bin_dir, exist_ok=True)
+    link = os.path.join(bin_dir, "ffmpeg")
+    if not os.path.exists(link):
+        os.symlink(ffmpeg, link)
+    os.environ["PATH"] = bin_dir + os.pathsep + os.environ.get("PATH", "")
+    return link
+
+
+def generate_audio_fixtures(fixtures_dir, duration=5):
+    """Genera los archivos de audio y la portada que sirve el servidor local"""
+    os.makedirs(fixtures_dir, exist_ok=True)
+    ffmpeg = find_ffmpeg()
+    outputs = {
+        "source.m4a": ["-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}",
+                       "-c:a", "aac", "-b:a", "128k"],
+        "source.webm": ["-f", "lavfi", "-i", f"sine=frequency=660:duration={duration}",
+                        "-c:a", "libopus", "-b:a", "128k"],
+        "cover.jpg": ["-f", "lavfi", "-i", "color=c=navy:s=300x300", "-frames:v", "1"],
+    }
+
+    for filename, args in outputs.items():
+        path = os.path.join(fixtures_dir, filename)
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            continue
+        subprocess.run([ffmpeg, "-hide_banner", "-loglevel", "error", "-y", *args, path],
+                       check=True)
+    return fixtures_dir
+
+
+class FixtureCatalog:
+    """Catálogo sintético compartido por los sustitutos de Spotify y YouTube"""
+
+    def __init__(self, size, duration=5):
+        self.size = size
+        self.duration = duration
+        self.tracks = [self._make_track(i) for i in range(size)]
+        # Playlist con todo el catálogo (resolución en bloque de colecciones)
+        self.playlist_id = "benchplaylist000000000"
+        self.playlist_url = f"https://open.spotify.com/playlist/{self.playlist_id}"
+        self.by_spotify_id = {t['spotify_id']: t for t in self.tracks}
+        self.by_video_id = {}
+        for track in self.tracks:
+            for video in track['videos']:
+                self.by_video_id[video['id']] = video
+
+    def _make_track(self, index):
+        spotify_id = f"bench{index:017d}"
+        title = f"Song {index:05d}"
+        artist = f"Artist {index % 50:02d}"
+        videos = [{
+            'id': f"v{index:06d}x0",
+            'title': f"{artist} - {title} (Official Audio)",
+            'uploader': f"{artist} - Topic",
+            'duration': self.duration,
+            'audio': "source.m4a",
+        }]
+        for n, suffix in enumerate(DECOY_SUFFIXES, 1):
+            videos.append({
+                'id': f"v{index:06d}x{n}",
+                'title': f"{title}{suffix}",
+                'uploader': f"Channel {n}",
+                'duration': self.duration * (n + 1),
+                'audio': "source.webm",
+            })
+        return {
+            'spotify_id': spotify_id,
+            'spotify_url': f"https://open.spotify.com/track/{spotify_id}",
+            'youtube_url': f"https://www.youtube.com/watch?v={videos[0]['id']}",
+            'title': title,
+            'artist': artist,
+            'album': f"Album {index // 10:04d}",
+            'videos': videos,
+        }
+
+    def search(self, query, limit=5):
+        """Devuelve candidatos para una consulta (el correcto primero si se reconoce)"""
+        for track in self.tracks:
+            if track['title'] in query:
+                return track['videos'][:limit]
+        return self.tracks[0]['videos'][:limit] if self.tracks else []
+
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    """Handler del servidor local: /audio, /covers, /oembed y /api"""
+
+    server_version = "EkhoFixtures/1.0"
+
+    def log_message(self, format, *args):
+        # Silenciar el log por petición (distorsiona el benchmark)
+        pass
+
+    def do_GET(self):
+        parsed = urllib.parse.urlparse(self.path)
+        query = urllib.parse.parse_qs(parsed.query)
+        catalog = self.server.catalog
+        parts = parsed.path.strip("/").split("/")
+
+        if parts[0] == "audio" and len(parts) == 2:
+            return self._send_file(os.path.join(self.server.fixtures_dir, parts[1]), "audio/mp4")
+        if parts[0] == "covers":
+            return self._send_file(os.path.join(self.server.fixtures_dir, "cover.jpg"), "image/jpeg")
+        if parts[0] == "oembed":
+            track_id = query.get('url', [''])[0].rstrip("/").split("/")[-1]
+            track = catalog.by_spotify_id.get(track_id)
+            if not track:
+                return self._send_json({'error': 'not found'}, status=404)
+            return self._send_json({
+                'title': f"{track['title']} by {track['artist']}",
+                'thumbnail_url': f"{self.server.base_url}/covers/{track_id}.jpg",
+                'provider_name': 'Spotify',
+            })
+        if parts[:2] == ["api", "search"]:
+            limit = int(query.get('n', ['5'])[0])
+            return self._send_json(catalog.search(query.get('q', [''])[0], limit))
+        if parts[:2] == ["api", "video"] and len(parts) == 3:
+            video = catalog.by_video_id.get(parts[2])
+            if not video:
+                return self._send_json({'error': 'not found'}, status=404)
+            return self._send_json(video)
+
+        self._send_json({'error': 'not found'}, status=404)
+
+    do_HEAD = do_GET
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _send_file(self, path, content_type):
+        if not os.path.exists(path):
+            return self._send_json({'error': 'not found'}, status=404)
+
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        range_header = self.headers.get("Range")
+        if range_header and range_header.startswith("bytes="):
+            first, _, last = range_header[6:].partition("-")
+            start = int(first) if first else max(0, size - int(last))
+            end = min(int(last), size - 1) if first and last else end
+            if start >= size:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+
+        self.send_header("Content-Type", content_type)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        if self.command == "HEAD":
+            return
+        with open(path, "rb") as f:
+            f.seek(start)
+            throttle = self.server.throttle_bps
+            if not throttle:
+                self.wfile.write(f.read(end - start + 1))
+                return
+            # Límite de velocidad por conexión (como el que aplica YouTube a cada stream)
+            remaining = end - start + 1
+            chunk_size = max(1024, throttle // 20)
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+                time.sleep(len(chunk) / throttle)
+
+
+class LocalFixtureServer:
+    """Servidor HTTP local en un hilo de fondo (puerto efímero)"""
+
+    def __init__(self, catalog, fixtures_dir, throttle_bps=None):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _FixtureHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.throttle_bps = throttle_bps
+        self.httpd.catalog = catalog
+        self.httpd.fixtures_dir = fixtures_dir
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.httpd.base_url = self.base_url
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _fetch_json(url):
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+
+class FakeSpotdl:
+    """Sustituto de spotdl.Spotdl que devuelve canciones precocinadas del catálogo"""
+
+    catalog = None
+    base_url = ""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def search(self, queries):
+        songs = []
+        for query in queries:
+            item_id = query.split("?")[0].rstrip("/").split("/")[-1].split(":")[-1]
+            if item_id == self.catalog.playlist_id:
+                songs.extend(self.make_song(track) for track in self.catalog.tracks)
+                continue
+            track = self.catalog.by_spotify_id.get(item_id)
+            if track:
+                songs.append(self.make_song(track))
+        return songs
+
+    @classmethod
+    def make_song(cls, track):
+        return SimpleNamespace(
+            name=track['title'],
+            artists=[track['artist']],
+            cover_url=f"{cls.base_url}/covers/{track['spotify_id']}.jpg",
+            album_name=track['album'],
+            duration=cls.catalog.duration,
+            genres=["benchmark"],
+            isrc=f"BENCH{track['spotify_id'][-7:]}",
+            date="2024-01-01",
+            lyrics="",
+            url=track['spotify_url'],
+        )
+
+
+class _FakeStream:
+    """Stream de audio de pytubefix servido por el servidor local"""
+
+    def __init__(self, video, base_url):
+        ext = os.path.splitext(video['audio'])[1]
+        self.mime_type = "audio/mp4" if ext == ".m4a" else "audio/webm"
+        self.abr = "128kbps"
+        self.url = f"{base_url}/audio/{video['audio']}"
+        self.default_filename = f"{video['title']}{ext}"
+        self.title = video['title']
+
+    def download(self, output_path=None, filename=None, **kwargs):
+        target = os.path.join(output_path or ".", filename or self.default_filename)
+        with urllib.request.urlopen(self.url, timeout=30) as response, open(target, "wb") as f:
+            shutil.copyfileobj(response, f)
+        return target
+
+
+class _FakeStreamQuery(list):
+    """Imita StreamQuery de pytubefix (filter / order_by / desc / first)"""
+
+    def filter(self, **kwargs):
+        return self
+
+    def order_by(self, attribute):
+        return self
+
+    def desc(self):
+        return self
+
+    def first(self):
+        return self[0] if self else None
+
+
+class FakePyTube:
+    """Sustituto de pytubefix.YouTube que resuelve el video contra el servidor local"""
+
+    base_url = ""
+
+    def __init__(self, url, *args, **kwargs):
+        video_id = urllib.parse.parse_qs(urllib.parse.urlparse(url).query).get('v', [''])[0]
+        video = _fetch_json(f"{self.base_url}/api/video/{video_id}")
+        self.video_id = video_id
+        self.title = video['title']
+        self.author = video['uploader']
+        self.length = video['duration']
+        self.thumbnail_url = f"{self.base_url}/covers/{video_id}.jpg"
+        self.streams = _FakeStreamQuery([_FakeStream(video, self.base_url)])
+
+
+def build_offline_ytdl_class(base_url):
+    """Crea una subclase de YoutubeDL que solo conoce los extractores locales"""
+    import yt_dlp
+    from yt_dlp.extractor.common import InfoExtractor
+
+    class OfflineSearchIE(InfoExtractor):
+        IE_NAME = "offline:search"
+        _VALID_URL = r'(?:ytsearch(?P<n>\d*):)?(?P<query>(?!https?://)[\s\S]+)'
+
+        def _real_extract(self, url):
+            match = self._match_valid_url(url)
+            # Sin prefijo explícito se respeta default_search (p.ej. 'ytsearch5:')
+            default = re.match(r'ytsearch(\d+):', self.get_param('default_search') or '')
+            limit = int(match.group('n') or (default.group(1) if default else 1))
+            query = match.group('query')
+            results = self._download_json(
+                f"{base_url}/api/search?{urllib.parse.urlencode({'q': query, 'n': limit})}",
+                query, note=False)
+            # Como en YouTube, la página de resultados ya trae canal y duración de cada vídeo
+            entries = [self.url_result(f"{base_url}/watch?v={video['id']}", OfflineVideoIE.ie_key(),
+                                       video['id'], video['title'], uploader=video['uploader'],
+                                       duration=video['duration'])
+                       for video in results]
+            return self.playlist_result(entries, query, query)
+
+    class OfflineVideoIE(InfoExtractor):
+        IE_NAME = "offline:video"
+        _VALID_URL = r'https?://127\.0\.0\.1:\d+/watch\?v=(?P<id>[\w-]+)'
+
+        def _real_extract(self, url):
+            video_id = self._match_id(url)
+            video = self._download_json(f"{base_url}/api/video/{video_id}", video_id, note=False)
+            ext = os.path.splitext(video['audio'])[1].lstrip(".")
+            return {
+                'id': video_id,
+                'title': video['title'],
+                'uploader': video['uploader'],
+                'duration': video['duration'],
+                'webpage_url': url,
+                'thumbnail': f"{base_url}/covers/{video_id}.jpg",
+                'formats': [{
+                    'format_id': 'audio',
+                    'url': f"{base_url}/audio/{video['audio']}",
+                    'ext': ext,
+                    'acodec': 'aac' if ext == 'm4a' else 'opus',
+                    'vcodec': 'none',
+                    'abr': 128,
+                }],
+            }
+
+    class OfflineYoutubeDL(yt_dlp.YoutubeDL):
+        def add_default_info_extractors(self):
+            self.add_info_extractor(OfflineVideoIE())
+            self.add_info_extractor(OfflineSearchIE())
+
+    return OfflineYoutubeDL
+
+
+@contextlib.contextmanager
+def offline_environment(catalog, workdir=None, duration=5):
+    """Activa los sustitutos locales y redirige data/ a una carpeta temporal.
+
+    Todo lo que se parchea se restaura al salir, de modo que los modelos reales
+    quedan intactos para el resto del proceso.
+    """
+    own_workdir = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix="ekho-bench-")
+    fixtures_dir = generate_audio_fixtures(os.path.join(workdir, "fixtures"), duration)
+    ensure_ffmpeg_on_path(workdir)
+
+    # Datos y logs en la carpeta temporal (el log no debe acabar en logs/ del repositorio)
+    environment = {"EKHO_DATA_DIR": os.path.join(workdir, "data"),
+                   "EKHO_LOG_DIR": os.path.join(workdir, "logs")}
+    previous_environment = {name: os.environ.get(name) for name in environment}
+    os.environ.update(environment)
+
+    import yt_dlp
+    from model import spotify2mp3_model, youtube2mp3_model, rate_limiter, metadata_cache
+
+    patches = [
+        (yt_dlp, "YoutubeDL"),
+        (spotify2mp3_model, "Spotdl"),
+        (spotify2mp3_model, "SPOTDL_API_MODE"),
+        (spotify2mp3_model, "get_config"),
+        (youtube2mp3_model, "YouTube"),
+        (rate_limiter, "_limiter"),
+        (metadata_cache, "_cache"),
+    ]
+    originals = [(module, name, getattr(module, name, None)) for module, name in patches]
+
+    with LocalFixtureServer(catalog, fixtures_dir) as server:
+        FakeSpotdl.catalog = catalog
+        FakeSpotdl.base_url = server.base_url
+        FakePyTube.base_url = server.base_url
+
+        yt_dlp.YoutubeDL = build_offline_ytdl_class(server.base_url)
+        spotify2mp3_model.Spotdl = FakeSpotdl
+        spotify2mp3_model.SPOTDL_API_MODE = "legacy_spotdl_class"
+        spotify2mp3_model.get_config = lambda: {}
+        youtube2mp3_model.YouTube = FakePyTube
+        # El limitador sigue activo (se mide su coste) pero con ritmos que el servidor local no nota
+        rate_limiter._limiter = rate_limiter.RateLimiter(scale=OFFLINE_RATE_LIMIT_SCALE)
+        # Caché de metadatos vacía dentro de la carpeta temporal (cada lote parte en frío)
+        metadata_cache._cache = None
+        try:
+            yield SimpleNamespace(workdir=workdir, server=server, catalog=catalog)
+        finally:
+            for module, name, value in originals:
+                setattr(module, name, value)
+            for name, value in previous_environment.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+            if own_workdir:
+                shutil.rmtree(workdir, ignore_errors=True)
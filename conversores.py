@@ -21,7 +21,7 @@ def main():
         if not os.path.exists(run_conversores_path):
             print("❌ Error: No se encontró el archivo src/run_conversores.py")
             print(f"   Ruta buscada: {run_conversores_path}")
-            return False
+            return 1
         
         # Añadir src al path y ejecutar run_conversores
         src_dir = os.path.join(current_dir, "src")
@@ -29,20 +29,18 @@ def main():
         
         # Importar y ejecutar el módulo principal
         import run_conversores
-        run_conversores.main()  # Llamar explícitamente a la función main()
-        
-        return True
+        return run_conversores.main()  # Menú interactivo o subcomando (batch, ...)
         
     except ImportError as e:
         print(f"❌ Error de importación: {e}")
         print("\n🔧 SOLUCIONES:")
         print("1. Verificar que src/run_conversores.py existe")
         print("2. Instalar dependencias: pip install -r requirements.txt")
-        return False
+        return 1
         
     except Exception as e:
         print(f"❌ Error inesperado: {e}")
-        return False
+        return 1
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
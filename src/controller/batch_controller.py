@@ -0,0 +1,151 @@
+# batch_controller.py
+"""Controlador del modo por lotes sin interacción (lectura de URLs desde archivos o stdin)"""
+
+import os
+import sys
+import json
+import contextlib
+from typing import List, Optional
+
+# Añadir la carpeta src al path para importaciones absolutas
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+from model.batch_model import BatchConverter, read_urls, STATUS_OK
+from model.job_store import JobStore
+from model.download_manager import configure_connections
+from model.metadata_cache import get_metadata_cache
+from model.logging_config import configure_logging
+from model.output_profiles import PROFILES
+from model.scratch_space import clean_orphaned_temp
+from view.progress_view import BatchProgressView
+
+# Códigos de salida del modo por lotes
+EXIT_OK = 0
+EXIT_PARTIAL_FAILURE = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+
+class BatchController:
+    """Controlador headless: sin menús ni preguntas, resultados legibles por máquina"""
+
+    def __init__(self, jobs: int = 4, output_format: str = "jsonl",
+                 output_path: Optional[str] = None, quiet: bool = False,
+                 resume: bool = True, db_path: Optional[str] = None,
+                 progress: Optional[bool] = None, verbose: bool = False,
+                 profile: Optional[str] = None):
+        checkpoints = JobStore(db_path) if resume else None
+        self.model = BatchConverter(jobs=jobs, checkpoints=checkpoints, profile=profile)
+        self.output_format = output_format
+        self.output_path = output_path
+        # Línea de progreso (pistas, ritmo, ETA) en lugar del detalle de cada conversor;
+        # por defecto solo si stderr es una terminal
+        self.progress = sys.stderr.isatty() if progress is None else progress
+        self.quiet = quiet or self.progress
+        # Nivel de los mensajes de los conversores en stderr (logs/ekho.log guarda el detalle)
+        if verbose:
+            self.log_level = "DEBUG"
+        elif self.quiet:
+            self.log_level = "WARNING"
+        else:
+            self.log_level = None
+
+    @staticmethod
+    def add_arguments(parser) -> None:
+        """Registra los argumentos del subcomando 'batch'"""
+        parser.add_argument("sources", nargs="*", default=["-"],
+                            help="Archivos con una URL por línea ('-' = stdin, por defecto)")
+        parser.add_argument("-j", "--jobs", type=int, default=4,
+                            help="Conversiones en paralelo (por defecto: 4)")
+        parser.add_argument("--format", dest="output_format", choices=["jsonl", "json"],
+                            default="jsonl", help="Formato de resultados (por defecto: jsonl)")
+        parser.add_argument("-o", "--output", dest="output_path",
+                            help="Escribir resultados en un archivo en lugar de stdout")
+        parser.add_argument("-q", "--quiet", action="store_true",
+                            help="Mostrar solo avisos y errores de los conversores")
+        parser.add_argument("-v", "--verbose", action="store_true",
+                            help="Mostrar también el detalle de depuración de los conversores")
+        parser.add_argument("--progress", dest="progress", action="store_true", default=None,
+                            help="Mostrar una línea de progreso con ritmo y ETA en lugar del detalle "
+                                 "de cada conversión (por defecto si stderr es una terminal)")
+        parser.add_argument("--no-progress", dest="progress", action="store_false", default=None,
+                            help="Mostrar el detalle de cada conversión en stderr")
+        parser.add_argument("--no-resume", dest="resume", action="store_false",
+                            help="No usar checkpoints: reconvertir todo desde cero")
+        parser.add_argument("--db", dest="db_path",
+                            help="Base de datos de checkpoints (por defecto: data/jobs/jobs.db)")
+        parser.add_argument("--profile", choices=sorted(PROFILES),
+                            help="Formato de salida: mp3, opus, aac, flac o passthrough (códec original "
+                                 "sin recodificar); por defecto EKHO_OUTPUT_PROFILE o mp3")
+        parser.add_argument("--connections", type=int,
+                            help="Conexiones paralelas por archivo descargado (por defecto: 4)")
+        parser.add_argument("--max-connections", type=int,
+                            help="Tope de conexiones de descarga en todo el proceso (por defecto: 16)")
+
+    @classmethod
+    def from_args(cls, args) -> "BatchController":
+        configure_connections(per_file=args.connections, global_limit=args.max_connections)
+        return cls(jobs=args.jobs, output_format=args.output_format,
+                   output_path=args.output_path, quiet=args.quiet,
+                   resume=args.resume, db_path=args.db_path, progress=args.progress,
+                   verbose=args.verbose, profile=args.profile)
+
+    def run(self, sources: List[str]) -> int:
+        """Ejecutar el lote completo y devolver el código de salida"""
+        try:
+            urls = read_urls(sources)
+        except OSError as e:
+            print(f"❌ No se pudo leer la lista de URLs: {e}", file=sys.stderr)
+            return EXIT_USAGE
+
+        if not urls:
+            print("❌ No se recibieron URLs para convertir", file=sys.stderr)
+            return EXIT_USAGE
+
+        # stdout queda reservado para resultados: los mensajes de los modelos van a stderr y
+        # lo que las bibliotecas escriban en stdout se desvía también
+        results_stream = open(self.output_path, 'w', encoding='utf-8') if self.output_path else sys.stdout
+        configure_logging(console_level=self.log_level, stream=sys.stderr)
+        # Restos de lotes anteriores (las pistas reanudables conservan su área de preparación)
+        clean_orphaned_temp(self.model.checkpoints)
+        model_output = open(os.devnull, 'w') if self.quiet else sys.stderr
+
+        print(f"🎵 Procesando {len(urls)} URL(s) con {self.model.jobs} hilo(s)...", file=sys.stderr)
+        progress_view = BatchProgressView().attach() if self.progress else None
+        try:
+            with contextlib.redirect_stdout(model_output):
+                results = self.model.run(urls, on_result=self._stream_result(results_stream))
+        except KeyboardInterrupt:
+            print("\n⏹️  Lote interrumpido por el usuario", file=sys.stderr)
+            if self.model.checkpoints is not None:
+                print("♻️ Vuelve a ejecutar el mismo comando para continuar donde se quedó",
+                      file=sys.stderr)
+            return EXIT_INTERRUPTED
+        finally:
+            if progress_view:
+                progress_view.detach()
+            if self.quiet:
+                model_output.close()
+
+        if self.output_format == "json":
+            json.dump(results, results_stream, ensure_ascii=False, indent=2)
+            results_stream.write("\n")
+        if self.output_path:
+            results_stream.close()
+
+        failed = [r for r in results if r['status'] != STATUS_OK]
+        print(f"✅ Completadas: {len(results) - len(failed)}  ❌ Fallidas: {len(failed)}", file=sys.stderr)
+        cache = get_metadata_cache().stats()
+        print(f"🗃️ Caché de metadatos: {cache['memory_hits'] + cache['disk_hits']} aciertos, "
+              f"{cache['negative_hits']} negativos, {cache['misses']} consultas", file=sys.stderr)
+        return EXIT_PARTIAL_FAILURE if failed else EXIT_OK
+
+    def _stream_result(self, stream):
+        """Callback que emite cada resultado en cuanto termina (solo en formato jsonl)"""
+        def emit(result):
+            if self.output_format == "jsonl":
+                stream.write(json.dumps(result, ensure_ascii=False) + "\n")
+                stream.flush()
+        return emit
@@ -12,6 +12,8 @@ src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if src_dir not in sys.path:
     sys.path.insert(0, src_dir)
 
+from model.conversor_model import PROJECT_ROOT, get_data_dir
+
 
 class BaseController(ABC):
     """Controlador base que define la interfaz común para todos los convertidores"""
@@ -28,15 +30,8 @@ class BaseController(ABC):
     
     def _ensure_data_directories(self):
         """Crear directorios necesarios si no existen"""
-        base_dir = os.path.join(os.path.dirname(__file__), "..", "..")
-        directories = [
-            os.path.join(base_dir, "data", "music"),
-            os.path.join(base_dir, "data", "metadata"),
-            os.path.join(base_dir, "data", "temp")
-        ]
-        
-        for directory in directories:
-            os.makedirs(directory, exist_ok=True)
+        for directory in ("music", "metadata", "temp"):
+            get_data_dir(directory)
     
     @abstractmethod
     def validate_input(self, input_data: str) -> bool:
@@ -94,16 +89,9 @@ class ConversorController:
     def _setup_environment(self) -> None:
         """Configurar entorno general"""
         # Crear directorios base
-        base_dir = os.path.join(os.path.dirname(__file__), "..", "..")
-        directories = [
-            os.path.join(base_dir, "data", "music"),
-            os.path.join(base_dir, "data", "metadata"),
-            os.path.join(base_dir, "data", "temp"),
-            os.path.join(base_dir, "logs")
-        ]
-        
-        for directory in directories:
-            os.makedirs(directory, exist_ok=True)
+        for directory in ("music", "metadata", "temp"):
+            get_data_dir(directory)
+        os.makedirs(os.path.join(PROJECT_ROOT, "logs"), exist_ok=True)
     
     def show_main_menu(self) -> None:
         """Mostrar menú principal"""
@@ -162,16 +150,15 @@ class ConversorController:
                 print(f"  ❌ {description} - NO INSTALADO")
         
         # Verificar directorios
-        base_dir = os.path.join(os.path.dirname(__file__), "..", "..")
         directories = [
-            ("data/music", "Directorio de música"),
-            ("data/metadata", "Directorio de metadatos"),
-            ("data/temp", "Directorio temporal")
+            ("music", "Directorio de música"),
+            ("metadata", "Directorio de metadatos"),
+            ("temp", "Directorio temporal")
         ]
         
         print("\n📁 DIRECTORIOS:")
         for dir_path, description in directories:
-            full_path = os.path.join(base_dir, dir_path)
+            full_path = get_data_dir(dir_path)
             if os.path.exists(full_path):
                 print(f"  ✅ {description}: {full_path}")
             else:
@@ -0,0 +1,318 @@
+# daemon_controller.py
+"""Controlador del daemon: API HTTP local sobre la cola persistente y el pool de workers"""
+
+import os
+import sys
+import json
+import time
+import contextlib
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional
+
+# Añadir la carpeta src al path para importaciones absolutas
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+from model.job_store import JobStore, FINAL_STATES, JOB_DONE
+from model.worker_pool import ConversionWorkerPool
+from model.http_client import close_session
+from model.rate_limiter import get_rate_limiter
+from model.metadata_cache import get_metadata_cache
+from model.metadata_resolver import all_source_stats
+from model.youtube_info import get_resolved_info_cache
+from model.ytdl_pool import close_ytdl_pool, get_ytdl_pool
+from model.progress_events import get_progress_metrics
+from model.output_profiles import mime_type
+from model.scratch_space import clean_orphaned_temp, get_scratch_budget
+from model.logging_config import configure_logging, get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Intervalo máximo entre mensajes del stream de eventos (mantiene viva la conexión)
+EVENT_STREAM_HEARTBEAT = 15.0
+
+
+class CollectionExpansionError(Exception):
+    """Un álbum o playlist no se pudo resolver en sus pistas (no se encola nada)"""
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """Rutas de la API:
+
+    POST   /jobs               {"url": ...} o {"urls": [...]}  -> crea trabajo(s)
+    GET    /jobs[?status=...]  -> lista de trabajos
+    GET    /jobs/<id>          -> estado del trabajo
+    GET    /jobs/<id>/events   -> stream (text/event-stream) de cambios hasta terminar
+    GET    /jobs/<id>/result   -> archivo convertido
+    DELETE /jobs/<id>          -> cancela un trabajo en cola
+    GET    /health             -> estado del daemon
+    """
+
+    server_version = "EkhoDaemon/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def daemon(self) -> "DaemonController":
+        return self.server.daemon_controller
+
+    def log_message(self, format, *args):
+        if self.daemon.verbose:
+            super().log_message(format, *args)
+
+    # --- Utilidades de respuesta ---
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error_json(self, status, message):
+        self._send_json({'error': message}, status=status)
+
+    def _read_json_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0:
+            return {}
+        return json.loads(self.rfile.read(length).decode("utf-8"))
+
+    def _route(self):
+        parsed = urllib.parse.urlparse(self.path)
+        parts = [p for p in parsed.path.split("/") if p]
+        return parts, urllib.parse.parse_qs(parsed.query)
+
+    # --- Métodos HTTP ---
+
+    def do_GET(self):
+        parts, query = self._route()
+
+        if parts == ["health"]:
+            return self._send_json(self.daemon.health())
+        if parts == ["jobs"]:
+            status = query.get('status', [None])[0]
+            try:
+                limit = int(query.get('limit', ['100'])[0])
+            except ValueError:
+                return self._send_error_json(400, "'limit' debe ser un número entero")
+            return self._send_json(self.daemon.store.list(status=status, limit=limit))
+        if len(parts) >= 2 and parts[0] == "jobs":
+            job = self.daemon.store.get(parts[1])
+            if job is None:
+                return self._send_error_json(404, "Trabajo no encontrado")
+            if len(parts) == 2:
+                return self._send_json(job)
+            if parts[2:] == ["events"]:
+                return self._stream_events(job)
+            if parts[2:] == ["result"]:
+                return self._send_result(job)
+
+        self._send_error_json(404, "Ruta no encontrada")
+
+    def do_POST(self):
+        parts, _ = self._route()
+        if parts != ["jobs"]:
+            return self._send_error_json(404, "Ruta no encontrada")
+
+        try:
+            body = self._read_json_body()
+        except (ValueError, UnicodeDecodeError):
+            return self._send_error_json(400, "JSON no válido")
+        if not isinstance(body, dict):
+            return self._send_error_json(400, "El cuerpo debe ser un objeto JSON")
+
+        if not isinstance(body.get('urls') or [], list):
+            return self._send_error_json(400, "'urls' debe ser una lista")
+        urls = body.get('urls') or ([body['url']] if body.get('url') else [])
+        urls = [u.strip() for u in urls if isinstance(u, str) and u.strip()]
+        if not urls:
+            return self._send_error_json(400, "Se requiere 'url' o 'urls'")
+
+        # Todas las URLs se resuelven antes de encolar: si una colección falla, no queda
+        # encolada la mitad de la petición
+        try:
+            expanded = [(url, self.daemon.expand(url)) for url in urls]
+        except CollectionExpansionError as e:
+            return self._send_error_json(502, str(e))
+        jobs = [self.daemon.submit(track_url, url if track_urls != [url] else None)
+                for url, track_urls in expanded for track_url in track_urls]
+        self._send_json(jobs[0] if 'url' in body and len(jobs) == 1 else jobs, status=201)
+
+    def do_DELETE(self):
+        parts, _ = self._route()
+        if len(parts) != 2 or parts[0] != "jobs":
+            return self._send_error_json(404, "Ruta no encontrada")
+        if self.daemon.store.get(parts[1]) is None:
+            return self._send_error_json(404, "Trabajo no encontrado")
+        if not self.daemon.store.cancel(parts[1]):
+            return self._send_error_json(409, "Solo se pueden cancelar trabajos en cola")
+        self.daemon.pool.notify_submitted()
+        self._send_json(self.daemon.store.get(parts[1]))
+
+    # --- Respuestas especiales ---
+
+    def _stream_events(self, job):
+        """Server-Sent Events: un evento 'status' por cada cambio hasta un estado final"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        last_sent = None
+        last_write = 0.0
+        try:
+            while True:
+                job = self.daemon.store.get(job['id'])
+                if job['updated_at'] != last_sent:
+                    self.wfile.write(f"event: status\ndata: {json.dumps(job, ensure_ascii=False)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    last_sent = job['updated_at']
+                    last_write = time.monotonic()
+                elif time.monotonic() - last_write >= EVENT_STREAM_HEARTBEAT:
+                    self.wfile.write(b": keep-alive\n\n")
+                    self.wfile.flush()
+                    last_write = time.monotonic()
+
+                if job['status'] in FINAL_STATES or self.daemon.stopping:
+                    break
+                self.daemon.pool.wait_for_change(timeout=1.0)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _send_result(self, job):
+        """Envía el archivo convertido de un trabajo terminado"""
+        if job['status'] != JOB_DONE:
+            return self._send_error_json(409, f"El trabajo no ha terminado (estado: {job['status']})")
+        output = job.get('output')
+        if not output or not os.path.exists(output):
+            return self._send_error_json(410, "El archivo de salida ya no existe")
+
+        size = os.path.getsize(output)
+        filename = os.path.basename(output)
+        self.send_response(200)
+        self.send_header("Content-Type", mime_type(output))
+        self.send_header("Content-Length", str(size))
+        self.send_header("Content-Disposition",
+                         f"attachment; filename*=UTF-8''{urllib.parse.quote(filename)}")
+        self.end_headers()
+        with open(output, "rb") as f:
+            while True:
+                chunk = f.read(64 * 1024)
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+
+
+class DaemonController:
+    """Daemon de larga duración: servidor HTTP + cola persistente + pool de workers"""
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, workers: int = 2,
+                 db_path: Optional[str] = None, verbose: bool = False):
+        self.host = host
+        self.port = port
+        self.verbose = verbose
+        self.stopping = False
+        self.store = JobStore(db_path)
+        self.pool = ConversionWorkerPool(self.store, workers=workers)
+        # Los álbumes y playlists se expanden siempre en el mismo hilo: el conversor de cada
+        # hilo se crea una vez (spotdl incluido) en lugar de en cada petición HTTP
+        self._expander = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ekho-expand")
+        self.httpd = None
+
+    @staticmethod
+    def add_arguments(parser) -> None:
+        """Registra los argumentos del subcomando 'serve'"""
+        parser.add_argument("--host", default=DEFAULT_HOST,
+                            help=f"Dirección de escucha (por defecto: {DEFAULT_HOST}, solo local)")
+        parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                            help=f"Puerto de escucha (por defecto: {DEFAULT_PORT})")
+        parser.add_argument("-w", "--workers", type=int, default=2,
+                            help="Conversiones simultáneas (por defecto: 2)")
+        parser.add_argument("--db", dest="db_path", help="Ruta de la base de datos de trabajos")
+        parser.add_argument("-v", "--verbose", action="store_true",
+                            help="Mostrar cada petición HTTP y todos los mensajes de los conversores")
+
+    @classmethod
+    def from_args(cls, args) -> "DaemonController":
+        return cls(host=args.host, port=args.port, workers=args.workers,
+                   db_path=args.db_path, verbose=args.verbose)
+
+    def submit(self, url, collection=None):
+        """Encola una URL y despierta a los workers (devuelve el trabajo creado)"""
+        job = self.store.submit(url, collection)
+        self.pool.notify_submitted()
+        return job
+
+    def expand(self, url):
+        """URLs de pista de una URL: los álbumes y playlists se resuelven en bloque.
+
+        Lanza CollectionExpansionError si una colección no se puede resolver; una URL no
+        soportada se devuelve tal cual y el worker la marca como tal al procesarla.
+        """
+        try:
+            return self._expander.submit(self.pool.converter.expand_url, url).result()
+        except (ValueError, NotImplementedError):
+            return [url]
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo resolver la colección {url}: {e}")
+            raise CollectionExpansionError(f"No se pudo resolver la colección: {e}") from e
+
+    def health(self):
+        """Resumen del estado del daemon"""
+        return {
+            'status': 'stopping' if self.stopping else 'ok',
+            'workers': self.pool.workers,
+            'jobs': self.store.counts(),
+            'db_path': self.store.db_path,
+            'rate_limits': get_rate_limiter().stats(),
+            'metadata_cache': get_metadata_cache().stats(),
+            'metadata_sources': all_source_stats(),
+            'youtube_resolved_info': get_resolved_info_cache().stats(),
+            'youtube_dl_pool': get_ytdl_pool().stats(),
+            'scratch_space': get_scratch_budget().stats(),
+            'progress': get_progress_metrics().snapshot(),
+        }
+
+    def run(self) -> int:
+        """Arrancar workers y servidor HTTP hasta Ctrl+C"""
+        self.httpd = ThreadingHTTPServer((self.host, self.port), JobRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.daemon_controller = self
+        host, port = self.httpd.server_address[:2]
+
+        print(f"🎵 Ekho daemon escuchando en http://{host}:{port}", file=sys.stderr)
+        print(f"⚙️  Workers: {self.pool.workers}  📁 Cola: {self.store.db_path}", file=sys.stderr)
+
+        # Mensajes de los conversores: avisos y errores en stderr (todo con -v), detalle en logs/
+        configure_logging(console_level="INFO" if self.verbose else "WARNING", stream=sys.stderr)
+        # Restos de ejecuciones anteriores que ningún trabajo reanudable va a usar
+        clean_orphaned_temp(self.store)
+        model_output = sys.stderr if self.verbose else open(os.devnull, 'w')
+        try:
+            with contextlib.redirect_stdout(model_output):
+                # Métricas de progreso suscritas antes de que llegue el primer trabajo
+                get_progress_metrics()
+                self.pool.start()
+                self.httpd.serve_forever()
+        except KeyboardInterrupt:
+            print("\n⏹️  Deteniendo daemon (los trabajos en curso terminan)...", file=sys.stderr)
+        finally:
+            self.stopping = True
+            self.httpd.server_close()
+            self.pool.stop()
+            self._expander.shutdown(wait=False, cancel_futures=True)
+            close_ytdl_pool()
+            close_session()
+            if not self.verbose:
+                model_output.close()
+
+        return 0
@@ -0,0 +1,106 @@
+# dedupe_controller.py
+"""Controlador del informe de duplicados de la biblioteca (mismo audio con distinto nombre u origen)"""
+
+import os
+import sys
+import json
+from typing import Optional
+
+# Añadir la carpeta src al path para importaciones absolutas
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+from model.conversor_model import get_data_dir
+from model.fingerprint import FingerprintIndex, get_fingerprint_index
+from model.music_library import MusicLibrary
+from model.logging_config import configure_logging
+
+# Códigos de salida (los mismos que el modo por lotes)
+EXIT_OK = 0
+EXIT_DUPLICATES = 1
+
+
+class DedupeController:
+    """Indexa la biblioteca por huella acústica, lista los duplicados y opcionalmente los borra"""
+
+    def __init__(self, scan: bool = False, delete: bool = False, output_format: str = "text",
+                 db_path: Optional[str] = None, music_dir: Optional[str] = None):
+        self.index = FingerprintIndex(db_path) if db_path else get_fingerprint_index()
+        self.scan = scan
+        self.delete = delete
+        self.output_format = output_format
+        self.music_dir = music_dir or get_data_dir("music")
+
+    @staticmethod
+    def add_arguments(parser) -> None:
+        """Registra los argumentos del subcomando 'dedupe'"""
+        parser.add_argument("--scan", action="store_true",
+                            help="Calcular la huella de las pistas de la biblioteca que aún no estén indexadas")
+        parser.add_argument("--delete", action="store_true",
+                            help="Borrar los duplicados y conservar uno por grupo (origen Spotify o el mayor)")
+        parser.add_argument("--format", dest="output_format", choices=["text", "json"], default="text",
+                            help="Formato del informe (por defecto: text)")
+        parser.add_argument("--db", dest="db_path",
+                            help="Índice de huellas (por defecto: data/fingerprints/index.db)")
+        parser.add_argument("--music-dir", dest="music_dir",
+                            help="Carpeta a indexar con --scan (por defecto: data/music)")
+
+    @classmethod
+    def from_args(cls, args) -> "DedupeController":
+        return cls(scan=args.scan, delete=args.delete, output_format=args.output_format,
+                   db_path=args.db_path, music_dir=args.music_dir)
+
+    def run(self) -> int:
+        """Informe de duplicados; devuelve 1 si quedan duplicados sin borrar"""
+        configure_logging(console_level="WARNING", stream=sys.stderr)
+        pruned = self.index.prune()
+        if pruned:
+            print(f"🗑️ {pruned} archivo(s) indexado(s) ya no existen", file=sys.stderr)
+
+        if self.scan:
+            paths = MusicLibrary(self.music_dir).tracks
+            print(f"🧬 Indexando {len(paths)} archivo(s) de {self.music_dir}...", file=sys.stderr)
+            summary = self.index.scan(paths, progress=lambda path: print(
+                f"   🧬 {os.path.basename(path)}", file=sys.stderr))
+            print(f"✅ Indexados: {summary['indexed']}  ⏭️ Sin cambios: {summary['skipped']}  "
+                  f"❌ Fallidos: {summary['failed']}", file=sys.stderr)
+
+        groups = self.index.duplicate_groups()
+        removed = self._delete_duplicates(groups) if self.delete else []
+
+        if self.output_format == "json":
+            json.dump({'groups': groups, 'removed': removed}, sys.stdout, ensure_ascii=False, indent=2)
+            sys.stdout.write("\n")
+        else:
+            self._print_groups(groups, removed)
+        return EXIT_DUPLICATES if groups and not self.delete else EXIT_OK
+
+    def _delete_duplicates(self, groups):
+        """Borra todos menos el primero de cada grupo; devuelve las rutas borradas"""
+        removed = []
+        for group in groups:
+            for track in group[1:]:
+                try:
+                    if os.path.exists(track['path']):
+                        os.remove(track['path'])
+                    self.index.remove(track['path'])
+                    removed.append(track['path'])
+                except OSError as e:
+                    print(f"❌ No se pudo borrar {track['path']}: {e}", file=sys.stderr)
+        return removed
+
+    @staticmethod
+    def _print_groups(groups, removed):
+        if not groups:
+            print("✅ No se encontraron duplicados")
+            return
+        wasted = sum(track['size'] or 0 for group in groups for track in group[1:])
+        print(f"🔁 {len(groups)} grupo(s) de duplicados ({wasted / (1024 * 1024):.1f} MB repetidos)")
+        removed = set(removed)
+        for number, group in enumerate(groups, 1):
+            print(f"\n[{number}]")
+            for position, track in enumerate(group):
+                mark = "✅ conservar" if position == 0 else ("🗑️ borrado" if track['path'] in removed else "🔁 duplicado")
+                print(f"   {mark}  {track['path']}  ({track['origin'] or '?'}, "
+                      f"{(track['size'] or 0) / (1024 * 1024):.1f} MB)")
@@ -0,0 +1,187 @@
+# distributed_controller.py
+"""Controladores del modo distribuido: coordinador que reparte pistas y workers que las convierten"""
+
+import os
+import sys
+import json
+import time
+from typing import List, Optional
+
+# Añadir la carpeta src al path para importaciones absolutas
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+from model.batch_model import read_urls
+from model.coordinator import Coordinator
+from model.job_store import JobStore, JOB_DONE, JOB_FAILED, JOB_QUEUED, JOB_RUNNING
+from model.worker_pool import ConversionWorkerPool
+from model.http_client import close_session
+from model.ytdl_pool import close_ytdl_pool
+from model.progress_events import get_progress_metrics
+from model.scratch_space import clean_orphaned_temp
+from model.logging_config import configure_logging
+
+# Códigos de salida (los mismos que el modo por lotes)
+EXIT_OK = 0
+EXIT_PARTIAL_FAILURE = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+DEFAULT_LEASE_SECONDS = 60
+
+
+def _format_eta(seconds):
+    if seconds is None:
+        return "?"
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    return f"{seconds // 60}m{seconds % 60:02d}s"
+
+
+class CoordinatorController:
+    """Encola las pistas de listas de URLs en la base de datos compartida y sigue el avance"""
+
+    def __init__(self, db_path: Optional[str] = None, wait: bool = False,
+                 interval: float = 5.0, status_only: bool = False):
+        self.coordinator = Coordinator(JobStore(db_path))
+        self.wait = wait
+        self.interval = interval
+        self.status_only = status_only
+
+    @staticmethod
+    def add_arguments(parser) -> None:
+        """Registra los argumentos del subcomando 'coordinate'"""
+        parser.add_argument("sources", nargs="*", default=["-"],
+                            help="Archivos con una URL por línea ('-' = stdin, por defecto)")
+        parser.add_argument("--db", dest="db_path",
+                            help="Base de datos compartida con los workers (por defecto: data/jobs/jobs.db)")
+        parser.add_argument("--wait", action="store_true",
+                            help="Seguir el avance hasta que no quede trabajo pendiente")
+        parser.add_argument("--interval", type=float, default=5.0,
+                            help="Segundos entre actualizaciones con --wait (por defecto: 5)")
+        parser.add_argument("--status", dest="status_only", action="store_true",
+                            help="Mostrar el estado de la cola en JSON sin encolar nada")
+
+    @classmethod
+    def from_args(cls, args) -> "CoordinatorController":
+        return cls(db_path=args.db_path, wait=args.wait, interval=args.interval,
+                   status_only=args.status_only)
+
+    def run(self, sources: List[str]) -> int:
+        """Encolar (y opcionalmente esperar); devuelve el código de salida"""
+        configure_logging(console_level="WARNING", stream=sys.stderr)
+        if self.status_only:
+            json.dump(self.coordinator.status(), sys.stdout, ensure_ascii=False, indent=2)
+            sys.stdout.write("\n")
+            return EXIT_OK
+
+        try:
+            urls = read_urls(sources)
+        except OSError as e:
+            print(f"❌ No se pudo leer la lista de URLs: {e}", file=sys.stderr)
+            return EXIT_USAGE
+        if not urls:
+            print("❌ No se recibieron URLs para repartir", file=sys.stderr)
+            return EXIT_USAGE
+
+        print(f"📀 Expandiendo {len(urls)} URL(s) en pistas...", file=sys.stderr)
+        summary = self.coordinator.submit(urls)
+        print(f"📥 {summary['queued']} pista(s) encolada(s), {summary['skipped']} ya estaban "
+              f"en la cola o convertidas ({self.coordinator.store.db_path})", file=sys.stderr)
+        for failure in summary['failures']:
+            print(f"❌ {failure['url']}: {failure['error']}", file=sys.stderr)
+
+        if not self.wait:
+            return EXIT_PARTIAL_FAILURE if summary['failures'] else EXIT_OK
+
+        try:
+            status = self.follow()
+        except KeyboardInterrupt:
+            print("\n⏹️  Seguimiento interrumpido (los workers continúan)", file=sys.stderr)
+            return EXIT_INTERRUPTED
+        failed = status['jobs'].get(JOB_FAILED, 0) or summary['failures']
+        return EXIT_PARTIAL_FAILURE if failed else EXIT_OK
+
+    def follow(self):
+        """Muestra el avance cada `interval` segundos hasta vaciar la cola; devuelve el último estado"""
+        while True:
+            status = self.coordinator.status()
+            jobs = status['jobs']
+            done, failed = jobs.get(JOB_DONE, 0), jobs.get(JOB_FAILED, 0)
+            print(f"🎵 {done + failed}/{done + failed + status['pending']}  ✅ {done}  ❌ {failed}  "
+                  f"⏳ en cola {jobs.get(JOB_QUEUED, 0)}  ⚙️ workers {len(status['workers'])}  "
+                  f"🚀 {status['tracks_per_s']:.2f} pistas/s  ETA {_format_eta(status['eta_s'])}",
+                  file=sys.stderr)
+            if not status['pending']:
+                return status
+            time.sleep(self.interval)
+
+
+class WorkerController:
+    """Proceso worker: reclama pistas de la base de datos compartida con lease y las convierte"""
+
+    def __init__(self, db_path: Optional[str] = None, workers: int = 2,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS, exit_when_idle: bool = False,
+                 verbose: bool = False):
+        self.store = JobStore(db_path)
+        self.pool = ConversionWorkerPool(self.store, workers=workers, lease_seconds=lease_seconds)
+        self.exit_when_idle = exit_when_idle
+        self.verbose = verbose
+
+    @staticmethod
+    def add_arguments(parser) -> None:
+        """Registra los argumentos del subcomando 'work'"""
+        parser.add_argument("--db", dest="db_path",
+                            help="Base de datos compartida con el coordinador (por defecto: data/jobs/jobs.db)")
+        parser.add_argument("-w", "--workers", type=int, default=2,
+                            help="Conversiones simultáneas en este proceso (por defecto: 2)")
+        parser.add_argument("--lease", dest="lease_seconds", type=float, default=DEFAULT_LEASE_SECONDS,
+                            help="Segundos sin heartbeat tras los que otro worker retoma una pista "
+                                 f"(por defecto: {DEFAULT_LEASE_SECONDS})")
+        parser.add_argument("--exit-when-idle", action="store_true",
+                            help="Terminar cuando no quede trabajo en cola ni en curso")
+        parser.add_argument("-v", "--verbose", action="store_true",
+                            help="Mostrar todos los mensajes de los conversores")
+
+    @classmethod
+    def from_args(cls, args) -> "WorkerController":
+        return cls(db_path=args.db_path, workers=args.workers, lease_seconds=args.lease_seconds,
+                   exit_when_idle=args.exit_when_idle, verbose=args.verbose)
+
+    def _drained(self):
+        counts = self.store.counts()
+        return (self.pool.running_jobs() == 0 and not counts.get(JOB_QUEUED)
+                and not counts.get(JOB_RUNNING))
+
+    def run(self) -> int:
+        """Convertir pistas hasta Ctrl+C (o hasta vaciar la cola con --exit-when-idle)"""
+        configure_logging(console_level="INFO" if self.verbose else "WARNING", stream=sys.stderr)
+        # Restos de ejecuciones anteriores que ninguna pista reanudable de la cola va a usar
+        clean_orphaned_temp(self.store)
+        print(f"⚙️  Worker {self.pool.worker_prefix}: {self.pool.workers} hilo(s), "
+              f"lease {self.pool.lease_seconds:g}s  📁 Cola: {self.store.db_path}", file=sys.stderr)
+
+        metrics = get_progress_metrics()
+        start = time.monotonic()
+        interrupted = False
+        self.pool.start()
+        try:
+            while True:
+                time.sleep(self.pool.poll_interval)
+                if self.exit_when_idle and self._drained():
+                    break
+        except KeyboardInterrupt:
+            interrupted = True
+            print("\n⏹️  Deteniendo worker (las pistas en curso terminan)...", file=sys.stderr)
+        finally:
+            self.pool.stop()
+            close_ytdl_pool()
+            close_session()
+
+        elapsed = time.monotonic() - start
+        tracks = metrics.snapshot()['tracks']
+        print(f"✅ Convertidas: {tracks['ok']}  ❌ Fallidas: {tracks['failed']}  "
+              f"⏱️ {elapsed:.1f}s ({(tracks['ok'] + tracks['failed']) / max(elapsed, 1e-9):.2f} pistas/s)",
+              file=sys.stderr)
+        return EXIT_INTERRUPTED if interrupted else EXIT_OK
@@ -0,0 +1,90 @@
+# loudness_controller.py
+"""Controlador del análisis de sonoridad (ReplayGain) de los archivos que ya están en la biblioteca"""
+
+import os
+import sys
+import json
+from typing import List, Optional
+
+# Añadir la carpeta src al path para importaciones absolutas
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
+
+from model.conversor_model import get_data_dir
+from model.loudness import analyze_library
+from model.music_library import MusicLibrary
+from model.logging_config import configure_logging
+
+# Códigos de salida (los mismos que el modo por lotes)
+EXIT_OK = 0
+EXIT_PARTIAL_FAILURE = 1
+EXIT_INTERRUPTED = 130
+
+
+class LoudnessController:
+    """Mide la sonoridad EBU R128 y etiqueta ReplayGain en un pool de procesos"""
+
+    def __init__(self, processes: Optional[int] = None, force: bool = False,
+                 output_format: str = "text"):
+        self.processes = processes
+        self.force = force
+        self.output_format = output_format
+
+    @staticmethod
+    def add_arguments(parser) -> None:
+        """Registra los argumentos del subcomando 'loudness'"""
+        parser.add_argument("paths", nargs="*",
+                            help="Archivos o carpetas a analizar (por defecto: data/music)")
+        parser.add_argument("-j", "--processes", type=int, default=None,
+                            help="Procesos de análisis en paralelo (por defecto: núcleos disponibles)")
+        parser.add_argument("--force", action="store_true",
+                            help="Volver a medir archivos que ya tienen etiquetas ReplayGain")
+        parser.add_argument("--format", dest="output_format", choices=["text", "jsonl"], default="text",
+                            help="Formato de resultados (por defecto: text)")
+
+    @classmethod
+    def from_args(cls, args) -> "LoudnessController":
+        return cls(processes=args.processes, force=args.force, output_format=args.output_format)
+
+    @staticmethod
+    def collect_paths(sources: List[str]):
+        """Archivos a analizar: las carpetas se expanden con sus pistas"""
+        paths = []
+        for source in sources or [get_data_dir("music")]:
+            if os.path.isdir(source):
+                paths.extend(MusicLibrary(source).tracks)
+            else:
+                paths.append(source)
+        return paths
+
+    def _print_result(self, result):
+        if self.output_format == "jsonl":
+            print(json.dumps(result, ensure_ascii=False), flush=True)
+            return
+        name = os.path.basename(result['path'])
+        if result['status'] == "tagged":
+            print(f"🔊 {name}: {result['lufs']:.1f} LUFS -> {result['gain_db']:+.2f} dB", flush=True)
+        elif result['status'] == "failed":
+            print(f"❌ {name}: {result['error']}", flush=True)
+        elif result['status'] == "silent":
+            print(f"🔇 {name}: sin audio medible", flush=True)
+
+    def run(self, sources: List[str]) -> int:
+        """Analiza y etiqueta; devuelve el código de salida"""
+        configure_logging(console_level="WARNING", stream=sys.stderr)
+        paths = self.collect_paths(sources)
+        print(f"🔊 Analizando {len(paths)} archivo(s)...", file=sys.stderr)
+        try:
+            results = analyze_library(paths, processes=self.processes, force=self.force,
+                                      on_result=self._print_result)
+        except KeyboardInterrupt:
+            print("\n⏹️  Análisis interrumpido", file=sys.stderr)
+            return EXIT_INTERRUPTED
+
+        counts = {}
+        for result in results:
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+        print(f"✅ Etiquetados: {counts.get('tagged', 0)}  ⏭️ Ya tenían ReplayGain: {counts.get('skipped', 0)}  "
+              f"❌ Fallidos: {counts.get('failed', 0)}", file=sys.stderr)
+        return EXIT_PARTIAL_FAILURE if counts.get('failed') else EXIT_OK
@@ -40,7 +40,7 @@ class MusicController:
             return
 
         if self.library.total_tracks() == 0:
-            print("⚠️ No hay pistas MP3 en la biblioteca")
+            print("⚠️ No hay pistas en la biblioteca")
             return
 
         if self.current_index >= self.library.total_tracks():
@@ -48,7 +48,12 @@ class MusicController:
             
         track = self.library.get_track(self.current_index)
         if track and os.path.exists(track):
-            pygame.mixer.music.load(track)
+            try:
+                pygame.mixer.music.load(track)
+            except Exception as e:
+                # SDL_mixer no decodifica todos los formatos de salida (p.ej. AAC/M4A)
+                print(f"❌ Formato no soportado por el reproductor ({e}): {track}")
+                return
             pygame.mixer.music.play()
             print(f"🎵 Reproduciendo: {track}")
         else:
@@ -73,7 +78,7 @@ class MusicController:
         if not self._can_control_playback():
             return
         if self.library.total_tracks() == 0:
-            print("⚠️ No hay pistas MP3 en la biblioteca")
+            print("⚠️ No hay pistas en la biblioteca")
             return
         self.current_index = (self.current_index + 1) % self.library.total_tracks()
         self.play()
@@ -82,7 +87,7 @@ class MusicController:
         if not self._can_control_playback():
             return
         if self.library.total_tracks() == 0:
-            print("⚠️ No hay pistas MP3 en la biblioteca")
+            print("⚠️ No hay pistas en la biblioteca")
             return
         self.current_index = (self.current_index - 1) % self.library.total_tracks()
         self.play()
@@ -14,6 +14,7 @@ if src_dir not in sys.path:
 from controller.conversor_controller import BaseController
 from model.spotify2mp3_model import Spotify2MP3Converter
 from view.spotify2mp3_view import SpotifyView
+from view.progress_view import TrackProgressView
 
 
 class Spotify2MP3Controller(BaseController):
@@ -52,7 +53,12 @@ class Spotify2MP3Controller(BaseController):
             
             # Procesar conversión
             self.show_progress("🔍 Extrayendo metadatos de Spotify...")
-            result_path = self.model.convert(spotify_url)
+            with TrackProgressView():
+                result_path = self.model.convert(spotify_url)
+            if isinstance(result_path, list):
+                # Álbum o playlist: mostrar la carpeta donde quedaron todas las pistas
+                self.show_progress(f"📀 {len(result_path)} pistas convertidas")
+                result_path = os.path.dirname(result_path[0])
             
             # Finalizar sesión
             self.model.finish_download_session()
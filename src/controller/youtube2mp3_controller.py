@@ -14,6 +14,7 @@ if src_dir not in sys.path:
 from controller.conversor_controller import BaseController
 from model.youtube2mp3_model import YouTube2MP3Converter
 from view.youtube2mp3_view import YouTubeView
+from view.progress_view import TrackProgressView
 
 
 class YouTube2MP3Controller(BaseController):
@@ -48,7 +49,8 @@ class YouTube2MP3Controller(BaseController):
             
             # Procesar conversión
             self.show_progress("⬇️ Descargando desde YouTube...")
-            result_path = self.model.convert(youtube_url)
+            with TrackProgressView():
+                result_path = self.model.convert(youtube_url)
             
             return result_path
             
@@ -0,0 +1,105 @@
+# async_runtime.py
+"""
+Ejecutores acotados para la API asíncrona de conversión (aconvert / aconvert_many)
+
+No es E/S asíncrona nativa. Todas las etapas de red, también las que son HTTP simple
+(oEmbed, página de Spotify, portadas y miniaturas, descarga por rangos de
+download_manager), siguen usando bibliotecas bloqueantes (requests, yt-dlp, spotdl,
+pytubefix): entre las dependencias no hay un cliente HTTP asíncrono y el entorno offline de
+los benchmarks sustituye las sesiones de requests. Cada etapa es una corrutina que ejecuta
+la función bloqueante en uno de dos ejecutores de tamaño fijo:
+
+- red: búsquedas, metadatos y descargas (EKHO_ASYNC_NETWORK_THREADS hilos)
+- CPU: FFmpeg/moviepy y mutagen (EKHO_ASYNC_CPU_THREADS hilos)
+
+Por tanto, como mucho hay EKHO_ASYNC_NETWORK_THREADS operaciones de red a la vez; el resto
+de conversiones en vuelo solo esperan turno en la cola del ejecutor (sin ocupar hilo). Por
+eso aconvert_many deja en vuelo, por defecto, tantas conversiones como hilos suman ambos
+ejecutores.
+
+Los métodos bloqueantes (convert) son un envoltorio de los asíncronos: run_blocking ejecuta
+la corrutina en el hilo que llama y, dentro de ella, run_network/run_cpu llaman a la
+función directamente en lugar de pasar por los ejecutores, de modo que el camino
+bloqueante se comporta igual que antes (mismo hilo, mismos checkpoints).
+"""
+
+import os
+import asyncio
+import functools
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+NETWORK_THREADS = int(os.environ.get("EKHO_ASYNC_NETWORK_THREADS", "32"))
+CPU_THREADS = int(os.environ.get("EKHO_ASYNC_CPU_THREADS", str(os.cpu_count() or 2)))
+# Conversiones en vuelo por defecto en aconvert_many (más no añade paralelismo, solo cola)
+DEFAULT_CONCURRENCY = int(os.environ.get("EKHO_ASYNC_CONCURRENCY", str(NETWORK_THREADS + CPU_THREADS)))
+
+# True mientras se ejecuta una corrutina desde run_blocking
+_inline = contextvars.ContextVar("ekho_async_inline", default=False)
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def _get_executor(kind):
+    with _executors_lock:
+        executor = _executors.get(kind)
+        if executor is None:
+            workers = NETWORK_THREADS if kind == "network" else CPU_THREADS
+            executor = ThreadPoolExecutor(max_workers=max(1, workers),
+                                          thread_name_prefix=f"ekho-async-{kind}")
+            _executors[kind] = executor
+        return executor
+
+
+async def _run(kind, func, *args, **kwargs):
+    if _inline.get():
+        return func(*args, **kwargs)
+    loop = asyncio.get_running_loop()
+    # copy_context: la etapa ve las mismas variables de contexto que la corrutina
+    call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+    return await loop.run_in_executor(_get_executor(kind), call)
+
+
+async def run_network(func, *args, **kwargs):
+    """Ejecuta una etapa de red bloqueante en un hilo del ejecutor de red (no bloquea el bucle)"""
+    return await _run("network", func, *args, **kwargs)
+
+
+async def run_cpu(func, *args, **kwargs):
+    """Ejecuta una etapa de CPU (FFmpeg, mutagen) sin bloquear el bucle de eventos"""
+    return await _run("cpu", func, *args, **kwargs)
+
+
+async def gather_bounded(coroutine_func, items, concurrency=None):
+    """coroutine_func(item) para cada elemento con como mucho `concurrency` en vuelo.
+
+    Devuelve los resultados en orden; las excepciones se devuelven en su posición en lugar
+    de cancelar al resto.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency or DEFAULT_CONCURRENCY))
+
+    async def bounded(item):
+        async with semaphore:
+            return await coroutine_func(item)
+
+    return await asyncio.gather(*(bounded(item) for item in items), return_exceptions=True)
+
+
+def run_blocking(coroutine):
+    """Ejecuta una corrutina de conversión en el hilo actual, con sus etapas en línea"""
+    token = _inline.set(True)
+    try:
+        return asyncio.run(coroutine)
+    finally:
+        _inline.reset(token)
+
+
+def shutdown_executors(wait=True):
+    """Detiene los ejecutores (se vuelven a crear si hacen falta)"""
+    with _executors_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=wait)
@@ -0,0 +1,156 @@
+# audio_tags.py
+"""
+Etiquetas de audio para todos los formatos de los perfiles de salida
+
+Cada formato guarda las etiquetas a su manera y mutagen tiene una clase para cada uno:
+ID3 en MP3, átomos iTunes en M4A y comentarios Vorbis en FLAC/Opus/Ogg (con la portada
+como bloque METADATA_BLOCK_PICTURE). Aquí se traducen los mismos campos (título, artista,
+álbum, comentario de origen, portada y ReplayGain) a la clase que corresponda según el
+archivo, sin borrar las etiquetas que ya tenga.
+"""
+
+import base64
+
+from model.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Opus guarda la ganancia como R128_TRACK_GAIN (Q7.8, relativa a -23 LUFS) en lugar de ReplayGain
+OPUS_REFERENCE_LUFS = -23.0
+REPLAYGAIN_REFERENCE_LUFS = -18.0
+
+_MP4_KEYS = {'title': "\xa9nam", 'artist': "\xa9ART", 'album': "\xa9alb", 'comment': "\xa9cmt"}
+_MP4_FREEFORM = "----:com.apple.iTunes:"
+
+
+def _open(path):
+    import mutagen
+    audio = mutagen.File(path)
+    if audio is None:
+        raise ValueError(f"Formato de audio no reconocido: {path}")
+    if audio.tags is None:
+        audio.add_tags()
+    return audio
+
+
+def _kind(audio):
+    """'id3', 'mp4' o 'vorbis' según la clase de mutagen del archivo"""
+    from mutagen.mp3 import MP3
+    from mutagen.mp4 import MP4
+    if isinstance(audio, MP3):
+        return "id3"
+    if isinstance(audio, MP4):
+        return "mp4"
+    return "vorbis"
+
+
+def _picture(cover_data):
+    from mutagen.flac import Picture
+    picture = Picture()
+    picture.type = 3
+    picture.mime = "image/jpeg"
+    picture.desc = "Cover"
+    picture.data = cover_data
+    return picture
+
+
+def write_tags(path, title=None, artist=None, album=None, comment=None, cover_path=None):
+    """Título, artista, álbum, comentario y portada en el formato del archivo (True si se guardaron)"""
+    fields = {'title': title, 'artist': artist, 'album': album, 'comment': comment}
+    fields = {key: value for key, value in fields.items() if value}
+    cover_data = None
+    if cover_path:
+        with open(cover_path, "rb") as f:
+            cover_data = f.read() or None
+
+    audio = _open(path)
+    kind = _kind(audio)
+    if kind == "id3":
+        from mutagen.id3 import APIC, COMM, TALB, TIT2, TPE1  # type: ignore
+        frames = {'title': TIT2, 'artist': TPE1, 'album': TALB}
+        for key, value in fields.items():
+            if key == 'comment':
+                audio.tags.add(COMM(encoding=3, lang='spa', desc='', text=[value]))  # type: ignore
+            else:
+                audio.tags.add(frames[key](encoding=3, text=value))  # type: ignore
+        if cover_data:
+            audio.tags.add(APIC(encoding=3, mime='image/jpeg', type=3, desc='Cover', data=cover_data))  # type: ignore
+    elif kind == "mp4":
+        from mutagen.mp4 import MP4Cover
+        for key, value in fields.items():
+            audio.tags[_MP4_KEYS[key]] = [value]
+        if cover_data:
+            audio.tags["covr"] = [MP4Cover(cover_data, imageformat=MP4Cover.FORMAT_JPEG)]
+    else:
+        for key, value in fields.items():
+            audio.tags[key.upper()] = [value]
+        if cover_data:
+            picture = _picture(cover_data)
+            if hasattr(audio, "add_picture"):
+                audio.clear_pictures()
+                audio.add_picture(picture)
+            else:
+                audio.tags["METADATA_BLOCK_PICTURE"] = [base64.b64encode(picture.write()).decode("ascii")]
+    audio.save()
+    return True
+
+
+def write_replaygain(path, gain_db, peak=None, integrated_lufs=None):
+    """Ganancia de pista (ReplayGain 2.0) en el formato del archivo"""
+    audio = _open(path)
+    kind = _kind(audio)
+    gain_text = f"{gain_db:+.2f} dB"
+    peak_text = f"{peak:.6f}" if peak is not None else None
+    if kind == "id3":
+        from mutagen.id3 import TXXX  # type: ignore
+        audio.tags.add(TXXX(encoding=3, desc="REPLAYGAIN_TRACK_GAIN", text=[gain_text]))  # type: ignore
+        if peak_text:
+            audio.tags.add(TXXX(encoding=3, desc="REPLAYGAIN_TRACK_PEAK", text=[peak_text]))  # type: ignore
+    elif kind == "mp4":
+        from mutagen.mp4 import MP4FreeForm
+        audio.tags[_MP4_FREEFORM + "replaygain_track_gain"] = [MP4FreeForm(gain_text.encode("utf-8"))]
+        if peak_text:
+            audio.tags[_MP4_FREEFORM + "replaygain_track_peak"] = [MP4FreeForm(peak_text.encode("utf-8"))]
+    else:
+        audio.tags["REPLAYGAIN_TRACK_GAIN"] = [gain_text]
+        if peak_text:
+            audio.tags["REPLAYGAIN_TRACK_PEAK"] = [peak_text]
+        if integrated_lufs is not None and type(audio).__name__ == "OggOpus":
+            # Los reproductores de Opus aplican R128_TRACK_GAIN (RFC 7845) y no ReplayGain
+            r128 = round((OPUS_REFERENCE_LUFS - integrated_lufs) * 256)
+            audio.tags["R128_TRACK_GAIN"] = [str(max(-32768, min(32767, r128)))]
+    audio.save()
+
+
+def read_replaygain(path):
+    """Ganancia ReplayGain ya guardada en el archivo (texto) o None"""
+    try:
+        audio = _open(path)
+    except Exception:
+        return None
+    kind = _kind(audio)
+    if kind == "id3":
+        frame = audio.tags.get("TXXX:REPLAYGAIN_TRACK_GAIN")
+        values = frame.text if frame else None
+    elif kind == "mp4":
+        values = audio.tags.get(_MP4_FREEFORM + "replaygain_track_gain")
+        values = [bytes(value).decode("utf-8") for value in values] if values else None
+    else:
+        values = audio.tags.get("REPLAYGAIN_TRACK_GAIN")
+    return str(values[0]) if values else None
+
+
+def read_comment(path):
+    """Comentario del archivo (donde se guarda 'Origen: ...'), o None"""
+    try:
+        audio = _open(path)
+    except Exception:
+        return None
+    kind = _kind(audio)
+    if kind == "id3":
+        for key, frame in audio.tags.items():
+            if key.startswith("COMM") and frame.text:
+                return str(frame.text[0])
+        return None
+    values = audio.tags.get(_MP4_KEYS['comment'] if kind == "mp4" else "COMMENT")
+    return str(values[0]) if values else None
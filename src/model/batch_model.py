@@ -0,0 +1,195 @@
+# batch_model.py
+"""
+Conversión por lotes no interactiva
+
+Lee listas de URLs, enruta cada una con ConverterFactory.create_converter y las procesa
+en paralelo con un número configurable de hilos. Cada hilo reutiliza su propio conversor
+por plataforma (los conversores guardan estado por pista y no son seguros entre hilos).
+"""
+
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from model.conversor_model import BaseModel, ConverterFactory
+from model.ytdl_pool import close_ytdl_pool
+from model.output_profiles import get_profile
+from model.progress_events import BatchStarted, TrackFinished, emit
+
+# Estados de resultado por URL
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
+STATUS_UNSUPPORTED = "unsupported"
+
+
+def read_urls(sources, stdin=None):
+    """Lee URLs desde archivos o '-' (stdin), ignorando líneas vacías, comentarios y duplicados"""
+    stdin = stdin or sys.stdin
+    seen = set()
+    urls = []
+
+    for source in sources:
+        if source == "-":
+            lines = stdin.read().splitlines()
+        else:
+            with open(source, 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+
+        for line in lines:
+            url = line.strip()
+            if not url or url.startswith("#") or url in seen:
+                continue
+            seen.add(url)
+            urls.append(url)
+
+    return urls
+
+
+class BatchConverter:
+    """Ejecuta conversiones de muchas URLs en paralelo y produce un resultado por URL"""
+
+    def __init__(self, jobs=4, checkpoints=None, profile=None):
+        self.jobs = max(1, int(jobs))
+        # JobStore para checkpoints por etapa: con él, un lote interrumpido se reanuda
+        self.checkpoints = checkpoints
+        # Perfil de salida de todo el lote (None = el de EKHO_OUTPUT_PROFILE)
+        self.profile = get_profile(profile)
+        self._local = threading.local()
+        self._session_lock = threading.Lock()
+        self._spotify_session_started = False
+
+    def _get_converter(self, url):
+        """Devuelve el conversor del hilo actual para la plataforma de la URL"""
+        platform = BaseModel.detect_platform(url)
+        converters = getattr(self._local, "converters", None)
+        if converters is None:
+            converters = self._local.converters = {}
+
+        if platform not in converters:
+            converter = ConverterFactory.create_converter(url)
+            converter.checkpoints = self.checkpoints
+            converter.profile = self.profile
+            if hasattr(converter, "start_download_session"):
+                # Una sola sesión de metadatos para todo el lote (no limpiar por cada hilo);
+                # al reanudar se conservan los metadatos de la ejecución interrumpida
+                with self._session_lock:
+                    if not self._spotify_session_started:
+                        converter.start_download_session(is_batch=True,
+                                                         resume=self.checkpoints is not None)
+                        self._spotify_session_started = True
+            converters[platform] = converter
+
+        return platform, converters[platform]
+
+    @staticmethod
+    def _new_result(url, collection=None):
+        return {
+            'url': url,
+            'collection': collection,
+            'platform': BaseModel.detect_platform(url),
+            'status': STATUS_OK,
+            'output': None,
+            'error': None,
+        }
+
+    @staticmethod
+    def _set_error(result, error):
+        """Clasifica la excepción como URL no soportada o como fallo de conversión"""
+        unsupported = isinstance(error, (ValueError, NotImplementedError))
+        result['status'] = STATUS_UNSUPPORTED if unsupported else STATUS_ERROR
+        result['error'] = str(error)
+
+    def expand_url(self, url):
+        """URLs de pista de una URL: álbumes y playlists se resuelven en bloque, el resto tal cual"""
+        _, converter = self._get_converter(url)
+        expand = getattr(converter, "expand_collection", None)
+        return expand(url) if expand else [url]
+
+    def _expand(self, urls):
+        """Expande las colecciones de la lista conservando el orden de entrada.
+
+        Cada elemento es una tarea (url_pista, url_colección o None) o, si la URL no se
+        pudo resolver, su resultado ya fallido (diccionario).
+        """
+        entries = []
+        seen = set()
+        for url in urls:
+            try:
+                track_urls = self.expand_url(url)
+            except Exception as e:
+                result = self._new_result(url)
+                self._set_error(result, e)
+                result['elapsed_s'] = 0.0
+                entries.append(result)
+                continue
+            collection = url if track_urls != [url] else None
+            for track_url in track_urls:
+                # Una misma pista en varias playlists se convierte una sola vez
+                if track_url not in seen:
+                    seen.add(track_url)
+                    entries.append((track_url, collection))
+        return entries
+
+    def expand_urls(self, urls):
+        """Expande las colecciones de la lista.
+
+        Devuelve (tareas, errores): tareas = [(url_pista, url_colección o None)] y
+        errores = resultados ya fallidos de las URLs que no se pudieron resolver.
+        """
+        entries = self._expand(urls)
+        tasks = [entry for entry in entries if isinstance(entry, tuple)]
+        failures = [entry for entry in entries if isinstance(entry, dict)]
+        return tasks, failures
+
+    def convert_url(self, url, collection=None):
+        """Convierte una URL y devuelve un diccionario con el resultado (nunca lanza)"""
+        start = time.perf_counter()
+        result = self._new_result(url, collection)
+
+        try:
+            result['platform'], converter = self._get_converter(url)
+            result['output'] = converter.convert(url)
+        except Exception as e:
+            self._set_error(result, e)
+
+        result['elapsed_s'] = round(time.perf_counter() - start, 3)
+        emit(TrackFinished(url, result['status'] == STATUS_OK, result['output'], result['error'],
+                           result['elapsed_s']))
+        return result
+
+    def run(self, urls, on_result=None):
+        """Procesa todas las URLs en paralelo; devuelve los resultados en orden de entrada.
+
+        Los álbumes y playlists se expanden antes en pistas sueltas para que sus pistas
+        se repartan entre los hilos como cualquier otra URL.
+        """
+        entries = self._expand(urls)
+        emit(BatchStarted(len(entries)))
+        # Las URLs que no se pudieron resolver ya tienen su resultado en su posición
+        results = [entry if isinstance(entry, dict) else None for entry in entries]
+        for result in results:
+            if result is not None:
+                emit(TrackFinished(result['url'], False, None, result['error'], 0.0))
+                if on_result:
+                    on_result(result)
+
+        executor = ThreadPoolExecutor(max_workers=self.jobs, thread_name_prefix="ekho-batch")
+        try:
+            futures = {executor.submit(self.convert_url, *entry): index
+                       for index, entry in enumerate(entries) if isinstance(entry, tuple)}
+            for future in as_completed(futures):
+                result = future.result()
+                results[futures[future]] = result
+                if on_result:
+                    on_result(result)
+        except KeyboardInterrupt:
+            # No arrancar pistas pendientes; las que están en curso terminan
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+        finally:
+            executor.shutdown(wait=True)
+            # Los hilos del lote ya terminaron: cerrar sus YoutubeDL
+            close_ytdl_pool()
+
+        return results
@@ -4,6 +4,62 @@ Clase base para conversores de diferentes plataformas
 Facilita la expansión a otras plataformas manteniendo consistencia en metadatos
 """
 
+import os
+import shutil
+import logging
+import contextlib
+import contextvars
+
+from model.async_runtime import gather_bounded, run_blocking
+from model.progress_events import stage_events
+
+# Mismo espacio que logging_config.get_logger (que importa este módulo y no puede usarse aquí)
+logger = logging.getLogger(f"ekho.{__name__}")
+
+# Raíz del proyecto (src/model -> raíz)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+
+# Comprobación que se hace antes de cada etapa (p.ej. un worker que perdió el lease de su
+# trabajo): recibe el nombre de la etapa y lanza ConversionCancelled para detenerla
+_stage_guard = contextvars.ContextVar("ekho_stage_guard", default=None)
+
+
+class ConversionCancelled(Exception):
+    """La conversión se detuvo entre etapas (el trabajo ya no pertenece a este worker)"""
+
+
+@contextlib.contextmanager
+def stage_guard(check):
+    """Ejecuta check(etapa) antes de cada etapa de las conversiones de este contexto"""
+    token = _stage_guard.set(check)
+    try:
+        yield
+    finally:
+        _stage_guard.reset(token)
+
+
+def get_data_dir(*parts):
+    """Retorna (y crea si no existe) una carpeta dentro de data/.
+
+    La raíz de datos puede redirigirse con la variable de entorno EKHO_DATA_DIR,
+    útil para benchmarks y ejecuciones aisladas que no deben tocar la biblioteca real.
+    """
+    base_dir = os.environ.get("EKHO_DATA_DIR") or os.path.join(PROJECT_ROOT, "data")
+    path = os.path.join(base_dir, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def get_ffmpeg_exe():
+    """FFmpeg del PATH o, si no hay, el que incluye imageio-ffmpeg (dependencia de moviepy)"""
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg:
+        return ffmpeg
+    import imageio_ffmpeg
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
 class BaseModel:
     """Clase base para todos los convertidores de audio"""
     
@@ -15,7 +71,82 @@ class BaseModel:
     
     def __init__(self, origin_name):
         self.origin = origin_name
+        # JobStore opcional: si se asigna, cada etapa de la conversión deja un checkpoint
+        # y una re-ejecución salta las etapas ya completadas
+        self.checkpoints = None
+        # Perfil de salida (formato y calidad); por defecto el de EKHO_OUTPUT_PROFILE
+        from model.output_profiles import get_profile
+        self.profile = get_profile()
+    
+    def get_task_key(self, url):
+        """Clave estable de la pista para sus checkpoints (cada conversor puede refinarla)"""
+        return url.strip() + self.profile_key_suffix()
     
+    def profile_key_suffix(self):
+        """Sufijo de la clave de checkpoints para perfiles distintos del MP3 por defecto
+        (la misma pista en otro formato es otro trabajo)"""
+        from model.output_profiles import DEFAULT_PROFILE
+        return "" if self.profile.name == DEFAULT_PROFILE else f"@{self.profile.name}"
+    
+    def source_key(self, video_id):
+        """Origen de un archivo en el índice de huellas: el vídeo y el perfil con el que se
+        convirtió (el mismo vídeo en FLAC no sustituye a su MP3)"""
+        return video_id + self.profile_key_suffix() if video_id else None
+    
+    def run_stage(self, task_key, stage, func, *args, validate=None):
+        """Ejecuta una etapa de conversión, con checkpoint si hay JobStore asignado.
+
+        Publica StageStarted/StageFinished en el bus de progreso.
+        """
+        guard = _stage_guard.get()
+        if guard is not None:
+            guard(stage)
+        with stage_events(task_key, stage):
+            if self.checkpoints is None:
+                return func(*args)
+            return self.checkpoints.run_stage(task_key, stage, func, *args, validate=validate)
+    
+    def get_completed_stage(self, task_key, stage, validate=None):
+        """Resultado de una etapa ya completada en una ejecución anterior (o None)"""
+        if self.checkpoints is None:
+            return None
+        return self.checkpoints.completed_stage(task_key, stage, validate=validate)
+    
+    @staticmethod
+    def fingerprint_audio(path):
+        """Huella acústica del audio ya transcodificado (None si no se pudo calcular)"""
+        from model.fingerprint import compute_fingerprint
+        try:
+            return compute_fingerprint(path)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo calcular la huella acústica: {e}")
+            return None
+
+    def find_converted_source(self, source_id):
+        """Archivo de la biblioteca ya convertido desde el mismo vídeo (None si no hay o EKHO_DEDUPE=off)"""
+        from model.fingerprint import DEDUPE_MODE, get_fingerprint_index
+        if DEDUPE_MODE == "off" or not source_id:
+            return None
+        try:
+            return get_fingerprint_index().find_by_source(source_id)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo consultar el índice de huellas: {e}")
+            return None
+
+    def index_fingerprint(self, path, fingerprint, source_id=None):
+        """Registra el archivo final en el índice de huellas y avisa si ya había otro con el mismo audio"""
+        if not fingerprint:
+            return
+        from model.fingerprint import get_fingerprint_index
+        try:
+            index = get_fingerprint_index()
+            for match in index.find_matches(fingerprint, exclude_path=path):
+                logger.warning(f"🔁 Posible duplicado ({match['similarity']:.0%} de coincidencia, "
+                               f"origen {match['origin'] or '?'}): {match['path']}")
+            index.add(path, fingerprint, origin=self.origin, source_id=source_id)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo registrar la huella acústica: {e}")
+
     def get_standard_metadata(self, title, artist):
         """Retorna metadatos estándares simplificados para cualquier plataforma"""            
         return {
@@ -24,9 +155,40 @@ class BaseModel:
             'origin': self.origin
         }
     
+    async def arun_stage(self, task_key, stage, runner, func, *args, validate=None):
+        """run_stage como corrutina: la etapa se ejecuta con runner (run_network o run_cpu).
+
+        La descarga espera antes a que quepa en el presupuesto de data/temp (scratch_space);
+        tras cada etapa se mide lo que la pista ocupa. aconvert libera la pista al terminar.
+        """
+        from model.scratch_space import get_scratch_budget
+        budget = get_scratch_budget()
+        if stage == "download":
+            await budget.acquire_download(task_key)
+        result = await runner(self.run_stage, task_key, stage, func, *args, validate=validate)
+        budget.measure(task_key, stage)
+        return result
+    
+    @staticmethod
+    def release_scratch(task_key):
+        """La pista ya no ocupa espacio temporal en vuelo (terminó, falló o se reutilizó)"""
+        from model.scratch_space import get_scratch_budget
+        get_scratch_budget().release(task_key)
+    
     def convert(self, url):
-        """Método abstracto que debe implementar cada conversor"""
-        raise NotImplementedError("Cada conversor debe implementar el método convert()")
+        """Convierte una URL bloqueando el hilo actual (envoltorio de aconvert)"""
+        return run_blocking(self.aconvert(url))
+    
+    async def aconvert(self, url):
+        """Método abstracto que debe implementar cada conversor (versión asíncrona de convert)"""
+        raise NotImplementedError("Cada conversor debe implementar el método aconvert()")
+    
+    async def aconvert_many(self, urls, concurrency=None):
+        """Convierte varias URLs a la vez con como mucho `concurrency` en vuelo.
+
+        Devuelve, en el orden de entrada, la ruta generada o la excepción de cada URL.
+        """
+        return await gather_bounded(self.aconvert, urls, concurrency)
     
     def get_supported_urls(self):
         """Retorna lista de patrones de URL soportados"""
@@ -56,10 +218,10 @@ class ConverterFactory:
         platform = BaseModel.detect_platform(url)
         
         if platform == BaseModel.ORIGIN_YOUTUBE:
-            from youtube2mp3_model import YouTube2MP3Converter
+            from model.youtube2mp3_model import YouTube2MP3Converter
             return YouTube2MP3Converter()
         elif platform == BaseModel.ORIGIN_SPOTIFY:
-            from spotify2mp3_model import Spotify2MP3Converter
+            from model.spotify2mp3_model import Spotify2MP3Converter
             return Spotify2MP3Converter()
         elif platform == BaseModel.ORIGIN_SOUNDCLOUD:
             # TODO: Implementar SoundCloudConverter en el futuro
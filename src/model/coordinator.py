@@ -0,0 +1,66 @@
+# coordinator.py
+"""
+Coordinador del modo distribuido
+
+Expande álbumes y playlists en trabajos por pista dentro de un JobStore compartido (SQLite
+en una ruta común) para que varios procesos 'work', en esta o en otras máquinas, los
+reclamen con lease. El coordinador no convierte nada: solo reparte y sigue el avance a
+partir de lo que los workers dejan en la base de datos (estados, heartbeats y progreso).
+"""
+
+import time
+from collections import deque
+
+from model.batch_model import BatchConverter
+from model.job_store import JOB_DONE, JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JobStore
+
+# Ventana para calcular el ritmo de pistas terminadas
+RATE_WINDOW_SECONDS = 60
+
+
+class Coordinator:
+    """Reparte trabajo por pista en un JobStore compartido y resume su estado"""
+
+    def __init__(self, store: JobStore):
+        self.store = store
+        # Solo se usa para expandir colecciones (sin checkpoints: no convierte)
+        self.expander = BatchConverter(jobs=1)
+        self._samples = deque()
+
+    def submit(self, urls):
+        """Expande las URLs en pistas y las encola (sin duplicar las ya encoladas o hechas).
+
+        Devuelve {'tracks', 'queued', 'skipped', 'failures'}: failures son los resultados de
+        las URLs que no se pudieron expandir (formato de BatchConverter).
+        """
+        tasks, failures = self.expander.expand_urls(urls)
+        queued = self.store.submit_many(tasks)
+        return {
+            'tracks': len(tasks),
+            'queued': queued,
+            'skipped': len(tasks) - queued,
+            'failures': failures,
+        }
+
+    def status(self):
+        """Trabajos por estado, avance por colección, workers activos y ritmo reciente"""
+        counts = self.store.counts()
+        finished = counts.get(JOB_DONE, 0) + counts.get(JOB_FAILED, 0)
+
+        now = time.monotonic()
+        self._samples.append((now, finished))
+        while len(self._samples) > 2 and now - self._samples[0][0] > RATE_WINDOW_SECONDS:
+            self._samples.popleft()
+        first_time, first_finished = self._samples[0]
+        elapsed = now - first_time
+        rate = (finished - first_finished) / elapsed if elapsed > 0 else 0.0
+
+        pending = counts.get(JOB_QUEUED, 0) + counts.get(JOB_RUNNING, 0)
+        return {
+            'jobs': counts,
+            'pending': pending,
+            'tracks_per_s': round(rate, 3),
+            'eta_s': round(pending / rate) if rate > 0 else None,
+            'collections': self.store.collection_counts(),
+            'workers': self.store.active_workers(),
+        }
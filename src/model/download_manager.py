@@ -0,0 +1,397 @@
+# download_manager.py
+"""
+Descargas reanudables con continuación por rangos de bytes
+
+Los datos parciales se guardan como archivos .part en el área temporal de cada trabajo
+(data/temp/<clave>). Si la conexión se corta, el siguiente intento (o la siguiente
+ejecución del lote) pide solo los bytes que faltan con cabeceras Range, de modo que
+en enlaces inestables el coste de reintentar se limita a lo no descargado.
+"""
+
+import os
+import re
+import json
+import math
+import time
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from model.conversor_model import get_data_dir
+from model.http_client import get_session
+from model.progress_events import report_download
+from model.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Tamaño de cada petición por rangos (igual que pytubefix: evita el throttling por conexión)
+RANGE_REQUEST_SIZE = 9 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+# Descarga segmentada: varias conexiones por archivo, cada una con su rango.
+# YouTube limita la velocidad por conexión, así que N conexiones ≈ N veces más rápido.
+CONNECTIONS_PER_FILE = int(os.environ.get("EKHO_DOWNLOAD_CONNECTIONS", "4"))
+CONNECTIONS_GLOBAL = int(os.environ.get("EKHO_DOWNLOAD_CONNECTIONS_GLOBAL", "16"))
+SEGMENT_MIN_SIZE = 1024 * 1024
+SEGMENT_MAX_SIZE = 8 * 1024 * 1024
+# Por debajo de este tamaño no compensa abrir varias conexiones
+SEGMENTED_MIN_FILE_SIZE = 2 * SEGMENT_MIN_SIZE
+
+_global_connections = threading.BoundedSemaphore(CONNECTIONS_GLOBAL)
+
+# Tolerancia al validar la duración (segundos o fracción de la duración esperada)
+DURATION_TOLERANCE_SECONDS = 2.0
+DURATION_TOLERANCE_RATIO = 0.05
+
+
+class IncompleteDownloadError(Exception):
+    """La descarga terminó con menos bytes (o menos duración) de los esperados"""
+
+
+class RangeNotSupportedError(Exception):
+    """El servidor ignora las cabeceras Range (no se puede segmentar)"""
+
+
+def configure_connections(per_file=None, global_limit=None):
+    """Ajusta el número de conexiones por archivo y el tope global del proceso"""
+    global CONNECTIONS_PER_FILE, CONNECTIONS_GLOBAL, _global_connections
+    if per_file is not None:
+        CONNECTIONS_PER_FILE = max(1, int(per_file))
+    if global_limit is not None:
+        CONNECTIONS_GLOBAL = max(1, int(global_limit))
+        _global_connections = threading.BoundedSemaphore(CONNECTIONS_GLOBAL)
+
+
+def connections_per_file():
+    """Conexiones por archivo vigentes (leer aquí, no importar la constante: configure_connections la cambia)"""
+    return CONNECTIONS_PER_FILE
+
+
+def job_temp_dir(job_key):
+    """Área temporal propia de un trabajo (se conserva entre intentos para poder reanudar)"""
+    safe_key = re.sub(r'[^\w.-]', '_', job_key)[:80] or "job"
+    return get_data_dir("temp", safe_key)
+
+
+def remove_job_temp_dir(job_key):
+    """Elimina el área temporal de un trabajo terminado"""
+    shutil.rmtree(job_temp_dir(job_key), ignore_errors=True)
+
+
+def _total_from_content_range(header):
+    """Extrae el tamaño total de una cabecera 'Content-Range: bytes a-b/total'"""
+    match = re.search(r'/(\d+)\s*$', header or '')
+    return int(match.group(1)) if match else None
+
+
+def get_remote_size(url, timeout=15):
+    """Tamaño del recurso remoto (HEAD o GET de 1 byte si el servidor no da Content-Length)"""
+    session = get_session()
+    try:
+        response = session.head(url, allow_redirects=True, timeout=timeout)
+        if response.ok and response.headers.get('Content-Length'):
+            return int(response.headers['Content-Length'])
+    except Exception:
+        pass
+
+    response = session.get(url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=timeout)
+    try:
+        if response.status_code == 206:
+            return _total_from_content_range(response.headers.get('Content-Range'))
+        if response.ok and response.headers.get('Content-Length'):
+            return int(response.headers['Content-Length'])
+    finally:
+        response.close()
+    return None
+
+
+def _fetch_range(url, part_path, start, end, timeout):
+    """Descarga bytes [start, end] y los añade al .part. Devuelve (bytes escritos, total remoto)"""
+    headers = {'Range': f"bytes={start}-" + (str(end) if end is not None else "")}
+    response = get_session().get(url, headers=headers, stream=True, timeout=timeout)
+    try:
+        if response.status_code == 416:
+            # Rango fuera del archivo: el .part ya está completo
+            return 0, _total_from_content_range(response.headers.get('Content-Range'))
+        response.raise_for_status()
+
+        if response.status_code == 200 and start > 0:
+            # El servidor ignoró el Range: empezar de cero para no corromper el archivo
+            logger.warning("⚠️ El servidor no admite rangos - reiniciando descarga")
+            mode, written_offset = 'wb', 0
+        else:
+            mode, written_offset = 'ab', start
+
+        total = _total_from_content_range(response.headers.get('Content-Range'))
+        if total is None and response.headers.get('Content-Length'):
+            total = written_offset + int(response.headers['Content-Length'])
+
+        written = 0
+        with open(part_path, mode) as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if chunk:
+                    f.write(chunk)
+                    written += len(chunk)
+                    report_download(written_offset + written, total)
+        if total is None and response.status_code == 200:
+            # Respuesta completa sin Content-Length: lo recibido es el archivo entero
+            total = written_offset + written
+        return written, total
+    finally:
+        response.close()
+
+
+def resumable_download(url, dest_path, expected_size=None, temp_dir=None, retries=5,
+                       timeout=30, range_size=RANGE_REQUEST_SIZE, connections=None):
+    """Descarga url en dest_path continuando cualquier .part previo.
+
+    - Con tamaño conocido y connections > 1 usa la descarga segmentada en paralelo.
+    - Si no, pide el archivo en rangos de range_size bytes (cada rango continúa el .part).
+    - Ante un error de red reintenta con backoff exponencial sin perder lo descargado.
+    - Al terminar valida el tamaño contra expected_size (o el total anunciado por el servidor)
+      y mueve el .part a dest_path. Un .part más grande que el total (restos de otra versión
+      del archivo) se descarta y la descarga empieza de cero una vez; si vuelve a pasar, se
+      borra y se lanza IncompleteDownloadError.
+    """
+    temp_dir = temp_dir or os.path.dirname(os.path.abspath(dest_path))
+    os.makedirs(temp_dir, exist_ok=True)
+    part_path = os.path.join(temp_dir, os.path.basename(dest_path) + ".part")
+    total = expected_size
+
+    if connections is None:
+        connections = CONNECTIONS_PER_FILE
+    if connections > 1 and total and total >= SEGMENTED_MIN_FILE_SIZE:
+        try:
+            segmented_download(url, part_path, total, connections=connections,
+                               retries=retries, timeout=timeout)
+            os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+            os.replace(part_path, dest_path)
+            return dest_path
+        except RangeNotSupportedError:
+            logger.warning("⚠️ El servidor no admite rangos - descarga en una sola conexión")
+
+    if os.path.exists(_segment_state_path(part_path)):
+        # .part reservado por una descarga segmentada: no es contiguo, empezar de cero
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        _remove_segment_state(part_path)
+
+    if os.path.exists(part_path) and os.path.getsize(part_path):
+        logger.info(f"♻️ Reanudando descarga desde {os.path.getsize(part_path) / 1024:.0f} KB")
+
+    attempt = 0
+    restarted = False
+    while True:
+        downloaded = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if total is not None and downloaded > total and not restarted:
+            logger.warning(f"⚠️ .part mayor que el archivo ({downloaded} de {total} bytes) - reiniciando descarga")
+            os.remove(part_path)
+            restarted = True
+            continue
+        if total is not None and downloaded >= total:
+            break
+
+        end = downloaded + range_size - 1
+        if total is not None:
+            end = min(end, total - 1)
+
+        try:
+            written, remote_total = _fetch_range(url, part_path, downloaded, end, timeout)
+        except Exception as e:
+            attempt += 1
+            if attempt > retries:
+                raise IncompleteDownloadError(
+                    f"Descarga interrumpida tras {retries} reintentos ({downloaded} bytes guardados): {e}")
+            delay = min(30, 2 ** attempt)
+            logger.warning(f"⚠️ Error de red ({e}) - reintento {attempt}/{retries} en {delay}s")
+            time.sleep(delay)
+            continue
+
+        attempt = 0
+        total = total or remote_total
+        if total is None and written == 0:
+            break  # Sin tamaño conocido: terminamos cuando el servidor no envía más datos
+        if total is None and written < range_size:
+            break
+
+    size = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    if total is not None and size != total:
+        # No reanudar sobre un .part que no corresponde al archivo: el siguiente intento empieza de cero
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise IncompleteDownloadError(f"Tamaño inesperado: {size} de {total} bytes")
+    if size == 0:
+        raise IncompleteDownloadError("La descarga no produjo datos")
+
+    os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+    os.replace(part_path, dest_path)
+    return dest_path
+
+
+def _plan_segments(total, connections):
+    """Divide [0, total) en segmentos de entre SEGMENT_MIN_SIZE y SEGMENT_MAX_SIZE bytes"""
+    size = min(SEGMENT_MAX_SIZE, max(SEGMENT_MIN_SIZE, math.ceil(total / connections)))
+    return [(start, min(start + size, total) - 1) for start in range(0, total, size)]
+
+
+def _segment_state_path(part_path):
+    return part_path + ".segments"
+
+
+def _remove_segment_state(part_path):
+    try:
+        os.remove(_segment_state_path(part_path))
+    except FileNotFoundError:
+        pass
+
+
+def _load_segment_state(part_path, total, segments):
+    """Segmentos ya completos de un intento anterior (también acepta un .part secuencial)"""
+    state_path = _segment_state_path(part_path)
+    if not os.path.exists(part_path):
+        return set()
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('size') == total and state.get('segments') == [list(s) for s in segments]:
+            return set(state.get('done', []))
+        return set()
+    except FileNotFoundError:
+        # .part de una descarga secuencial: sus primeros bytes son válidos
+        contiguous = os.path.getsize(part_path)
+        return {i for i, (_, end) in enumerate(segments) if end < contiguous}
+    except (OSError, ValueError):
+        return set()
+
+
+def _save_segment_state(part_path, total, segments, done):
+    state_path = _segment_state_path(part_path)
+    with open(state_path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump({'size': total, 'segments': [list(s) for s in segments], 'done': sorted(done)}, f)
+    os.replace(state_path + ".tmp", state_path)
+
+
+def _pwrite(fd, data, offset, lock):
+    """Escribe en una posición del archivo sin mover un puntero compartido"""
+    if hasattr(os, "pwrite"):
+        while data:
+            written = os.pwrite(fd, data, offset)
+            data = data[written:]
+            offset += written
+    else:
+        with lock:
+            os.lseek(fd, offset, os.SEEK_SET)
+            os.write(fd, data)
+
+
+def _fetch_segment(url, fd, start, end, timeout, lock):
+    """Descarga bytes [start, end] directamente en su posición del .part"""
+    headers = {'Range': f"bytes={start}-{end}", 'Accept-Encoding': 'identity'}
+    response = get_session().get(url, headers=headers, stream=True, timeout=timeout)
+    try:
+        response.raise_for_status()
+        if response.status_code != 206:
+            raise RangeNotSupportedError()
+
+        # Búfer reutilizado por segmento: los datos van del socket al archivo sin
+        # concatenaciones ni copias intermedias
+        buffer = bytearray(CHUNK_SIZE)
+        view = memoryview(buffer)
+        offset = start
+        while offset <= end:
+            read = response.raw.readinto(view)
+            if not read:
+                break
+            read = min(read, end - offset + 1)
+            _pwrite(fd, view[:read], offset, lock)
+            offset += read
+        if offset != end + 1:
+            raise IncompleteDownloadError(f"Segmento {start}-{end} cortado en {offset}")
+    finally:
+        response.close()
+
+
+def segmented_download(url, part_path, total, connections=None, retries=5, timeout=30):
+    """Descarga un archivo de tamaño conocido en segmentos paralelos sobre un mismo .part.
+
+    El .part se reserva con su tamaño final y cada conexión escribe su rango en el
+    desplazamiento que le corresponde. Los segmentos terminados se anotan en
+    <part>.segments para que una descarga interrumpida continúe solo con lo pendiente.
+    Las conexiones se limitan por archivo (connections) y en todo el proceso
+    (CONNECTIONS_GLOBAL, compartido por todas las descargas simultáneas).
+    """
+    connections = max(1, connections or CONNECTIONS_PER_FILE)
+    segments = _plan_segments(total, connections)
+    done = _load_segment_state(part_path, total, segments)
+    pending = [i for i in range(len(segments)) if i not in done]
+    if done:
+        logger.info(f"♻️ Reanudando descarga: {len(done)}/{len(segments)} segmentos ya descargados")
+
+    # El estado se crea antes de reservar el .part para no confundirlo con uno secuencial
+    _save_segment_state(part_path, total, segments, done)
+    fd = os.open(part_path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0))
+    lock = threading.Lock()
+    try:
+        os.ftruncate(fd, total)
+
+        def fetch(index):
+            start, end = segments[index]
+            for attempt in range(retries + 1):
+                try:
+                    with _global_connections:
+                        _fetch_segment(url, fd, start, end, timeout, lock)
+                    break
+                except RangeNotSupportedError:
+                    raise
+                except Exception as e:
+                    if attempt >= retries:
+                        raise IncompleteDownloadError(f"Segmento {start}-{end}: {e}")
+                    time.sleep(min(30, 2 ** attempt))
+            with lock:
+                done.add(index)
+                _save_segment_state(part_path, total, segments, done)
+
+        with ThreadPoolExecutor(max_workers=min(connections, len(pending) or 1),
+                                thread_name_prefix="ekho-segment") as executor:
+            for future in [executor.submit(fetch, index) for index in pending]:
+                future.result()
+                # Se publica desde este hilo, que es el que conoce la pista en curso
+                with lock:
+                    completed = sum(segments[i][1] - segments[i][0] + 1 for i in done)
+                report_download(completed, total)
+    finally:
+        os.close(fd)
+
+    _remove_segment_state(part_path)
+    return part_path
+
+
+def get_audio_duration(path):
+    """Duración en segundos según mutagen, o None si el formato no se puede leer"""
+    try:
+        import mutagen
+        audio = mutagen.File(path)
+        if audio is not None and audio.info is not None:
+            return float(audio.info.length)
+    except Exception:
+        pass
+    return None
+
+
+def validate_audio_file(path, expected_size=None, expected_duration=None):
+    """Comprueba tamaño y duración de un archivo descargado; lanza IncompleteDownloadError si no cuadra"""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        raise IncompleteDownloadError(f"Archivo vacío o inexistente: {path}")
+
+    size = os.path.getsize(path)
+    if expected_size and size != expected_size:
+        raise IncompleteDownloadError(f"Tamaño inesperado: {size} de {expected_size} bytes")
+
+    if expected_duration:
+        duration = get_audio_duration(path)
+        if duration is not None:
+            tolerance = max(DURATION_TOLERANCE_SECONDS, expected_duration * DURATION_TOLERANCE_RATIO)
+            if duration + tolerance < expected_duration:
+                raise IncompleteDownloadError(
+                    f"Audio truncado: {duration:.1f}s de {expected_duration:.1f}s esperados")
+    return True
@@ -0,0 +1,438 @@
+# fingerprint.py
+"""
+Huellas acústicas (al estilo de Chromaprint) e índice de duplicados de la biblioteca
+
+La misma canción puede acabar dos veces en data/music: convertida desde Spotify como
+'Artista - Título.mp3' y desde YouTube con el título del vídeo. Los nombres y las
+etiquetas difieren, pero el audio no. Cada conversión calcula una huella justo después de
+transcodificar y la registra junto a la ruta final:
+
+- El audio se decodifica a mono a 11025 Hz (solo los primeros FINGERPRINT_SECONDS) y se
+  divide en tramas de 4096 muestras con solape de 2/3.
+- De cada trama se obtiene su croma (energía de las 12 clases de altura entre 28 Hz y
+  3.5 kHz), suavizado en el tiempo y normalizado.
+- Cada trama se resume en un entero de 32 bits comparando bandas de croma entre sí (20
+  bits, estables frente a recodificaciones) y con la trama anterior (12 bits).
+
+Dos huellas se comparan por la proporción de bits iguales en el mejor desfase; el índice
+(SQLite en data/fingerprints) guarda los 20 bits estables de cada trama como claves de un
+índice invertido, así que buscar candidatos cuesta lo que sus listas de claves, no un
+recorrido por toda la biblioteca. Solo los candidatos con suficientes claves en común se
+comparan bit a bit, y solo en los desfases que esas claves señalan.
+
+También guarda el vídeo de origen de cada archivo: si una conversión va a descargar un
+vídeo que ya está en la biblioteca con otro nombre, se reutiliza el archivo existente
+(EKHO_DEDUPE=off lo desactiva).
+"""
+
+import os
+import base64
+import sqlite3
+import datetime
+import threading
+import subprocess
+from collections import Counter
+
+import numpy as np
+
+from model.conversor_model import get_data_dir, get_ffmpeg_exe
+from model.audio_tags import read_comment
+from model.job_store import _Transaction
+from model.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+SAMPLE_RATE = 11025
+FRAME_SIZE = 4096
+HOP_SIZE = FRAME_SIZE // 3
+MIN_FREQ = 28.0
+MAX_FREQ = 3520.0
+# Audio analizado por pista: suficiente para distinguir canciones y acotar el coste
+FINGERPRINT_SECONDS = 120
+# Tramas de croma promediadas para suavizar
+SMOOTHING_FRAMES = 3
+# Tramas con menos energía que esta fracción del máximo se consideran silencio (sin claves)
+SILENCE_RATIO = 1e-4
+
+# Bits estables (comparaciones dentro de la trama) en la parte alta del código
+KEY_SHIFT = 12
+
+# Proporción de bits iguales a partir de la que dos huellas son la misma grabación
+# (dos canciones distintas rondan 0.5)
+MATCH_THRESHOLD = 0.8
+# Claves en común necesarias para comparar a fondo un candidato
+MIN_KEY_HITS = 8
+MIN_KEY_RATIO = 0.05
+# Mínimo de tramas solapadas para que una comparación cuente
+MIN_OVERLAP_FRAMES = 40
+# Candidatos (los de más claves en común) que se comparan bit a bit por búsqueda
+MAX_CANDIDATES = 10
+# Desfases (en tramas) más votados que se comprueban por candidato
+OFFSET_CANDIDATES = 3
+# Diferencia de duración tolerada entre duplicados
+DURATION_TOLERANCE_SECONDS = 10.0
+DURATION_TOLERANCE_RATIO = 0.1
+
+# off: no reutilizar; source: reutilizar el archivo si el vídeo de origen ya está en la biblioteca
+DEDUPE_MODE = os.environ.get("EKHO_DEDUPE", "source").lower()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    origin TEXT,
+    source_id TEXT,
+    duration REAL,
+    size INTEGER,
+    fingerprint BLOB NOT NULL,
+    audible BLOB NOT NULL,
+    added_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tracks_source ON tracks(source_id);
+CREATE TABLE IF NOT EXISTS fingerprint_keys (
+    key INTEGER NOT NULL,
+    track_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (key, track_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_fingerprint_keys_track ON fingerprint_keys(track_id);
+"""
+
+
+def _decode(path, seconds=FINGERPRINT_SECONDS):
+    """Muestras mono a SAMPLE_RATE (float32 en [-1, 1]) de los primeros `seconds` segundos"""
+    command = [get_ffmpeg_exe(), "-v", "error", "-nostdin", "-i", path, "-t", str(seconds),
+               "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-"]
+    completed = subprocess.run(command, capture_output=True, check=True)
+    return np.frombuffer(completed.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def _chroma_matrix():
+    """Matriz (bins de FFT x 12) que suma cada bin en su clase de altura"""
+    freqs = np.fft.rfftfreq(FRAME_SIZE, 1.0 / SAMPLE_RATE)
+    matrix = np.zeros((len(freqs), 12), dtype=np.float32)
+    in_range = (freqs >= MIN_FREQ) & (freqs <= MAX_FREQ)
+    notes = np.round(12 * np.log2(freqs[in_range] / 440.0) + 69).astype(int) % 12
+    matrix[np.nonzero(in_range)[0], notes] = 1.0
+    return matrix
+
+
+_CHROMA = _chroma_matrix()
+_WINDOW = np.hanning(FRAME_SIZE).astype(np.float32)
+
+
+def _codes(samples):
+    """Códigos de 32 bits por trama y máscara de tramas con sonido"""
+    if len(samples) < FRAME_SIZE:
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=bool)
+    frames = np.lib.stride_tricks.sliding_window_view(samples, FRAME_SIZE)[::HOP_SIZE]
+    spectrum = np.abs(np.fft.rfft(frames * _WINDOW, axis=1)) ** 2
+    chroma = spectrum @ _CHROMA
+    energy = chroma.sum(axis=1)
+    audible = energy > energy.max() * SILENCE_RATIO
+
+    # Suavizado temporal y normalización por trama
+    kernel = np.ones(SMOOTHING_FRAMES, dtype=np.float32) / SMOOTHING_FRAMES
+    chroma = np.apply_along_axis(lambda band: np.convolve(band, kernel, mode="same"), 0, chroma)
+    chroma /= np.linalg.norm(chroma, axis=1, keepdims=True) + 1e-12
+
+    rolled = np.roll(chroma, -1, axis=1)
+    pairs = chroma + rolled
+    previous = np.vstack([chroma[:1], chroma[:-1]])
+    bits = np.concatenate([
+        chroma > rolled,                                   # 12: cada clase frente a la siguiente
+        pairs[:, :8] > np.roll(pairs, -6, axis=1)[:, :8],  # 8: pares frente al tritono opuesto
+        chroma > previous,                                 # 12: subida respecto a la trama anterior
+    ], axis=1)
+    weights = (np.uint64(1) << np.arange(31, -1, -1, dtype=np.uint64))
+    codes = (bits.astype(np.uint64) * weights).sum(axis=1).astype(np.uint32)
+    return codes, audible
+
+
+def compute_fingerprint(path):
+    """Huella de un archivo de audio: {'codes': base64 de uint32, 'audible': base64, 'duration'}"""
+    samples = _decode(path)
+    codes, audible = _codes(samples)
+    duration = _audio_duration(path) or len(samples) / SAMPLE_RATE
+    return {
+        'codes': base64.b64encode(codes.astype('<u4').tobytes()).decode("ascii"),
+        'audible': base64.b64encode(np.packbits(audible).tobytes()).decode("ascii"),
+        'frames': len(codes),
+        'duration': round(duration, 2),
+    }
+
+
+def _audio_duration(path):
+    try:
+        import mutagen
+        audio = mutagen.File(path)
+        return float(audio.info.length) if audio is not None and audio.info else None
+    except Exception:
+        return None
+
+
+def _unpack(fingerprint):
+    codes = np.frombuffer(base64.b64decode(fingerprint['codes']), dtype='<u4')
+    audible = np.unpackbits(np.frombuffer(base64.b64decode(fingerprint['audible']), dtype=np.uint8))
+    return codes, audible[:len(codes)].astype(bool)
+
+
+def _keys(codes, audible):
+    """Claves estables distintas (solo tramas con sonido) -> primera posición en que aparecen"""
+    keys = {}
+    for position, key in enumerate((codes >> KEY_SHIFT).tolist()):
+        if audible[position] and key not in keys:
+            keys[key] = position
+    return keys
+
+
+def _count_bits(codes):
+    """Bits a 1 en total (np.bitwise_count solo existe desde NumPy 2.0)"""
+    if hasattr(np, "bitwise_count"):
+        return int(np.bitwise_count(codes).sum())
+    return int(np.unpackbits(np.ascontiguousarray(codes).view(np.uint8)).sum())
+
+
+def similarity_at(a, b, offset):
+    """Proporción de bits iguales con b desplazada `offset` tramas respecto de a (None si no solapan)"""
+    if offset >= 0:
+        a = a[offset:]
+    else:
+        b = b[-offset:]
+    n = min(len(a), len(b))
+    if n < MIN_OVERLAP_FRAMES:
+        return None
+    differing = _count_bits(np.bitwise_xor(a[:n], b[:n]))
+    return 1.0 - float(differing) / (32 * n)
+
+
+def best_similarity(a, b, offsets):
+    """Mejor similitud entre dos secuencias de códigos en los desfases dados (y sus vecinos)"""
+    best = 0.0
+    for offset in {o + d for o in offsets for d in (-1, 0, 1)}:
+        score = similarity_at(a, b, offset)
+        if score is not None and score > best:
+            best = score
+    return best
+
+
+def durations_match(first, second):
+    if not first or not second:
+        return True
+    tolerance = max(DURATION_TOLERANCE_SECONDS, DURATION_TOLERANCE_RATIO * max(first, second))
+    return abs(first - second) <= tolerance
+
+
+def read_origin(path):
+    """Origen guardado en el comentario 'Origen: ...' del archivo (None si no tiene)"""
+    comment = read_comment(path) or ""
+    if comment.startswith("Origen:"):
+        return comment.split(":", 1)[1].strip() or None
+    return None
+
+
+def keep_priority(track):
+    """Clave de orden entre duplicados: primero los de Spotify (etiquetas completas), luego el mayor"""
+    from_spotify = (track.get('origin') or "").lower() == "spotify"
+    return (not from_spotify, -(track.get('size') or 0), track.get('added_at') or "")
+
+
+def _now():
+    return datetime.datetime.now().isoformat()
+
+
+class FingerprintIndex:
+    """Índice invertido de huellas de la biblioteca (SQLite, una conexión por hilo)"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(get_data_dir("fingerprints"), "index.db")
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return _Transaction(conn)
+
+    def add(self, path, fingerprint, origin=None, source_id=None):
+        """Registra (o reemplaza) la huella de un archivo de la biblioteca; devuelve su id"""
+        path = os.path.abspath(path)
+        codes, audible = _unpack(fingerprint)
+        keys = _keys(codes, audible)
+        size = os.path.getsize(path) if os.path.exists(path) else None
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT id FROM tracks WHERE path = ?", (path,)).fetchone()
+            if row:
+                conn.execute("DELETE FROM fingerprint_keys WHERE track_id = ?", (row['id'],))
+                conn.execute("DELETE FROM tracks WHERE id = ?", (row['id'],))
+            cursor = conn.execute(
+                "INSERT INTO tracks (path, origin, source_id, duration, size, fingerprint, audible, added_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, origin, source_id, fingerprint['duration'], size,
+                 codes.astype('<u4').tobytes(), np.packbits(audible).tobytes(), _now()))
+            track_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO fingerprint_keys (key, track_id, position) VALUES (?, ?, ?)",
+                [(key, track_id, position) for key, position in keys.items()])
+        return track_id
+
+    def remove(self, path):
+        """Olvida un archivo (borrado o sustituido)"""
+        path = os.path.abspath(path)
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT id FROM tracks WHERE path = ?", (path,)).fetchone()
+            if row:
+                conn.execute("DELETE FROM fingerprint_keys WHERE track_id = ?", (row['id'],))
+                conn.execute("DELETE FROM tracks WHERE id = ?", (row['id'],))
+        return row is not None
+
+    def find_by_source(self, source_id):
+        """Ruta de un archivo existente convertido desde el mismo vídeo, o None"""
+        if not source_id:
+            return None
+        with self._connect() as conn:
+            rows = conn.execute("SELECT path FROM tracks WHERE source_id = ?", (source_id,)).fetchall()
+        for row in rows:
+            if os.path.exists(row['path']):
+                return row['path']
+        return None
+
+    def find_matches(self, fingerprint, exclude_path=None):
+        """Archivos de la biblioteca con el mismo audio: [{'path', 'similarity', ...}] de mejor a peor"""
+        codes, audible = _unpack(fingerprint)
+        keys = _keys(codes, audible)
+        if not keys:
+            return []
+        exclude_path = os.path.abspath(exclude_path) if exclude_path else None
+
+        # Votos por candidato y por desfase a partir de las claves compartidas
+        votes = Counter()
+        offsets = {}
+        items = list(keys.items())
+        with self._connect() as conn:
+            for start in range(0, len(items), 500):
+                chunk = dict(items[start:start + 500])
+                placeholders = ",".join("?" * len(chunk))
+                for row in conn.execute(
+                        f"SELECT key, track_id, position FROM fingerprint_keys WHERE key IN ({placeholders})",
+                        list(chunk)):
+                    votes[row['track_id']] += 1
+                    offsets.setdefault(row['track_id'], Counter())[chunk[row['key']] - row['position']] += 1
+
+            needed = max(MIN_KEY_HITS, int(len(keys) * MIN_KEY_RATIO))
+            candidates = [track_id for track_id, hits in votes.most_common(MAX_CANDIDATES) if hits >= needed]
+            matches = []
+            for track_id in candidates:
+                row = conn.execute("SELECT * FROM tracks WHERE id = ?", (track_id,)).fetchone()
+                if row is None or row['path'] == exclude_path:
+                    continue
+                if not durations_match(fingerprint['duration'], row['duration']):
+                    continue
+                top_offsets = [offset for offset, _ in offsets[track_id].most_common(OFFSET_CANDIDATES)]
+                score = best_similarity(codes, np.frombuffer(row['fingerprint'], dtype='<u4'), top_offsets)
+                if score >= MATCH_THRESHOLD:
+                    matches.append({'id': row['id'], 'path': row['path'], 'origin': row['origin'],
+                                    'duration': row['duration'], 'size': row['size'],
+                                    'similarity': round(score, 3)})
+        matches.sort(key=lambda match: match['similarity'], reverse=True)
+        return matches
+
+    def tracks(self):
+        """Todos los archivos indexados (sin la huella)"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, path, origin, source_id, duration, size, added_at FROM tracks ORDER BY id").fetchall()
+        return [dict(row) for row in rows]
+
+    def fingerprint_of(self, track_id):
+        """Huella guardada de un archivo indexado, en el formato de compute_fingerprint"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT fingerprint, audible, duration FROM tracks WHERE id = ?",
+                               (track_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            'codes': base64.b64encode(row['fingerprint']).decode("ascii"),
+            'audible': base64.b64encode(row['audible']).decode("ascii"),
+            'frames': len(row['fingerprint']) // 4,
+            'duration': row['duration'],
+        }
+
+    def scan(self, paths, progress=None):
+        """Indexa los archivos que aún no están en el índice (o que cambiaron de tamaño).
+
+        Devuelve {'indexed', 'skipped', 'failed'}; progress(path) se llama antes de cada archivo.
+        """
+        with self._connect() as conn:
+            known = {row['path']: row['size'] for row in conn.execute("SELECT path, size FROM tracks")}
+        summary = {'indexed': 0, 'skipped': 0, 'failed': 0}
+        for path in paths:
+            path = os.path.abspath(path)
+            if path in known and known[path] == os.path.getsize(path):
+                summary['skipped'] += 1
+                continue
+            if progress:
+                progress(path)
+            try:
+                self.add(path, compute_fingerprint(path), origin=read_origin(path))
+                summary['indexed'] += 1
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo indexar {os.path.basename(path)}: {e}")
+                summary['failed'] += 1
+        return summary
+
+    def prune(self):
+        """Olvida los archivos indexados que ya no existen; devuelve cuántos"""
+        missing = [track['path'] for track in self.tracks() if not os.path.exists(track['path'])]
+        for path in missing:
+            self.remove(path)
+        return len(missing)
+
+    def duplicate_groups(self):
+        """Grupos de archivos con el mismo audio, cada uno ordenado del que conviene conservar al resto"""
+        tracks = {track['id']: track for track in self.tracks()}
+        parent = {track_id: track_id for track_id in tracks}
+
+        def find(track_id):
+            while parent[track_id] != track_id:
+                parent[track_id] = parent[parent[track_id]]
+                track_id = parent[track_id]
+            return track_id
+
+        for track_id, track in tracks.items():
+            for match in self.find_matches(self.fingerprint_of(track_id), exclude_path=track['path']):
+                if match['id'] in parent:
+                    parent[find(match['id'])] = find(track_id)
+
+        groups = {}
+        for track_id in tracks:
+            groups.setdefault(find(track_id), []).append(tracks[track_id])
+        return [sorted(group, key=keep_priority) for group in groups.values() if len(group) > 1]
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_fingerprint_index():
+    """Índice compartido del proceso (data/fingerprints/index.db)"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = FingerprintIndex()
+        return _index
@@ -0,0 +1,217 @@
+# html_metadata.py
+"""
+Extracción de metadatos de páginas públicas de Spotify en una sola pasada
+
+Los métodos alternativos (página principal, embed) necesitan unos pocos campos: título,
+meta tags Open Graph, nombre del álbum, portada y, en la página embed, el JSON con la
+pista. En lugar de recorrer el HTML completo una vez por patrón (y otra vez por cada
+campo que falta), la página se recorre una sola vez por zonas con patrones precompilados:
+el <head> para título y meta tags, los <script> JSON y las apariciones de "album". El
+recorrido se detiene en cuanto están los grupos de campos pedidos.
+
+Además, la respuesta se lee como mucho hasta MAX_HTML_BYTES (las páginas de Spotify
+arrastran cientos de KB de scripts que no aportan nada) y el JSON embebido se recorre con
+un presupuesto de nodos en lugar de hasta una profundidad arbitraria.
+"""
+
+import os
+import re
+import json
+from collections import deque
+
+# Bytes máximos que se leen de una página (los meta tags y el JSON de la pista van al principio)
+MAX_HTML_BYTES = int(os.environ.get("EKHO_HTML_MAX_BYTES", str(512 * 1024)))
+READ_CHUNK_SIZE = 16 * 1024
+# Nodos máximos que se visitan buscando la pista dentro de un JSON embebido
+MAX_JSON_NODES = 2000
+
+# Cabecera: título y meta tags en una sola pasada que termina en cuanto están los pedidos.
+# Sin IGNORECASE: Spotify sirve las etiquetas en minúsculas y así el motor busca el literal
+_HEAD_PATTERN = re.compile(
+    r'<(?:title[^>]*>(?P<title>[^<]+)</title>'
+    r'|meta\s+(?:property|name)="(?P<meta>og:title|og:description|og:image|music:album)"'
+    r'\s+content="(?P<content>[^"]*)")')
+HEAD_FIELDS = {"title", "og:title", "og:description", "og:image", "music:album"}
+
+# Cuerpo: un único recorrido por las apariciones del literal "album" (el motor de re lo
+# busca muy rápido, a diferencia de una alternancia que empieza por '"', carácter muy
+# frecuente en los scripts); las formas conocidas se comprueban con lookbehind en el sitio.
+# Las distancias van acotadas ({0,500}) para no barrer la página cuando no encajan.
+_ALBUM_PATTERN = re.compile(
+    r'album(?:(?<="album)"\s*:\s*\{[^{}]{0,500}?"name"\s*:\s*"(?P<album_json>[^"]+)"'
+    r'|(?<="album)Name"\s*:\s*"(?P<album_name>[^"]+)"'
+    r'|(?<=data-testid="album)"[^>]{0,200}>(?P<album_testid>[^<]+)<)')
+ALBUM_BODY_FIELDS = {"album_json", "album_name", "album_testid"}
+_IMAGE_PATTERN = re.compile(r'"(?:image|cover)"\s*:\s*\{[^{}]{0,500}?"url"\s*:\s*"([^"]+)"')
+_JSON_SCRIPT_PATTERN = re.compile(r'<script[^>]*type=["\']application/json["\'][^>]*>([^<]+)</script>',
+                                  re.IGNORECASE)
+
+# Orden de preferencia entre las distintas formas de encontrar el álbum
+ALBUM_FIELDS = ("album_json", "album_name", "album_testid", "music:album")
+IMAGE_FIELDS = ("og:image", "image_json")
+_NOT_ALBUMS = {'track', 'single', 'music:album:track'}
+
+# Grupos de campos que bastan para dejar de recorrer cada página (ver scan_html).
+# music:album no cuenta para parar: suele ser la URL del álbum y el nombre va más abajo
+MAIN_PAGE_FIELDS = [
+    ("title",), ("og:title",), ("og:image",),
+    ("album_json", "album_name", "album_testid"),
+]
+EMBED_FIELDS = [("json_track",)]
+# Si la página embed no trae JSON con la pista, se recurre a sus meta tags
+EMBED_META_FIELDS = [("og:title", "title"), ("og:image",)]
+
+# Claves del JSON por las que se baja primero buscando la pista
+_TRACK_CONTAINERS = ('track', 'item', 'entity', 'data')
+
+
+def read_capped(response, limit=MAX_HTML_BYTES):
+    """Lee el cuerpo de una respuesta (pedida con stream=True) hasta `limit` bytes"""
+    chunks = []
+    remaining = limit
+    try:
+        for chunk in response.iter_content(READ_CHUNK_SIZE):
+            chunks.append(chunk[:remaining])
+            remaining -= len(chunk)
+            if remaining <= 0:
+                break
+    finally:
+        response.close()
+    return b"".join(chunks).decode(response.encoding or "utf-8", errors="replace")
+
+
+def find_track_in_json(data, max_nodes=MAX_JSON_NODES):
+    """Busca en anchura el primer objeto con nombre y artista(s); visita como mucho max_nodes"""
+    queue = deque([data])
+    visited = 0
+    while queue and visited < max_nodes:
+        node = queue.popleft()
+        visited += 1
+        if isinstance(node, dict):
+            track = _track_from_json_object(node)
+            if track:
+                return track
+            # Primero los contenedores habituales de la pista, luego el resto
+            children = [node[key] for key in _TRACK_CONTAINERS if key in node]
+            children += [value for key, value in node.items() if key not in _TRACK_CONTAINERS]
+            queue.extend(child for child in children if isinstance(child, (dict, list)))
+        elif isinstance(node, list):
+            queue.extend(item for item in node if isinstance(item, (dict, list)))
+    return None
+
+
+def _track_from_json_object(data):
+    """Diccionario corto de metadatos si el objeto JSON describe una pista"""
+    if not data.get('name') or not ('artist' in data or 'artists' in data):
+        return None
+    result = {'name': data['name']}
+
+    if isinstance(data.get('artists'), list):
+        artists = [artist.get('name', '') if isinstance(artist, dict) else str(artist)
+                   for artist in data['artists']]
+        result['artist'] = ', '.join(filter(None, artists))
+    elif 'artist' in data:
+        artist = data['artist']
+        result['artist'] = artist.get('name', '') if isinstance(artist, dict) else str(artist)
+
+    album = data.get('album')
+    if isinstance(album, dict):
+        result['album'] = album.get('name', 'Unknown Album')
+        if album.get('images'):
+            result['image_url'] = album['images'][0].get('url', '')
+    cover = data.get('coverArt')
+    if 'image_url' not in result and isinstance(cover, dict) and cover.get('sources'):
+        result['image_url'] = cover['sources'][0].get('url', '')
+
+    # Duración en milisegundos: duration_ms (API), duration (embed) o duration.totalMilliseconds
+    duration = data.get('duration_ms', data.get('duration'))
+    if isinstance(duration, dict):
+        duration = duration.get('totalMilliseconds')
+    if isinstance(duration, (int, float)) and duration > 0:
+        result['duration'] = int(duration) // 1000
+    return result
+
+
+def scan_html(html, groups, limit=MAX_HTML_BYTES):
+    """Extrae los campos pedidos recorriendo el HTML una vez y devuelve {campo: valor}.
+
+    groups es una lista de tuplas de campos; el recorrido termina en cuanto cada grupo tiene
+    al menos uno de sus campos. Solo se mira hasta `limit` caracteres. El campo especial
+    'json_track' es la primera pista encontrada en un <script type="application/json">.
+    """
+    fields = {}
+    pending = [set(group) for group in groups]
+    end = min(len(html), limit)
+    start = 0
+
+    # 1. Cabecera (se deja de mirar en cuanto no queda ningún grupo de cabecera pendiente)
+    head_groups = [group for group in pending if group & HEAD_FIELDS]
+    if head_groups:
+        for match in _HEAD_PATTERN.finditer(html, 0, end):
+            start = match.end()
+            name = match.lastgroup
+            if name == "title":
+                value = match.group("title")
+            else:
+                name, value = match.group("meta"), match.group("content")
+            if name in fields or not value:
+                continue
+            fields[name] = value.strip()
+            head_groups = [group for group in head_groups if name not in group]
+            if not head_groups:
+                break
+        pending = [group for group in pending if not group & fields.keys()]
+
+    # 2. JSON embebido con la pista
+    if any("json_track" in group for group in pending):
+        for match in _JSON_SCRIPT_PATTERN.finditer(html, start, end):
+            track = _track_from_script(match.group(1))
+            if track:
+                fields["json_track"] = track
+                pending = [group for group in pending if "json_track" not in group]
+                break
+
+    # 3. Álbum: un recorrido por las apariciones de "album"
+    if any(group & ALBUM_BODY_FIELDS for group in pending):
+        for match in _ALBUM_PATTERN.finditer(html, start, end):
+            name = match.lastgroup
+            if name not in fields:
+                fields[name] = match.group(name).strip()
+            # Se prefiere album_json: con cualquier otra forma se sigue buscando
+            if name == "album_json":
+                break
+        pending = [group for group in pending if not group & fields.keys()]
+
+    # 4. Portada en JSON, solo si la cabecera no traía og:image
+    if any("image_json" in group for group in pending):
+        match = _IMAGE_PATTERN.search(html, start, end)
+        if match:
+            fields["image_json"] = match.group(1)
+
+    return fields
+
+
+def _track_from_script(text):
+    try:
+        return find_track_in_json(json.loads(text))
+    except (json.JSONDecodeError, ValueError):
+        return None
+
+
+def pick_album(fields):
+    """Nombre de álbum más fiable entre los campos encontrados"""
+    for name in ALBUM_FIELDS:
+        album = fields.get(name, '')
+        # music:album suele ser la URL del álbum, no su nombre
+        if (album and not album.isdigit() and len(album) > 1 and
+                album.lower() not in _NOT_ALBUMS and not album.startswith("http")):
+            return album
+    return 'Unknown Album'
+
+
+def pick_image(fields):
+    """URL de portada entre los campos encontrados"""
+    for name in IMAGE_FIELDS:
+        if fields.get(name):
+            return fields[name]
+    return ''
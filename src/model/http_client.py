@@ -0,0 +1,42 @@
+# http_client.py
+"""
+Sesión HTTP compartida para portadas, thumbnails y consultas auxiliares
+
+Reutilizar una única requests.Session mantiene vivas las conexiones (keep-alive) entre
+pistas y trabajos, en lugar de abrir una conexión TCP/TLS nueva por cada descarga.
+"""
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Conexiones por host que se mantienen abiertas en el pool
+POOL_MAXSIZE = 16
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Retorna la sesión HTTP compartida del proceso (se crea en el primer uso)"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_MAXSIZE, pool_maxsize=POOL_MAXSIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers['User-Agent'] = "Mozilla/5.0 (Ekho Music Converter)"
+                _session = session
+    return _session
+
+
+def close_session():
+    """Cierra la sesión compartida (al apagar el daemon)"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
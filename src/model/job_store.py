@@ -0,0 +1,441 @@
+# job_store.py
+"""
+Cola persistente de trabajos de conversión sobre SQLite
+
+Cada trabajo es una URL con su estado (queued, running, done, failed, cancelled).
+La base de datos sobrevive a reinicios: los trabajos que quedaron en 'running' tras una
+caída vuelven a la cola al arrancar. Varias hebras y procesos pueden compartir el archivo
+(modo WAL + transacciones IMMEDIATE para reclamar trabajos sin duplicados).
+
+Además guarda checkpoints por pista y etapa (task_stages): al reanudar un lote
+interrumpido, las etapas ya completadas se reutilizan y solo se repite lo que falta.
+
+Modo distribuido (varios procesos o máquinas sobre la misma base de datos): un trabajo
+se reclama con un lease (lease_expires_at) que su worker renueva con heartbeat mientras
+convierte, junto con su progreso. Si el worker muere, el lease caduca y otro worker
+retoma el trabajo aprovechando los checkpoints compartidos; las escrituras de resultado
+de un worker que perdió su lease se ignoran.
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import datetime
+import threading
+
+from model.conversor_model import BaseModel, get_data_dir
+from model.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Estados de un trabajo
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+FINAL_STATES = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+# Estados de una etapa de una pista (metadata, search, download, tag, finalize...)
+STAGE_DONE = "done"
+STAGE_FAILED = "failed"
+
+# Modo de diario de SQLite: WAL requiere memoria compartida, así que en una carpeta de red
+# (NFS/SMB) compartida entre máquinas hay que usar DELETE
+JOURNAL_MODE = os.environ.get("EKHO_JOBS_JOURNAL_MODE", "WAL").upper()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    platform TEXT,
+    status TEXT NOT NULL,
+    output TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    collection TEXT,
+    lease_expires_at REAL,
+    heartbeat_at REAL,
+    progress TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_url ON jobs(url);
+CREATE TABLE IF NOT EXISTS task_stages (
+    task_key TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    updated_at TEXT NOT NULL,
+    seq INTEGER,
+    PRIMARY KEY (task_key, stage)
+);
+"""
+
+# Columnas añadidas después de la primera versión del esquema (bases de datos existentes)
+_ADDED_COLUMNS = {
+    'jobs': {
+        'collection': "TEXT",
+        'lease_expires_at': "REAL",
+        'heartbeat_at': "REAL",
+        'progress': "TEXT",
+    },
+    # Orden de registro de las etapas de cada pista: no depende del reloj de quien las
+    # escribe (en modo distribuido, workers de máquinas distintas)
+    'task_stages': {
+        'seq': "INTEGER",
+    },
+}
+
+
+def default_db_path():
+    """Ruta por defecto de la base de datos de trabajos (data/jobs/jobs.db)"""
+    return os.path.join(get_data_dir("jobs"), "jobs.db")
+
+
+def _now():
+    return datetime.datetime.now().isoformat()
+
+
+class JobStore:
+    """Acceso a la tabla de trabajos; una conexión SQLite por hilo"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or default_db_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            self._migrate(conn)
+            conn.executescript(_SCHEMA)
+
+    @staticmethod
+    def _migrate(conn):
+        """Añade a las tablas antiguas las columnas que les falten"""
+        for table, added in _ADDED_COLUMNS.items():
+            columns = {row['name'] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if not columns:
+                continue
+            for name, column_type in added.items():
+                if name not in columns:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+                    if (table, name) == ('task_stages', 'seq'):
+                        # Checkpoints anteriores: en el orden en que se insertaron
+                        conn.execute("UPDATE task_stages SET seq = rowid")
+
+    def _connect(self):
+        """Conexión del hilo actual (se crea en el primer uso)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute(f"PRAGMA journal_mode={JOURNAL_MODE}")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return _Transaction(conn)
+
+    @staticmethod
+    def _row_to_dict(row):
+        return dict(row) if row is not None else None
+
+    @staticmethod
+    def _new_job(url, collection=None):
+        now = _now()
+        return {
+            'id': uuid.uuid4().hex,
+            'url': url,
+            'platform': BaseModel.detect_platform(url),
+            'status': JOB_QUEUED,
+            'collection': collection,
+            'created_at': now,
+            'updated_at': now,
+        }
+
+    _INSERT_JOB = ("INSERT INTO jobs (id, url, platform, status, collection, created_at, updated_at) "
+                   "VALUES (:id, :url, :platform, :status, :collection, :created_at, :updated_at)")
+
+    def submit(self, url, collection=None):
+        """Encola una URL y devuelve el trabajo creado"""
+        job = self._new_job(url, collection)
+        with self._connect() as conn:
+            conn.execute(self._INSERT_JOB, job)
+        return self.get(job['id'])
+
+    def submit_many(self, tasks, skip_existing=True):
+        """Encola muchas pistas [(url, colección o None)] en una sola transacción.
+
+        Con skip_existing no se vuelven a encolar las URLs que ya están en cola, en curso o
+        terminadas (relanzar el coordinador con la misma lista no duplica trabajo); las que
+        fallaron o se cancelaron sí se reintentan. Devuelve el número de trabajos creados.
+        """
+        created = 0
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for url, collection in tasks:
+                if skip_existing and conn.execute(
+                        "SELECT 1 FROM jobs WHERE url = ? AND status IN (?, ?, ?) LIMIT 1",
+                        (url, JOB_QUEUED, JOB_RUNNING, JOB_DONE)).fetchone():
+                    continue
+                conn.execute(self._INSERT_JOB, self._new_job(url, collection))
+                created += 1
+        return created
+
+    def get(self, job_id):
+        """Devuelve un trabajo por id o None"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_dict(row)
+
+    def list(self, status=None, limit=100):
+        """Lista trabajos (los más recientes primero), opcionalmente filtrados por estado"""
+        query = "SELECT * FROM jobs"
+        params = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(int(limit))
+        with self._connect() as conn:
+            return [self._row_to_dict(r) for r in conn.execute(query, params).fetchall()]
+
+    def counts(self):
+        """Número de trabajos por estado"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+    def claim_next(self, worker, lease_seconds=None):
+        """Reclama atómicamente el trabajo en cola más antiguo; None si no hay ninguno.
+
+        Con lease_seconds el trabajo queda reservado solo hasta que caduque el lease (hay que
+        renovarlo con heartbeat); antes de buscar, los trabajos con el lease caducado vuelven
+        a la cola.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._requeue_expired(conn)
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                (JOB_QUEUED,)).fetchone()
+            if row is None:
+                return None
+            now = _now()
+            lease_expires_at = time.time() + lease_seconds if lease_seconds else None
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, "
+                "lease_expires_at = ?, heartbeat_at = ?, progress = NULL, "
+                "started_at = ?, updated_at = ? WHERE id = ?",
+                (JOB_RUNNING, worker, lease_expires_at, time.time(), now, now, row['id']))
+        return self.get(row['id'])
+
+    @staticmethod
+    def _requeue_expired(conn):
+        """Devuelve a la cola los trabajos cuyo worker dejó de renovar el lease"""
+        cursor = conn.execute(
+            "UPDATE jobs SET status = ?, worker = NULL, lease_expires_at = NULL, updated_at = ? "
+            "WHERE status = ? AND lease_expires_at < ?",
+            (JOB_QUEUED, _now(), JOB_RUNNING, time.time()))
+        if cursor.rowcount:
+            logger.warning(f"⏰ {cursor.rowcount} trabajo(s) con el lease caducado devuelto(s) a la cola")
+        return cursor.rowcount
+
+    def heartbeat(self, job_id, worker, lease_seconds, progress=None):
+        """Renueva el lease de un trabajo y guarda su progreso.
+
+        Devuelve False si el trabajo ya no pertenece a este worker (lease perdido).
+        """
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires_at = ?, heartbeat_at = ?, progress = ? "
+                "WHERE id = ? AND worker = ? AND status = ?",
+                (now + lease_seconds, now,
+                 json.dumps(progress, ensure_ascii=False) if progress is not None else None,
+                 job_id, worker, JOB_RUNNING))
+        return cursor.rowcount > 0
+
+    def complete(self, job_id, output, worker=None):
+        """Marca un trabajo como terminado con su archivo de salida.
+
+        Con worker, solo si el trabajo sigue siendo suyo; devuelve si se guardó.
+        """
+        return self._finish(job_id, JOB_DONE, output=output, worker=worker)
+
+    def fail(self, job_id, error, worker=None):
+        """Marca un trabajo como fallido (con worker, solo si sigue siendo suyo)"""
+        return self._finish(job_id, JOB_FAILED, error=error, worker=worker)
+
+    def cancel(self, job_id):
+        """Cancela un trabajo que aún no ha empezado; devuelve True si se canceló"""
+        now = _now()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ?, finished_at = ? "
+                "WHERE id = ? AND status = ?",
+                (JOB_CANCELLED, now, now, job_id, JOB_QUEUED))
+        return cursor.rowcount > 0
+
+    def _finish(self, job_id, status, output=None, error=None, worker=None):
+        now = _now()
+        query = ("UPDATE jobs SET status = ?, output = ?, error = ?, lease_expires_at = NULL, "
+                 "updated_at = ?, finished_at = ? WHERE id = ?")
+        params = [status, output, error, now, now, job_id]
+        if worker is not None:
+            query += " AND worker = ? AND status = ?"
+            params += [worker, JOB_RUNNING]
+        with self._connect() as conn:
+            cursor = conn.execute(query, params)
+        return cursor.rowcount > 0
+
+    def requeue_interrupted(self):
+        """Devuelve a la cola los trabajos que quedaron 'running' (caída o cierre abrupto).
+
+        Los que tienen un lease vigente pertenecen a workers vivos de otros procesos y se
+        respetan; los de lease caducado también vuelven a la cola.
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, worker = NULL, lease_expires_at = NULL, updated_at = ? "
+                "WHERE status = ? AND (lease_expires_at IS NULL OR lease_expires_at < ?)",
+                (JOB_QUEUED, _now(), JOB_RUNNING, time.time()))
+        return cursor.rowcount
+
+    def collection_counts(self):
+        """Trabajos por colección (álbum/playlist de origen) y estado"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT collection, status, COUNT(*) AS n FROM jobs "
+                "GROUP BY collection, status").fetchall()
+        counts = {}
+        for row in rows:
+            counts.setdefault(row['collection'], {})[row['status']] = row['n']
+        return counts
+
+    def active_workers(self):
+        """Trabajos en curso con lease vigente: worker, URL, último heartbeat y progreso"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, url, worker, heartbeat_at, lease_expires_at, progress FROM jobs "
+                "WHERE status = ? AND lease_expires_at >= ? ORDER BY worker",
+                (JOB_RUNNING, time.time())).fetchall()
+        active = []
+        for row in rows:
+            job = dict(row)
+            job['progress'] = json.loads(job['progress']) if job['progress'] else None
+            active.append(job)
+        return active
+
+    # --- Etapas por pista (checkpoints para reanudar) ---
+
+    def get_stage(self, task_key, stage):
+        """Devuelve el registro de una etapa ({'status', 'result', 'error'}) o None"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT status, result, error, updated_at, seq FROM task_stages WHERE task_key = ? AND stage = ?",
+                (task_key, stage)).fetchone()
+        if row is None:
+            return None
+        record = dict(row)
+        record['result'] = json.loads(record['result']) if record['result'] else None
+        return record
+
+    def save_stage(self, task_key, stage, status, result=None, error=None):
+        """Registra el resultado (serializable a JSON) o el error de una etapa"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO task_stages (task_key, stage, status, result, error, updated_at, seq) "
+                "VALUES (?, ?, ?, ?, ?, ?, "
+                "(SELECT COALESCE(MAX(seq), 0) + 1 FROM task_stages WHERE task_key = ?))",
+                (task_key, stage, status,
+                 json.dumps(result, ensure_ascii=False) if result is not None else None,
+                 error, _now(), task_key))
+
+    def task_stages(self, task_key):
+        """Todas las etapas registradas de una pista, en el orden en que se registraron"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT stage, status, error, updated_at FROM task_stages WHERE task_key = ? "
+                "ORDER BY seq", (task_key,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def unfinished_tasks(self):
+        """Claves de las pistas con checkpoints pero sin 'finalize' completada (reanudables)"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT task_key FROM task_stages WHERE task_key NOT IN "
+                "(SELECT task_key FROM task_stages WHERE stage = 'finalize' AND status = ?)",
+                (STAGE_DONE,)).fetchall()
+        return [row['task_key'] for row in rows]
+
+    def clear_task(self, task_key):
+        """Olvida los checkpoints de una pista (fuerza a reconvertirla desde cero)"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM task_stages WHERE task_key = ?", (task_key,))
+
+    def run_stage(self, task_key, stage, func, *args, validate=None):
+        """Ejecuta una etapa con checkpoint.
+
+        Si la etapa ya se completó en una ejecución anterior (y validate acepta su resultado,
+        p.ej. el archivo sigue existiendo) se reutiliza el resultado sin repetir el trabajo.
+        """
+        record = self.get_stage(task_key, stage)
+        if record and record['status'] == STAGE_DONE:
+            if validate is None or validate(record['result']):
+                logger.info(f"⏭️ Etapa '{stage}' ya completada - reutilizando resultado")
+                return record['result']
+
+        if record:
+            # La etapa se repite: las posteriores dependían de su resultado anterior
+            self._invalidate_after(task_key, record['seq'])
+
+        try:
+            result = func(*args)
+        except Exception as e:
+            self.save_stage(task_key, stage, STAGE_FAILED, error=str(e))
+            raise
+
+        self.save_stage(task_key, stage, STAGE_DONE, result=result)
+        return result
+
+    def _invalidate_after(self, task_key, seq):
+        """Borra los checkpoints de una pista registrados después del de número seq"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM task_stages WHERE task_key = ? AND seq > ?", (task_key, seq))
+
+    def completed_stage(self, task_key, stage, validate=None):
+        """Resultado de una etapa completada y todavía válida, o None"""
+        record = self.get_stage(task_key, stage)
+        if record and record['status'] == STAGE_DONE:
+            if validate is None or validate(record['result']):
+                return record['result']
+        return None
+
+    def close(self):
+        """Cierra la conexión del hilo actual"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class _Transaction:
+    """Context manager que hace COMMIT/ROLLBACK sobre una conexión en modo autocommit"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.conn.in_transaction:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
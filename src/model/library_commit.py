@@ -0,0 +1,175 @@
+# library_commit.py
+"""
+Escritura atómica de pistas en la biblioteca
+
+Descargar, transcodificar y etiquetar modifican el archivo muchas veces; si todo eso
+ocurre dentro de data/music, un cierre abrupto deja archivos a medio escribir o con una
+extensión que no corresponde a su contenido, y quien recorre la biblioteca (reproductor,
+dedupe, loudness) se los encuentra. Cada conversión trabaja por eso en su área de
+preparación (data/temp/staging/<tarea>) y la pista entra en la biblioteca al final con
+un único os.replace: en data/music solo aparecen archivos completos.
+
+Antes del rename se hace fsync del archivo (si no, tras un corte de luz el rename puede
+ser persistente y los datos no). La durabilidad del propio rename depende del fsync del
+directorio, que se controla con EKHO_FSYNC:
+
+- batch (por defecto): fsync del archivo en cada pista y del directorio como mucho una
+  vez cada FSYNC_BATCH_SECONDS (y al salir). Un corte puede perder las últimas pistas
+  confirmadas, que se vuelven a convertir, pero nunca deja una a medias.
+- full: fsync del archivo y del directorio en cada pista.
+- off: sin fsync (lo más rápido; el rename sigue siendo atómico frente a cierres del proceso).
+
+Con overwrite=False la confirmación no sustituye nunca un archivo existente: se crea un
+enlace duro con el nombre final (falla si ya existe, de forma atómica también entre
+procesos y máquinas sobre el mismo disco) y después se borra el de preparación.
+"""
+
+import os
+import re
+import time
+import errno
+import atexit
+import shutil
+import threading
+
+from model.conversor_model import get_data_dir
+from model.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+FSYNC_MODE = os.environ.get("EKHO_FSYNC", "batch").lower()
+FSYNC_BATCH_SECONDS = float(os.environ.get("EKHO_FSYNC_BATCH_SECONDS", "1.0"))
+
+# Prefijo de las copias temporales cuando la biblioteca está en otro sistema de archivos
+CROSS_DEVICE_PREFIX = ".ekho-commit-"
+
+
+def staging_name(task_key):
+    """Nombre de la carpeta de preparación de una tarea (válido en cualquier sistema de archivos)"""
+    return re.sub(r'[^\w.-]', '_', task_key)[:80] or "task"
+
+
+def staging_dir(task_key):
+    """Área de preparación de una tarea: todo lo que produce antes de entrar en la biblioteca"""
+    return get_data_dir("temp", "staging", staging_name(task_key))
+
+
+def remove_staging_dir(task_key):
+    """Elimina el área de preparación de una tarea ya confirmada en la biblioteca"""
+    shutil.rmtree(staging_dir(task_key), ignore_errors=True)
+
+
+def _fsync_file(path):
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+
+
+def _fsync_dir(path):
+    """fsync de un directorio (no existe en Windows: allí el rename ya es lo que se puede hacer)"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class _DirectorySync:
+    """Directorios con renames pendientes de fsync (agrupados en el modo batch)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dirty = set()
+        self._last_flush = time.monotonic()
+
+    def mark(self, directory):
+        with self._lock:
+            self._dirty.add(directory)
+            due = time.monotonic() - self._last_flush >= FSYNC_BATCH_SECONDS
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            self._last_flush = time.monotonic()
+        for directory in dirty:
+            _fsync_dir(directory)
+
+
+_directory_sync = _DirectorySync()
+atexit.register(_directory_sync.flush)
+
+
+def flush():
+    """Hace persistentes los renames pendientes (modo batch)"""
+    _directory_sync.flush()
+
+
+def _move_exclusive(source, target):
+    """Como os.replace, pero lanza FileExistsError si target ya existe"""
+    try:
+        os.link(source, target)
+    except FileExistsError:
+        raise
+    except OSError as e:
+        if e.errno == errno.EXDEV:
+            raise
+        # Sin enlaces duros (FAT, algunos discos de red): el nombre se reserva con O_EXCL
+        os.close(os.open(target, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        os.replace(source, target)
+        return
+    os.remove(source)
+
+
+def _replace_across_devices(source, target, overwrite=True):
+    """Como os.replace cuando origen y destino están en sistemas de archivos distintos"""
+    directory = os.path.dirname(target)
+    temporary = os.path.join(directory, CROSS_DEVICE_PREFIX + os.path.basename(target))
+    shutil.copyfile(source, temporary)
+    if FSYNC_MODE != "off":
+        _fsync_file(temporary)
+    if overwrite:
+        os.replace(temporary, target)
+    else:
+        try:
+            _move_exclusive(temporary, target)
+        except FileExistsError:
+            os.remove(temporary)
+            raise
+    os.remove(source)
+
+
+def commit_to_library(staged_path, final_path, overwrite=True):
+    """Mueve un archivo terminado del área de preparación a la biblioteca en un solo paso.
+
+    Devuelve final_path. Si ya existe un archivo con ese nombre, se sustituye; con
+    overwrite=False se lanza FileExistsError y el archivo sigue en el área de preparación.
+    """
+    if os.path.abspath(staged_path) == os.path.abspath(final_path):
+        return final_path
+    directory = os.path.dirname(os.path.abspath(final_path))
+    os.makedirs(directory, exist_ok=True)
+
+    if FSYNC_MODE != "off":
+        _fsync_file(staged_path)
+    try:
+        if overwrite:
+            os.replace(staged_path, final_path)
+        else:
+            _move_exclusive(staged_path, final_path)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        _replace_across_devices(staged_path, final_path, overwrite)
+
+    if FSYNC_MODE == "full":
+        _fsync_dir(directory)
+    elif FSYNC_MODE != "off":
+        _directory_sync.mark(directory)
+    logger.debug(f"📥 Confirmado en la biblioteca: {final_path}")
+    return final_path
@@ -0,0 +1,133 @@
+# logging_config.py
+"""
+Registro de mensajes de los modelos (logging) con salida a terminal y a logs/
+
+Cada módulo usa su propio logger (get_logger(__name__), bajo el espacio 'ekho') en lugar de
+print. configure_logging instala un único QueueHandler: quien registra un mensaje solo lo
+encola, y un hilo aparte (QueueListener) lo escribe en
+
+- la terminal, con el mismo formato que tenían los print y el nivel elegido
+  (INFO por defecto, EKHO_LOG_LEVEL o las opciones -q/-v de cada comando),
+- logs/ekho.log, rotado, con fecha, hilo y módulo (EKHO_LOG_FILE_LEVEL, DEBUG por defecto;
+  'OFF' lo desactiva). Las trazas de error solo van aquí, a nivel DEBUG.
+
+Así la E/S de terminal ya no frena a los hilos de conversión y los mensajes de varios hilos
+no se mezclan a mitad de línea. Sin configure_logging (p.ej. al importar los modelos desde
+otro programa) los mensajes siguen las reglas de logging de quien los importa.
+"""
+
+import os
+import sys
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+
+from model.conversor_model import PROJECT_ROOT
+
+ROOT_LOGGER = "ekho"
+LOG_FILE_NAME = "ekho.log"
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024
+LOG_FILE_BACKUPS = 3
+
+CONSOLE_FORMAT = "%(message)s"
+FILE_FORMAT = "%(asctime)s %(levelname)-7s [%(threadName)s] %(name)s: %(message)s"
+
+_listener = None
+_handlers = []
+_lock = threading.Lock()
+
+
+def get_logger(name):
+    """Logger del módulo dentro del espacio 'ekho' (get_logger(__name__))"""
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def _parse_level(value, default):
+    if value is None or value == "":
+        return default
+    if isinstance(value, int):
+        return value
+    value = str(value).strip().upper()
+    if value == "OFF":
+        return None
+    level = logging.getLevelName(value)
+    return level if isinstance(level, int) else default
+
+
+def get_log_dir():
+    """Carpeta logs/ del proyecto (EKHO_LOG_DIR para redirigirla)"""
+    path = os.environ.get("EKHO_LOG_DIR") or os.path.join(PROJECT_ROOT, "logs")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def configure_logging(console_level=None, stream=None, file_level=None, asynchronous=True):
+    """Configura (o reconfigura) la salida de los loggers de Ekho.
+
+    console_level: nivel de la terminal (None -> EKHO_LOG_LEVEL o INFO).
+    stream: flujo de la terminal (sys.stdout por defecto; los comandos headless usan stderr).
+    file_level: nivel de logs/ekho.log (None -> EKHO_LOG_FILE_LEVEL o DEBUG).
+    asynchronous: escribir desde el hilo del QueueListener; el menú interactivo lo desactiva
+    para que los mensajes no se crucen con sus propios print y preguntas.
+    """
+    global _listener, _handlers
+    console_level = _parse_level(console_level, None) or \
+        _parse_level(os.environ.get("EKHO_LOG_LEVEL"), logging.INFO)
+    file_level = _parse_level(file_level if file_level is not None
+                              else os.environ.get("EKHO_LOG_FILE_LEVEL"), logging.DEBUG)
+
+    handlers = []
+    console = logging.StreamHandler(stream or sys.stdout)
+    console.setLevel(console_level)
+    console.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+    handlers.append(console)
+    if file_level is not None:
+        try:
+            log_file = logging.handlers.RotatingFileHandler(
+                os.path.join(get_log_dir(), LOG_FILE_NAME), maxBytes=LOG_FILE_MAX_BYTES,
+                backupCount=LOG_FILE_BACKUPS, encoding="utf-8")
+        except OSError as e:
+            print(f"⚠️ No se pudo abrir el archivo de log: {e}", file=sys.stderr)
+        else:
+            log_file.setLevel(file_level)
+            log_file.setFormatter(logging.Formatter(FILE_FORMAT))
+            handlers.append(log_file)
+
+    with _lock:
+        shutdown_logging()
+        logger = logging.getLogger(ROOT_LOGGER)
+        # El logger deja pasar lo que acepte algún destino: lo demás se descarta sin encolar
+        logger.setLevel(min(handler.level for handler in handlers))
+        logger.propagate = False
+        _handlers = handlers
+        if asynchronous:
+            records = queue.SimpleQueue()
+            logger.addHandler(logging.handlers.QueueHandler(records))
+            _listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+            _listener.start()
+        else:
+            for handler in handlers:
+                logger.addHandler(handler)
+    return logger
+
+
+def shutdown_logging():
+    """Vacía la cola y cierra los destinos (se llama también al salir del proceso)"""
+    global _listener, _handlers
+    listener, handlers = _listener, _handlers
+    _listener, _handlers = None, []
+    # El logger vuelve a su estado sin configurar (sin una cola que nadie vacía)
+    logger = logging.getLogger(ROOT_LOGGER)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.setLevel(logging.NOTSET)
+    logger.propagate = True
+    if listener is not None:
+        listener.stop()
+    for handler in handlers:
+        handler.close()
+
+
+atexit.register(shutdown_logging)
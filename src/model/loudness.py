@@ -0,0 +1,159 @@
+# loudness.py
+"""
+Sonoridad EBU R128 y etiquetas ReplayGain calculadas en la misma pasada de FFmpeg
+
+Las conversiones ya pasan todo el audio por FFmpeg para codificarlo (el postprocesador
+de yt-dlp en Spotify, moviepy/pydub en YouTube). En esa misma invocación se intercala el
+filtro ebur128, que mide sin alterar las muestras, seguido de ametadata, que vuelca sus
+medidas a un archivo de estadísticas: al terminar la codificación ya se conocen la
+sonoridad integrada (LUFS) y el pico real, sin volver a decodificar el archivo.
+
+Con esas medidas se escriben las etiquetas ReplayGain 2.0 (REPLAYGAIN_TRACK_GAIN y
+REPLAYGAIN_TRACK_PEAK, referencia -18 LUFS; R128_TRACK_GAIN en Opus) que entienden los
+reproductores. Los archivos
+que ya estaban en la biblioteca se analizan con analyze_library, en un pool de procesos
+(una decodificación completa por archivo, repartidas entre todos los núcleos).
+
+EKHO_LOUDNESS=off desactiva la medida durante las conversiones.
+"""
+
+import os
+import re
+import hashlib
+import subprocess
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from model.conversor_model import get_data_dir, get_ffmpeg_exe
+from model.audio_tags import read_replaygain, write_replaygain
+from model.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+LOUDNESS_ENABLED = os.environ.get("EKHO_LOUDNESS", "on").lower() != "off"
+# Sonoridad de referencia de ReplayGain 2.0
+REFERENCE_LUFS = -18.0
+# ebur128 devuelve -70 LUFS (su umbral absoluto) para audio en silencio
+SILENCE_LUFS = -70.0
+# Bytes del final del archivo de estadísticas que se leen (las últimas medidas son las totales)
+STATS_TAIL_BYTES = 4096
+
+# Medidas de una pista: sonoridad integrada (LUFS) y pico real (lineal, 1.0 = 0 dBFS)
+Loudness = namedtuple("Loudness", ["integrated_lufs", "true_peak"])
+
+
+def _escape(value, special):
+    return re.sub("([" + re.escape(special) + "])", r"\\\1", value)
+
+
+def analysis_filter(stats_path):
+    """Filtro de audio (-af) que mide la sonoridad sin alterar el audio y la vuelca a stats_path"""
+    # La ruta se escapa dos veces: como valor de opción y como parte del grafo de filtros
+    path = _escape(_escape(stats_path, "\\':"), "\\'[],;")
+    return f"ebur128=peak=true:metadata=1,ametadata=mode=print:file={path}"
+
+
+def stats_path_for(output_path):
+    """Archivo de estadísticas en data/temp para la codificación que produce output_path"""
+    digest = hashlib.sha1(os.path.abspath(output_path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(get_data_dir("temp"), f"loudness_{digest}.txt")
+
+
+def read_stats(stats_path, remove=True):
+    """Últimas medidas volcadas por analysis_filter (None si no hay); borra el archivo"""
+    try:
+        with open(stats_path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - STATS_TAIL_BYTES))
+            tail = f.read().decode("utf-8", errors="replace")
+    except OSError:
+        return None
+    finally:
+        if remove:
+            try:
+                os.remove(stats_path)
+            except OSError:
+                pass
+
+    integrated = re.findall(r"lavfi\.r128\.I=(-?[\d.]+|-?inf)", tail)
+    peaks = re.findall(r"lavfi\.r128\.true_peak=([\d.]+|inf)", tail)
+    if not integrated:
+        return None
+    lufs = float(integrated[-1])
+    if lufs <= SILENCE_LUFS:
+        return None
+    return Loudness(round(lufs, 2), round(float(peaks[-1]), 6) if peaks else None)
+
+
+def replaygain(loudness):
+    """(ganancia en dB, pico lineal) de ReplayGain 2.0 para unas medidas"""
+    return round(REFERENCE_LUFS - loudness.integrated_lufs, 2), loudness.true_peak
+
+
+def write_replaygain_tags(path, loudness):
+    """Añade las etiquetas ReplayGain al archivo (en su formato) sin tocar el resto de etiquetas"""
+    gain, peak = replaygain(loudness)
+    write_replaygain(path, gain, peak, integrated_lufs=loudness.integrated_lufs)
+    logger.info(f"🔊 Sonoridad {loudness.integrated_lufs:.1f} LUFS -> ReplayGain {gain:+.2f} dB")
+
+
+def apply_stats(path, stats_path):
+    """Lee las medidas de una codificación con analysis_filter y etiqueta el archivo (True si pudo)"""
+    loudness = read_stats(stats_path)
+    if loudness is None:
+        return False
+    try:
+        write_replaygain_tags(path, loudness)
+        return True
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudieron guardar las etiquetas ReplayGain: {e}")
+        return False
+
+
+def analyze_file(path):
+    """Mide un archivo ya convertido (una decodificación, sin codificar nada)"""
+    stats_path = stats_path_for(path)
+    command = [get_ffmpeg_exe(), "-v", "error", "-nostdin", "-i", path, "-vn",
+               "-af", analysis_filter(stats_path), "-f", "null", "-"]
+    try:
+        subprocess.run(command, capture_output=True, check=True)
+    except subprocess.CalledProcessError as e:
+        read_stats(stats_path)
+        raise RuntimeError(e.stderr.decode("utf-8", errors="replace").strip() or f"FFmpeg terminó con {e.returncode}")
+    return read_stats(stats_path)
+
+
+def tag_file(path, force=False):
+    """Mide y etiqueta un archivo de la biblioteca; devuelve {'path', 'status', ...}.
+
+    Función de módulo para poder ejecutarse en un proceso del pool.
+    """
+    if not force and read_replaygain(path):
+        return {'path': path, 'status': "skipped"}
+    try:
+        loudness = analyze_file(path)
+        if loudness is None:
+            return {'path': path, 'status': "silent"}
+        write_replaygain_tags(path, loudness)
+    except Exception as e:
+        return {'path': path, 'status': "failed", 'error': str(e)}
+    gain, peak = replaygain(loudness)
+    return {'path': path, 'status': "tagged", 'lufs': loudness.integrated_lufs,
+            'gain_db': gain, 'peak': peak}
+
+
+def analyze_library(paths, processes=None, force=False, on_result=None):
+    """Etiqueta varios archivos en un pool de procesos; devuelve los resultados de tag_file.
+
+    on_result(result) se llama en este proceso según van terminando.
+    """
+    results = []
+    processes = max(1, processes or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(tag_file, path, force) for path in paths]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if on_result:
+                on_result(result)
+    return results
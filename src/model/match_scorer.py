@@ -0,0 +1,208 @@
+# match_scorer.py
+"""
+Puntuación de resultados de búsqueda de YouTube frente a una pista de Spotify
+
+Cada candidato recibe una puntuación a partir de varias señales:
+- similitud de tokens normalizados entre el título de Spotify y el del vídeo
+- presencia del artista en el título o en el nombre del canal
+- cercanía a la duración de Spotify (la señal que mejor separa versiones en directo,
+  videoclips con intro, versiones extendidas...)
+- canal oficial (canales "- Topic" de YouTube Music, VEVO, canal con el nombre del artista)
+- ISRC de Spotify presente en el título o la descripción del vídeo
+- penalización por versiones no pedidas (cover, karaoke, live...) salvo que el título de
+  Spotify también las mencione
+
+Todos los candidatos de un lote (una o muchas pistas) se puntúan a la vez: los tokens se
+aplanan en arrays de NumPy y las coincidencias se cuentan con np.isin/np.bincount, sin
+bucles de Python por par pista-candidato.
+"""
+
+import re
+import unicodedata
+
+import numpy as np
+
+# Peso de cada señal en la puntuación final
+WEIGHTS = {
+    'title': 0.35,
+    'artist': 0.20,
+    'duration': 0.30,
+    'official': 0.10,
+    'isrc': 0.50,
+    'unwanted': -0.40,
+}
+# Diferencia de duración que se considera idéntica y escala de caída a partir de ahí
+DURATION_TOLERANCE_SECONDS = 3
+DURATION_SCALE_SECONDS = 10
+# Valor neutro de la señal de duración cuando una de las dos es desconocida
+UNKNOWN_DURATION_SIMILARITY = 0.5
+# Puntuación a partir de la cual no merece la pena probar más consultas de búsqueda
+ACCEPT_SCORE = 0.6
+
+# Adornos habituales de los títulos de YouTube que no aportan a la comparación
+NOISE_TOKENS = frozenset({
+    'official', 'video', 'audio', 'music', 'lyric', 'lyrics', 'letra', 'hd', 'hq', '4k',
+    'mv', 'visualizer', 'ft', 'feat', 'featuring', 'con', 'topic', 'vevo', 'the', 'a',
+    'y', 'and', 'de', 'el', 'la',
+})
+# Versiones que no queremos salvo que la propia pista de Spotify lo sea
+UNWANTED_TOKENS = frozenset({
+    'cover', 'karaoke', 'instrumental', 'live', 'directo', 'vivo', 'concert', 'concierto',
+    'remix', 'slowed', 'reverb', 'sped', 'nightcore', '8d', 'reaction', 'tutorial',
+})
+
+_TOKEN_PATTERN = re.compile(r"[^\W_]+")
+_OFFICIAL_SUFFIXES = (" - topic", "vevo")
+
+
+def normalize_tokens(text):
+    """Tokens en minúsculas y sin tildes, sin los adornos de NOISE_TOKENS"""
+    if not text:
+        return set()
+    text = text.lower()
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(char for char in text if not unicodedata.combining(char))
+    return {token for token in _TOKEN_PATTERN.findall(text) if token not in NOISE_TOKENS}
+
+
+def is_official_channel(uploader, artist):
+    """Canal auto-generado de YouTube Music, VEVO o con el nombre del artista"""
+    uploader = (uploader or "").lower().strip()
+    if not uploader:
+        return False
+    if uploader.endswith(_OFFICIAL_SUFFIXES):
+        return True
+    artist_tokens = normalize_tokens(artist)
+    return bool(artist_tokens) and artist_tokens == normalize_tokens(uploader)
+
+
+class _Vocabulary:
+    """Asigna un entero a cada token del lote"""
+
+    def __init__(self):
+        self.ids = {}
+
+    def keys(self, token_sets, owners=None):
+        """Claves (dueño << 32 | id_token) de todos los tokens, aplanadas en un array.
+
+        owners permite usar como dueño otro índice (p.ej. la pista de cada candidato).
+        Devuelve también a qué conjunto pertenece cada clave.
+        """
+        set_index, token_ids = [], []
+        for index, tokens in enumerate(token_sets):
+            for token in tokens:
+                set_index.append(index)
+                token_ids.append(self.ids.setdefault(token, len(self.ids)))
+        set_index = np.asarray(set_index, dtype=np.int64)
+        owner = set_index if owners is None else owners[set_index]
+        return (owner << 32) | np.asarray(token_ids, dtype=np.int64), set_index
+
+
+def _overlap(query_keys, vocabulary, candidate_tokens, candidate_query):
+    """Nº de tokens de cada candidato que aparecen en los de su pista (vectorizado)"""
+    cand_keys, cand_index = vocabulary.keys(candidate_tokens, owners=candidate_query)
+    hits = np.isin(cand_keys, query_keys).astype(np.float64)
+    return np.bincount(cand_index, weights=hits, minlength=len(candidate_tokens))
+
+
+def score_batch(tracks, candidate_lists):
+    """Puntúa todos los candidatos de todas las pistas de una vez.
+
+    tracks: lista de dicts con 'name', 'artist' y opcionalmente 'duration' (s) e 'isrc'.
+    candidate_lists: por cada pista, la lista de entradas de yt-dlp (title, uploader,
+    duration, description...). Devuelve, por cada pista, un array con la puntuación de
+    cada candidato (vacío si no hay candidatos).
+    """
+    candidate_query, entries = [], []
+    for index, candidates in enumerate(candidate_lists):
+        for entry in candidates:
+            candidate_query.append(index)
+            entries.append(entry or {})
+    candidate_query = np.asarray(candidate_query, dtype=np.int64)
+    if not entries:
+        return [np.zeros(0) for _ in tracks]
+
+    name_tokens = [normalize_tokens(track.get('name')) for track in tracks]
+    artist_tokens = [normalize_tokens(track.get('artist')) for track in tracks]
+    title_tokens = [normalize_tokens(entry.get('title')) for entry in entries]
+    channel_tokens = [title | normalize_tokens(_uploader(entry))
+                      for title, entry in zip(title_tokens, entries)]
+
+    vocabulary = _Vocabulary()
+    name_keys, _ = vocabulary.keys(name_tokens)
+    artist_keys, _ = vocabulary.keys(artist_tokens)
+    name_size = np.array([len(tokens) for tokens in name_tokens], dtype=np.float64)[candidate_query]
+    artist_size = np.array([len(tokens) for tokens in artist_tokens], dtype=np.float64)[candidate_query]
+    title_size = np.array([len(tokens) for tokens in title_tokens], dtype=np.float64)
+
+    # Título: cobertura de los tokens de Spotify y Jaccard (castiga títulos con mucho extra)
+    title_hits = _overlap(name_keys, vocabulary, title_tokens, candidate_query)
+    coverage = np.divide(title_hits, name_size, out=np.zeros_like(title_hits), where=name_size > 0)
+    union = name_size + title_size - title_hits
+    jaccard = np.divide(title_hits, union, out=np.zeros_like(title_hits), where=union > 0)
+    title_score = 0.7 * coverage + 0.3 * jaccard
+
+    # Artista: en el título o en el nombre del canal
+    artist_hits = _overlap(artist_keys, vocabulary, channel_tokens, candidate_query)
+    artist_score = np.divide(artist_hits, artist_size, out=np.zeros_like(artist_hits),
+                             where=artist_size > 0)
+
+    # Duración: 1 dentro de la tolerancia, caída exponencial fuera; neutra si falta alguna
+    target = np.array([float(track.get('duration') or 0) for track in tracks])[candidate_query]
+    actual = np.array([float(entry.get('duration') or 0) for entry in entries])
+    difference = np.maximum(np.abs(target - actual) - DURATION_TOLERANCE_SECONDS, 0)
+    duration_score = np.where((target > 0) & (actual > 0),
+                              np.exp(-difference / DURATION_SCALE_SECONDS),
+                              UNKNOWN_DURATION_SIMILARITY)
+
+    # Versiones no pedidas: tokens de UNWANTED en el vídeo que no están en la pista
+    unwanted_tokens = [tokens & UNWANTED_TOKENS for tokens in title_tokens]
+    unwanted_in_track = _overlap(name_keys, vocabulary, unwanted_tokens, candidate_query)
+    unwanted_score = np.minimum(
+        np.array([len(tokens) for tokens in unwanted_tokens], dtype=np.float64) - unwanted_in_track, 1)
+
+    official_score = np.array([is_official_channel(_uploader(entry), tracks[query].get('artist'))
+                               for entry, query in zip(entries, candidate_query)], dtype=np.float64)
+    isrc_score = np.array([_has_isrc(entry, tracks[query].get('isrc'))
+                           for entry, query in zip(entries, candidate_query)], dtype=np.float64)
+
+    scores = (WEIGHTS['title'] * title_score + WEIGHTS['artist'] * artist_score +
+              WEIGHTS['duration'] * duration_score + WEIGHTS['official'] * official_score +
+              WEIGHTS['isrc'] * isrc_score + WEIGHTS['unwanted'] * unwanted_score)
+
+    # Volver a separar por pista
+    bounds = np.cumsum([len(candidates) for candidates in candidate_lists])[:-1]
+    return np.split(scores, bounds)
+
+
+def _uploader(entry):
+    # Los resultados planos de la búsqueda a veces solo traen 'channel'
+    return entry.get('uploader') or entry.get('channel')
+
+
+def _has_isrc(entry, isrc):
+    if not isrc:
+        return 0.0
+    isrc = isrc.upper()
+    haystack = f"{entry.get('title') or ''} {entry.get('description') or ''}".upper()
+    return 1.0 if isrc in haystack else 0.0
+
+
+def best_matches(tracks, candidate_lists):
+    """Por cada pista, (índice del mejor candidato, puntuación) o (None, None) si no hay"""
+    results = []
+    for scores in score_batch(tracks, candidate_lists):
+        if len(scores) == 0:
+            results.append((None, None))
+        else:
+            best = int(np.argmax(scores))
+            results.append((best, float(scores[best])))
+    return results
+
+
+def select_best(track, entries):
+    """Mejor entrada para una sola pista: (entrada, puntuación) o (None, None)"""
+    entries = [entry for entry in entries if entry]
+    index, score = best_matches([track], [entries])[0]
+    return (entries[index], score) if index is not None else (None, None)
@@ -0,0 +1,174 @@
+# metadata_cache.py
+"""
+Caché de metadatos en dos niveles: LRU en memoria + SQLite en disco
+
+Las consultas a Spotify (spotdl) son lentas y cuentan para el límite de peticiones.
+Las pistas resueltas se guardan por ID de Spotify con un TTL largo; los fallos
+(pista no encontrada, metadatos incompletos) se guardan como resultado negativo con un
+TTL corto, para no repetir al instante una consulta que acaba de fallar.
+
+El nivel en memoria evita tocar disco en sincronizaciones repetidas dentro del mismo
+proceso; el de disco (data/metadata/cache.db) se comparte entre ejecuciones y procesos.
+
+Configuración por entorno: EKHO_METADATA_TTL y EKHO_METADATA_NEGATIVE_TTL (segundos).
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from model.conversor_model import get_data_dir
+from model.job_store import _Transaction
+
+DEFAULT_TTL = int(os.environ.get("EKHO_METADATA_TTL", str(7 * 24 * 3600)))
+DEFAULT_NEGATIVE_TTL = int(os.environ.get("EKHO_METADATA_NEGATIVE_TTL", "600"))
+DEFAULT_MEMORY_SIZE = 2048
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT,
+    negative INTEGER NOT NULL DEFAULT 0,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class MetadataCache:
+    """Caché clave -> diccionario JSON con TTL, resultados negativos y estadísticas"""
+
+    def __init__(self, db_path=None, memory_size=DEFAULT_MEMORY_SIZE,
+                 ttl=DEFAULT_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL):
+        self.db_path = db_path or os.path.join(get_data_dir("metadata"), "cache.db")
+        self.memory_size = memory_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # clave -> (valor o None si es negativo, caduca_en)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'negative_hits': 0,
+                       'misses': 0, 'evictions': 0, 'expired': 0, 'stores': 0}
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            conn.execute("DELETE FROM metadata_cache WHERE expires_at < ?", (time.time(),))
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return _Transaction(conn)
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def _remember(self, key, value, expires_at):
+        """Guarda en el nivel de memoria expulsando la entrada menos usada si está lleno"""
+        with self._lock:
+            self._memory[key] = (value, expires_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def get(self, key):
+        """Devuelve (encontrado, valor). Un resultado negativo es (True, None)"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    self._stats['negative_hits' if entry[0] is None else 'memory_hits'] += 1
+                    return True, entry[0]
+                # Caducada en memoria: puede que otro proceso la haya renovado en disco
+                del self._memory[key]
+
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, negative, expires_at FROM metadata_cache WHERE key = ?",
+                               (key,)).fetchone()
+        if row is None:
+            self._count('misses')
+            return False, None
+        value, negative, expires_at = row
+        if expires_at <= now:
+            self._count('expired')
+            self._count('misses')
+            return False, None
+
+        value = None if negative else json.loads(value)
+        self._remember(key, value, expires_at)
+        self._count('negative_hits' if negative else 'disk_hits')
+        return True, value
+
+    def put(self, key, value, ttl=None):
+        """Guarda un resultado válido en ambos niveles"""
+        self.put_many({key: value}, ttl)
+
+    def put_many(self, items, ttl=None):
+        """Guarda muchos resultados en una sola transacción (p.ej. una playlist entera)"""
+        expires_at = time.time() + (ttl or self.ttl)
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT OR REPLACE INTO metadata_cache (key, value, negative, expires_at) VALUES (?, ?, 0, ?)",
+                [(key, json.dumps(value, ensure_ascii=False), expires_at) for key, value in items.items()])
+        for key, value in items.items():
+            self._remember(key, value, expires_at)
+        with self._lock:
+            self._stats['stores'] += len(items)
+
+    def put_negative(self, key, ttl=None):
+        """Recuerda que la consulta falló (TTL corto: se volverá a intentar pronto)"""
+        expires_at = time.time() + (ttl or self.negative_ttl)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO metadata_cache (key, value, negative, expires_at) VALUES (?, NULL, 1, ?)",
+                (key, expires_at))
+        self._remember(key, None, expires_at)
+
+    def invalidate(self, key):
+        """Olvida una entrada en ambos niveles"""
+        with self._lock:
+            self._memory.pop(key, None)
+        with self._connect() as conn:
+            conn.execute("DELETE FROM metadata_cache WHERE key = ?", (key,))
+
+    def clear(self):
+        """Vacía la caché completa"""
+        with self._lock:
+            self._memory.clear()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM metadata_cache")
+
+    def stats(self):
+        """Aciertos por nivel, fallos, expulsiones del LRU y tamaño de cada nivel"""
+        with self._connect() as conn:
+            disk_entries = conn.execute("SELECT COUNT(*) FROM metadata_cache").fetchone()[0]
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+        stats['disk_entries'] = disk_entries
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['negative_hits'] + stats['misses']
+        stats['hit_rate'] = round((lookups - stats['misses']) / lookups, 3) if lookups else 0.0
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_metadata_cache():
+    """Caché compartida del proceso (creada en el primer uso)"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = MetadataCache()
+        return _cache
@@ -0,0 +1,177 @@
+# metadata_resolver.py
+"""
+Resolución de metadatos con fuentes en paralelo ("hedged requests")
+
+En lugar de probar las fuentes una tras otra, se lanza la fuente con mejor historial y,
+si no responde en el tiempo que suele tardar, se lanza también la siguiente, y así
+sucesivamente. Gana la primera respuesta suficientemente completa; una respuesta
+incompleta (sin título o artista reales, con los que no se puede buscar en YouTube) cuenta
+como fallo de la fuente y lanza la siguiente. Si vence el plazo no hay resultado.
+
+Cada fuente acumula sus propias estadísticas (latencia media móvil, tasa de éxito) en
+todo el proceso, de modo que el orden de lanzamiento se adapta: si spotdl se vuelve lento
+o está limitado, los métodos alternativos pasan delante y el rendimiento baja de forma
+gradual en lugar de fallar.
+"""
+
+import os
+import time
+import random
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from model.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Plazo total para resolver una pista (segundos)
+DEFAULT_DEADLINE = float(os.environ.get("EKHO_METADATA_DEADLINE", "10"))
+# Margen sobre la latencia habitual de una fuente antes de lanzar la siguiente
+HEDGE_FACTOR = 1.5
+HEDGE_MIN_DELAY = 0.2
+HEDGE_MAX_DELAY = 3.0
+# Fracción de resoluciones que empiezan por la fuente de más calidad aunque no sea la
+# mejor puntuada: así una fuente degradada (p.ej. spotdl limitado) recupera su puesto al sanar
+EXPLORE_RATIO = 0.1
+# Peso de las observaciones nuevas en la media móvil de latencia
+EWMA_ALPHA = 0.2
+
+# Resultado de una resolución: fuente ganadora (o None), su respuesta, las excepciones vistas
+# y si venció el plazo con fuentes aún en curso (entonces no se sabe si la pista existe)
+Resolution = namedtuple("Resolution", ["source", "result", "errors", "timed_out"])
+
+# Hilos compartidos: las fuentes que pierden la carrera terminan en segundo plano
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="ekho-resolver")
+
+
+class SourceStats:
+    """Latencia y tasa de éxito de una fuente de metadatos (compartida entre hilos)"""
+
+    def __init__(self, name, prior_latency=1.0, quality=1.0):
+        self.name = name
+        # quality: cuánto valen sus respuestas (spotdl trae álbum, duración, ISRC...)
+        self.quality = quality
+        self.latency = prior_latency
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency, success):
+        with self._lock:
+            self.calls += 1
+            if success:
+                self.successes += 1
+            else:
+                self.failures += 1
+            self.latency = (1 - EWMA_ALPHA) * self.latency + EWMA_ALPHA * latency
+
+    @property
+    def success_rate(self):
+        # Suavizado de Laplace: una fuente sin historial empieza con la mitad de confianza ganada
+        return (self.successes + 1) / (self.calls + 1)
+
+    def score(self):
+        """Coste esperado hasta una buena respuesta (menor = se lanza antes)"""
+        return self.latency / (max(self.success_rate, 0.05) * self.quality)
+
+    def hedge_delay(self):
+        """Tiempo de espera a esta fuente antes de lanzar la siguiente"""
+        return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, self.latency * HEDGE_FACTOR))
+
+    def snapshot(self):
+        with self._lock:
+            return {'calls': self.calls, 'successes': self.successes, 'failures': self.failures,
+                    'latency_ms': round(self.latency * 1000, 1),
+                    'success_rate': round(self.success_rate, 3)}
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def get_source_stats(name, prior_latency=1.0, quality=1.0):
+    """Estadísticas de una fuente para todo el proceso (se crean en el primer uso)"""
+    with _stats_lock:
+        if name not in _stats:
+            _stats[name] = SourceStats(name, prior_latency, quality)
+        return _stats[name]
+
+
+def all_source_stats():
+    """Estado de todas las fuentes (para diagnóstico / endpoint de salud)"""
+    with _stats_lock:
+        sources = list(_stats.values())
+    return {source.name: source.snapshot() for source in sources}
+
+
+class HedgedResolver:
+    """Lanza fuentes escalonadas según su historial y se queda con la primera respuesta válida"""
+
+    def __init__(self, sources, is_complete, deadline=None):
+        """sources: lista de (nombre, función, latencia_inicial, calidad).
+
+        is_complete(resultado) decide si una respuesta sirve; las demás se descartan.
+        """
+        self.sources = [(get_source_stats(name, prior, quality), func)
+                        for name, func, prior, quality in sources]
+        self.is_complete = is_complete
+        self.deadline = deadline or DEFAULT_DEADLINE
+
+    def _run(self, stats, func, args):
+        start = time.perf_counter()
+        result, error = None, None
+        try:
+            result = func(*args)
+        except Exception as e:
+            logger.warning(f"⚠️ Fuente '{stats.name}' falló: {e}")
+            error = e
+        if result and not self.is_complete(result):
+            result = None
+        stats.record(time.perf_counter() - start, bool(result))
+        return result, error
+
+    def resolve(self, *args):
+        """Devuelve Resolution(fuente, resultado, errores); fuente es None si nadie respondió a tiempo"""
+        ordered = sorted(self.sources, key=lambda source: source[0].score())
+        if random.random() < EXPLORE_RATIO:
+            best = max(ordered, key=lambda source: source[0].quality)
+            ordered.remove(best)
+            ordered.insert(0, best)
+        deadline_at = time.monotonic() + self.deadline
+        pending = {}
+        errors = []
+        next_index = 0
+        next_launch_at = time.monotonic()
+
+        while True:
+            now = time.monotonic()
+            # Lanzar la siguiente fuente si la anterior tarda más de lo habitual o si no queda
+            # ninguna en curso (todas las lanzadas fallaron)
+            if next_index < len(ordered) and (now >= next_launch_at or not pending):
+                stats, func = ordered[next_index]
+                next_index += 1
+                pending[_executor.submit(self._run, stats, func, args)] = stats
+                next_launch_at = now + stats.hedge_delay()
+
+            if not pending or now >= deadline_at:
+                break
+
+            timeout = deadline_at - now
+            if next_index < len(ordered):
+                timeout = min(timeout, max(0.0, next_launch_at - now))
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                stats = pending.pop(future)
+                result, error = future.result()
+                if error is not None:
+                    errors.append(error)
+                if not result:
+                    # No tiene sentido seguir esperando el margen: lanzar ya la siguiente
+                    next_launch_at = time.monotonic()
+                    continue
+                return Resolution(stats.name, result, errors, False)
+
+        return Resolution(None, None, errors, bool(pending))
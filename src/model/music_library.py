@@ -1,5 +1,7 @@
 import os
 
+from model.output_profiles import is_library_file
+
 class MusicLibrary:
     def __init__(self, music_folder):
         self.music_folder = music_folder
@@ -10,11 +12,11 @@ class MusicLibrary:
             os.makedirs(self.music_folder, exist_ok=True)
             return []
 
-        tracks = [
-            os.path.join(self.music_folder, f)
-            for f in os.listdir(self.music_folder)
-            if f.lower().endswith('.mp3')
-        ]
+        # Las plantillas de nombre pueden repartir la biblioteca en carpetas (artista/álbum)
+        tracks = []
+        for root, dirs, files in os.walk(self.music_folder):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            tracks.extend(os.path.join(root, f) for f in files if is_library_file(f))
         tracks.sort(key=lambda path: os.path.basename(path).lower())
         return tracks
 
@@ -0,0 +1,204 @@
+# naming.py
+"""
+Nombres de archivo de la biblioteca: plantillas y reserva sin colisiones
+
+Antes cada conversor elegía el nombre por su cuenta (Spotify 'Artista - Título', YouTube
+el título del vídeo tal cual) y lo escribía encima de lo que hubiera: dos pistas
+distintas con el mismo artista y título, convertidas a la vez en un lote, se pisaban.
+
+Ahora el nombre sale de una plantilla (EKHO_NAME_TEMPLATE para Spotify,
+EKHO_YOUTUBE_NAME_TEMPLATE para YouTube) con los campos {artist}, {title}, {album},
+{origin} e {id}; una '/' crea carpetas, p.ej. '{artist}/{album}/{title}'. El destino se
+reserva en LibraryPathIndex, un diccionario en memoria (ruta normalizada -> vídeo de
+origen) que se carga una vez desde data/music y el índice de huellas. Comprobar y reservar
+un nombre cuesta O(1) y ocurre bajo un cerrojo, así que dos trabajos del mismo proceso no
+pueden quedarse con el mismo archivo.
+
+Colisiones (mismo nombre, distinto vídeo de origen): el nombre se desambigua con el id
+del vídeo, 'Artista - Título [id].mp3', que no depende del orden en que terminen los
+trabajos; solo si ni eso basta se numera ' (2)', ' (3)'... Volver a convertir el mismo
+vídeo reutiliza su nombre. Entre procesos distintos (modo distribuido, lotes en paralelo)
+el índice no ve las reservas del otro: por eso la confirmación no sustituye nunca un
+archivo de otro origen (commit_to_library con overwrite=False) y, si otro proceso se
+adelantó con ese nombre, se pasa al siguiente candidato.
+"""
+
+import os
+import string
+import threading
+from collections import Counter
+
+from model.conversor_model import get_data_dir
+from model.library_commit import commit_to_library
+from model.output_profiles import is_library_file
+from model.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+NAME_TEMPLATE = os.environ.get("EKHO_NAME_TEMPLATE", "{artist} - {title}")
+YOUTUBE_NAME_TEMPLATE = os.environ.get("EKHO_YOUTUBE_NAME_TEMPLATE", "{title}")
+
+INVALID_CHARS = '<>:"/\\|?*'
+MAX_COMPONENT_LENGTH = 50
+UNTITLED = "Sin título"
+
+
+def sanitize_component(value):
+    """Una carpeta o nombre de archivo válido: sin caracteres reservados ni espacios/puntos en los extremos"""
+    value = "".join(char for char in str(value) if char not in INVALID_CHARS and char >= " ")
+    return value[:MAX_COMPONENT_LENGTH].strip(" .")
+
+
+class _TemplateFormatter(string.Formatter):
+    """Campos ausentes o con un formato que no les corresponde -> texto vacío o tal cual"""
+
+    def get_value(self, key, args, kwargs):
+        value = kwargs.get(key) if isinstance(key, str) else None
+        return "" if value is None else value
+
+    def format_field(self, value, format_spec):
+        try:
+            return super().format_field(value, format_spec)
+        except (ValueError, TypeError):
+            return str(value)
+
+
+_formatter = _TemplateFormatter()
+
+
+def render_name(template, **fields):
+    """Ruta relativa (sin extensión) que produce la plantilla con esos campos.
+
+    Cada valor se limpia antes de sustituirlo (una '/' en un título no crea carpetas) y
+    las carpetas que quedan vacías se omiten.
+    """
+    clean = {key: sanitize_component(value) if isinstance(value, str) else value
+             for key, value in fields.items()}
+    rendered = _formatter.format(template, **clean)
+    parts = [sanitize_component(part.strip(" -_")) for part in rendered.replace("\\", "/").split("/")]
+    parts = [part for part in parts if part]
+    if not parts:
+        return UNTITLED
+    return os.path.join(*parts)
+
+
+def _key(path):
+    """Clave de colisión: insensible a mayúsculas (Windows y macOS no las distinguen)"""
+    return os.path.normcase(os.path.abspath(path)).casefold()
+
+
+class LibraryPathIndex:
+    """Rutas ocupadas de la biblioteca y su vídeo de origen, para reservar nombres sin colisiones"""
+
+    def __init__(self, music_dir=None):
+        self.music_dir = os.path.abspath(music_dir or get_data_dir("music"))
+        self._lock = threading.Lock()
+        self._owners = None
+        # Reservas de trabajos que aún no han confirmado su archivo en la biblioteca
+        self._pending = Counter()
+
+    def _load(self):
+        """Carga perezosa: archivos de data/music (recursivo) y orígenes del índice de huellas"""
+        owners = {}
+        for root, dirs, files in os.walk(self.music_dir):
+            dirs[:] = [name for name in dirs if not name.startswith(".")]
+            for name in files:
+                if is_library_file(name):
+                    owners[_key(os.path.join(root, name))] = None
+        try:
+            from model.fingerprint import get_fingerprint_index
+            for track in get_fingerprint_index().tracks():
+                key = _key(track['path'])
+                if key in owners and track['source_id']:
+                    owners[key] = track['source_id']
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudieron leer los orígenes del índice de huellas: {e}")
+        logger.debug(f"📚 Índice de rutas cargado: {len(owners)} archivo(s)")
+        return owners
+
+    def _is_free(self, path, owner):
+        key = _key(path)
+        if key not in self._owners:
+            # Un archivo que no está en el índice lo ha creado otro proceso o el usuario
+            return not os.path.exists(path)
+        # El mismo vídeo convertido otra vez (o dos veces a la vez) reutiliza su nombre:
+        # el contenido es el mismo y cada confirmación es un rename atómico
+        if owner is not None and self._owners[key] == owner:
+            return True
+        if self._pending[key]:
+            return False
+        # Entradas de archivos borrados después de cargar el índice (dedupe, a mano)
+        return not os.path.exists(path)
+
+    def _resolve(self, relative_name, extension, owner):
+        base = os.path.join(self.music_dir, relative_name)
+        candidates = [base]
+        if owner:
+            candidates.append(f"{base} [{sanitize_component(owner)}]")
+        for candidate in candidates:
+            if self._is_free(candidate + extension, owner):
+                return candidate + extension
+        number = 2
+        while not self._is_free(f"{candidates[-1]} ({number}){extension}", owner):
+            number += 1
+        return f"{candidates[-1]} ({number}){extension}"
+
+    def commit(self, staged_path, relative_name, extension, owner=None):
+        """Confirma staged_path en la biblioteca con el primer nombre libre; devuelve la ruta final.
+
+        Solo se sustituye un archivo del mismo origen. Si otro proceso ya confirmó el
+        nombre elegido, se marca como ocupado y se prueba el siguiente candidato.
+        """
+        while True:
+            with self._lock:
+                if self._owners is None:
+                    self._owners = self._load()
+                path = self._resolve(relative_name, extension, owner)
+                key = _key(path)
+                previous = self._owners.get(key, False)
+                self._owners[key] = owner
+                self._pending[key] += 1
+            try:
+                commit_to_library(staged_path, path,
+                                  overwrite=owner is not None and previous == owner)
+            except FileExistsError:
+                with self._lock:
+                    self._release(key)
+                    if not self._pending[key]:
+                        # Confirmado por otro proceso: ocupado por un origen desconocido
+                        self._owners[key] = None
+                logger.debug(f"🔀 {os.path.basename(path)} ya existe (otro proceso): se prueba otro nombre")
+                continue
+            except BaseException:
+                with self._lock:
+                    self._release(key)
+                    if not self._pending[key]:
+                        if previous is False:
+                            self._owners.pop(key, None)
+                        else:
+                            self._owners[key] = previous
+                raise
+            with self._lock:
+                self._release(key)
+            if path != os.path.join(self.music_dir, relative_name) + extension:
+                logger.info(f"🔀 Nombre ocupado por otra pista: se guarda como {os.path.basename(path)}")
+            return path
+
+    def _release(self, key):
+        self._pending[key] -= 1
+        if self._pending[key] <= 0:
+            del self._pending[key]
+
+
+_path_index = None
+_path_index_lock = threading.Lock()
+
+
+def get_path_index():
+    """Índice de rutas compartido del proceso (data/music; se rehace si EKHO_DATA_DIR cambia)"""
+    global _path_index
+    with _path_index_lock:
+        music_dir = os.path.abspath(get_data_dir("music"))
+        if _path_index is None or _path_index.music_dir != music_dir:
+            _path_index = LibraryPathIndex(music_dir)
+        return _path_index
@@ -0,0 +1,119 @@
+# output_profiles.py
+"""
+Perfiles de salida: formato, códec y calidad de los archivos de la biblioteca
+
+Hasta ahora todo se codificaba a MP3 192k, aunque YouTube sirve casi siempre Opus (WebM) o
+AAC (M4A): decodificar y volver a comprimir con pérdida empeora el audio y cuesta una
+transcodificación completa. Cada perfil indica cómo se codifica tanto en la descarga con
+yt-dlp (Spotify) como en la conversión con moviepy/pydub (YouTube):
+
+- mp3: MP3 192 kbps (por defecto; lo reproduce cualquier dispositivo)
+- opus: Opus 160 kbps (la mitad de tamaño que MP3 con calidad equivalente)
+- aac: AAC 192 kbps en M4A
+- flac: FLAC sin pérdida (del audio ya comprimido de la fuente)
+- passthrough: el códec original sin recodificar, solo cambiando de contenedor
+  (WebM -> .opus, M4A tal cual); la conversión más rápida y sin pérdida añadida
+
+El perfil por defecto se elige con EKHO_OUTPUT_PROFILE y el modo por lotes acepta
+--profile. Con opus y aac, si la fuente ya está en ese códec, yt-dlp solo cambia de
+contenedor (como passthrough).
+"""
+
+import os
+import re
+import mimetypes
+import subprocess
+from collections import namedtuple
+
+from model.conversor_model import get_ffmpeg_exe
+
+# extension: la de los archivos generados (None = según el códec de la fuente)
+# codec / bitrate / sample_rate / container: parámetros de FFmpeg (moviepy y pydub)
+# ytdl_codec / ytdl_quality: 'preferredcodec' y 'preferredquality' de FFmpegExtractAudio
+OutputProfile = namedtuple("OutputProfile", [
+    "name", "extension", "codec", "bitrate", "sample_rate", "container",
+    "ytdl_codec", "ytdl_quality", "description",
+])
+
+PROFILES = {
+    "mp3": OutputProfile("mp3", ".mp3", "libmp3lame", "192k", None, "mp3",
+                         "mp3", "192", "MP3 192 kbps"),
+    "opus": OutputProfile("opus", ".opus", "libopus", "160k", 48000, "opus",
+                          "opus", "160", "Opus 160 kbps"),
+    "aac": OutputProfile("aac", ".m4a", "aac", "192k", None, "ipod",
+                         "m4a", "192", "AAC 192 kbps (M4A)"),
+    "flac": OutputProfile("flac", ".flac", "flac", None, None, "flac",
+                          "flac", None, "FLAC sin pérdida"),
+    "passthrough": OutputProfile("passthrough", None, "copy", None, None, None,
+                                 "best", None, "Códec original sin recodificar"),
+}
+DEFAULT_PROFILE = "mp3"
+
+# Contenedor que se usa en passthrough para cada códec de la fuente
+PASSTHROUGH_EXTENSIONS = {
+    'opus': ".opus",
+    'vorbis': ".ogg",
+    'aac': ".m4a",
+    'mp3': ".mp3",
+    'flac': ".flac",
+}
+
+# Formatos que la biblioteca reconoce como pistas (todos los que pueden generar los perfiles)
+LIBRARY_EXTENSIONS = (".mp3", ".opus", ".ogg", ".m4a", ".flac")
+
+# Content-Type de cada formato (mimetypes depende de las tablas del sistema)
+MIME_TYPES = {
+    ".mp3": "audio/mpeg",
+    ".opus": "audio/ogg",
+    ".ogg": "audio/ogg",
+    ".m4a": "audio/mp4",
+    ".flac": "audio/flac",
+}
+
+
+def get_profile(name=None):
+    """Perfil por nombre (o el de EKHO_OUTPUT_PROFILE); ValueError si no existe"""
+    name = (name or os.environ.get("EKHO_OUTPUT_PROFILE") or DEFAULT_PROFILE).lower()
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Perfil de salida desconocido: {name} (disponibles: {', '.join(PROFILES)})")
+
+
+def is_library_file(path):
+    # Los ocultos son copias a medio confirmar (library_commit), no pistas
+    return path.lower().endswith(LIBRARY_EXTENSIONS) and not os.path.basename(path).startswith(".")
+
+
+def mime_type(path):
+    """Content-Type de un archivo de la biblioteca (application/octet-stream si no se conoce)"""
+    extension = os.path.splitext(path)[1].lower()
+    return MIME_TYPES.get(extension) or mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+def probe_audio_codec(path):
+    """Códec de la primera pista de audio según FFmpeg (p.ej. 'opus', 'aac'), o None"""
+    completed = subprocess.run([get_ffmpeg_exe(), "-hide_banner", "-nostdin", "-i", path],
+                               capture_output=True)
+    match = re.search(r"Audio:\s*([\w-]+)", completed.stderr.decode("utf-8", errors="replace"))
+    return match.group(1).lower() if match else None
+
+
+def passthrough_path(path):
+    """Ruta de destino en passthrough: mismo nombre con el contenedor propio del códec"""
+    codec = probe_audio_codec(path)
+    extension = PASSTHROUGH_EXTENSIONS.get(codec)
+    if extension is None:
+        raise ValueError(f"Códec de audio sin contenedor conocido para passthrough: {codec}")
+    return os.path.splitext(path)[0] + extension
+
+
+def remux_audio(path, target_path):
+    """Copia el audio a otro contenedor sin recodificar (sin vídeo ni portadas incrustadas)"""
+    command = [get_ffmpeg_exe(), "-y", "-v", "error", "-nostdin", "-i", path,
+               "-map", "0:a:0", "-c:a", "copy", target_path]
+    completed = subprocess.run(command, capture_output=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.decode("utf-8", errors="replace").strip()
+                           or f"FFmpeg terminó con {completed.returncode}")
+    return target_path
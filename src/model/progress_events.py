@@ -0,0 +1,256 @@
+# progress_events.py
+"""
+Bus de eventos de progreso de las conversiones
+
+Los modelos publican eventos tipados en lugar de depender de print para informar del
+progreso; vistas de terminal, métricas y API se suscriben a los tipos que les interesan:
+
+- StageStarted / StageFinished: inicio y fin de cada etapa (metadata, search, download...)
+- DownloadProgress: bytes descargados y totales (desde los progress_hooks de yt-dlp y desde
+  las descargas propias por rangos)
+- TranscodeProgress: porcentaje de la conversión de audio
+- TrackFinished: resultado de cada pista
+- BatchStarted: número de pistas de un lote (para throughput y ETA)
+
+Publicar cuesta una consulta a un diccionario cuando nadie escucha ese tipo, y los eventos
+de bytes y de porcentaje se limitan a PROGRESS_INTERVAL_SECONDS por pista. Los suscriptores
+se llaman en el hilo que publica: deben ser rápidos y no lanzar excepciones (si lo hacen, se
+cuentan y se ignoran).
+
+La pista a la que pertenece cada evento se toma del contexto (current_task): la fija
+stage_events al empezar cada etapa, también dentro de los ejecutores de async_runtime.
+"""
+
+import time
+import threading
+import contextvars
+import contextlib
+from collections import namedtuple
+
+# Intervalo mínimo entre eventos de bytes/porcentaje de una misma pista
+PROGRESS_INTERVAL_SECONDS = 0.25
+
+StageStarted = namedtuple("StageStarted", ["task", "stage"])
+StageFinished = namedtuple("StageFinished", ["task", "stage", "elapsed", "error"])
+DownloadProgress = namedtuple("DownloadProgress", ["task", "downloaded", "total", "speed"])
+TranscodeProgress = namedtuple("TranscodeProgress", ["task", "percent"])
+TrackFinished = namedtuple("TrackFinished", ["task", "ok", "output", "error", "elapsed"])
+BatchStarted = namedtuple("BatchStarted", ["total"])
+
+EVENT_TYPES = (StageStarted, StageFinished, DownloadProgress, TranscodeProgress, TrackFinished,
+               BatchStarted)
+
+# Pista en curso en este contexto (hilo o corrutina)
+current_task = contextvars.ContextVar("ekho_current_task", default=None)
+
+
+class EventBus:
+    """Publicación/suscripción síncrona por tipo de evento"""
+
+    def __init__(self):
+        # tipo -> tupla de callbacks (copia al escribir: publicar no necesita lock)
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self.subscriber_errors = 0
+
+    def subscribe(self, callback, event_types=EVENT_TYPES):
+        """Suscribe callback(evento) a los tipos dados; devuelve la función para darse de baja"""
+        with self._lock:
+            for event_type in event_types:
+                self._subscribers[event_type] = self._subscribers.get(event_type, ()) + (callback,)
+
+        def unsubscribe():
+            with self._lock:
+                for event_type in event_types:
+                    callbacks = self._subscribers.get(event_type, ())
+                    self._subscribers[event_type] = tuple(c for c in callbacks if c is not callback)
+        return unsubscribe
+
+    def has_subscribers(self, event_type):
+        return bool(self._subscribers.get(event_type))
+
+    def emit(self, event):
+        for callback in self._subscribers.get(type(event), ()):
+            try:
+                callback(event)
+            except Exception:
+                self.subscriber_errors += 1
+
+
+_bus = None
+_bus_lock = threading.Lock()
+
+
+def get_event_bus():
+    """Bus compartido del proceso (creado en el primer uso)"""
+    global _bus
+    if _bus is not None:
+        return _bus
+    with _bus_lock:
+        if _bus is None:
+            _bus = EventBus()
+        return _bus
+
+
+def emit(event):
+    get_event_bus().emit(event)
+
+
+@contextlib.contextmanager
+def stage_events(task, stage):
+    """Publica inicio y fin de una etapa y fija la pista en curso mientras dura"""
+    token = current_task.set(task)
+    bus = get_event_bus()
+    bus.emit(StageStarted(task, stage))
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        bus.emit(StageFinished(task, stage, time.perf_counter() - start, str(e) or type(e).__name__))
+        raise
+    else:
+        bus.emit(StageFinished(task, stage, time.perf_counter() - start, None))
+    finally:
+        current_task.reset(token)
+
+
+# --- Progreso de bytes y de porcentaje (limitado por pista) ---
+
+_last_emit = {}
+_last_emit_lock = threading.Lock()
+
+
+def _due(kind, task, final):
+    """True si toca publicar otro evento de progreso de este tipo para esta pista"""
+    now = time.monotonic()
+    key = (kind, task)
+    with _last_emit_lock:
+        if final:
+            _last_emit.pop(key, None)
+            return True
+        if now - _last_emit.get(key, 0) < PROGRESS_INTERVAL_SECONDS:
+            return False
+        _last_emit[key] = now
+        return True
+
+
+def report_download(downloaded, total=None, speed=None, final=False):
+    """Publica DownloadProgress para la pista en curso (como mucho cada PROGRESS_INTERVAL_SECONDS)"""
+    bus = get_event_bus()
+    if not bus.has_subscribers(DownloadProgress):
+        return
+    task = current_task.get()
+    if _due("download", task, final or (total and downloaded >= total)):
+        bus.emit(DownloadProgress(task, downloaded, total, speed))
+
+
+def report_transcode(percent, final=False):
+    """Publica TranscodeProgress (0-100) para la pista en curso"""
+    bus = get_event_bus()
+    if not bus.has_subscribers(TranscodeProgress):
+        return
+    task = current_task.get()
+    if _due("transcode", task, final or percent >= 100):
+        bus.emit(TranscodeProgress(task, min(100.0, float(percent))))
+
+
+def ytdl_progress_hook(status):
+    """progress_hooks de yt-dlp -> DownloadProgress"""
+    if status.get('status') not in ('downloading', 'finished'):
+        return
+    total = status.get('total_bytes') or status.get('total_bytes_estimate')
+    report_download(status.get('downloaded_bytes') or 0, total, status.get('speed'),
+                    final=status['status'] == 'finished')
+
+
+def ytdl_postprocessor_hook(status):
+    """postprocessor_hooks de yt-dlp -> TranscodeProgress (FFmpeg no informa de pasos intermedios)"""
+    if status.get('postprocessor') != 'ExtractAudio':
+        return
+    if status.get('status') == 'started':
+        report_transcode(0)
+    elif status.get('status') == 'finished':
+        report_transcode(100, final=True)
+
+
+def moviepy_logger():
+    """Logger de proglog para moviepy que publica TranscodeProgress (None si nadie escucha)"""
+    if not get_event_bus().has_subscribers(TranscodeProgress):
+        return None
+    try:
+        from proglog import ProgressBarLogger
+    except ImportError:
+        return None
+
+    class _TranscodeLogger(ProgressBarLogger):
+        def bars_callback(self, bar, attr, value, old_value=None):
+            total = self.bars[bar].get('total')
+            if attr == 'index' and total:
+                report_transcode(100.0 * (value + 1) / total)
+
+    return _TranscodeLogger()
+
+
+class ProgressMetrics:
+    """Suscriptor que acumula métricas de las conversiones (para /health y resúmenes)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.tracks = {'ok': 0, 'failed': 0}
+        self.bytes_downloaded = 0
+        # etapa -> {'count', 'errors', 'total_s'}
+        self.stages = {}
+        # pista con una etapa en curso -> {'stage', 'downloaded', 'total', 'transcode'}
+        self.active = {}
+
+    def __call__(self, event):
+        with self._lock:
+            if isinstance(event, StageStarted):
+                self.active.setdefault(event.task, {})['stage'] = event.stage
+            elif isinstance(event, StageFinished):
+                stats = self.stages.setdefault(event.stage, {'count': 0, 'errors': 0, 'total_s': 0.0})
+                stats['count'] += 1
+                stats['errors'] += event.error is not None
+                stats['total_s'] += event.elapsed
+                # Solo se siguen las pistas con una etapa en curso
+                state = self.active.pop(event.task, None) or {}
+                self.bytes_downloaded += state.get('downloaded', 0)
+            elif isinstance(event, DownloadProgress):
+                state = self.active.setdefault(event.task, {})
+                state['downloaded'], state['total'] = event.downloaded, event.total
+            elif isinstance(event, TranscodeProgress):
+                self.active.setdefault(event.task, {})['transcode'] = round(event.percent, 1)
+            elif isinstance(event, TrackFinished):
+                self.tracks['ok' if event.ok else 'failed'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = max(time.time() - self.started, 1e-9)
+            done = self.tracks['ok'] + self.tracks['failed']
+            return {
+                'tracks': dict(self.tracks),
+                'tracks_per_min': round(60 * done / elapsed, 2),
+                'bytes_downloaded': self.bytes_downloaded,
+                'stages': {stage: {'count': stats['count'], 'errors': stats['errors'],
+                                   'avg_s': round(stats['total_s'] / stats['count'], 3)}
+                           for stage, stats in self.stages.items()},
+                'active': {task: dict(state) for task, state in self.active.items()},
+            }
+
+
+_metrics = None
+
+
+def get_progress_metrics():
+    """Métricas compartidas del proceso (se suscriben al bus en el primer uso)"""
+    global _metrics
+    with _bus_lock:
+        if _metrics is None:
+            _metrics = ProgressMetrics()
+            created = True
+        else:
+            created = False
+    if created:
+        get_event_bus().subscribe(_metrics)
+    return _metrics
@@ -0,0 +1,278 @@
+# rate_limiter.py
+"""
+Limitador de peticiones adaptativo por host y tipo de operación
+
+Cada combinación host + operación (p.ej. 'youtube.com:search', 'spotify.com:metadata')
+tiene un cubo de tokens. Antes de hablar con el servicio remoto se reserva un token; si
+no hay, la hebra espera lo justo hasta que se repone.
+
+El ritmo se adapta a lo que el servidor tolera (AIMD):
+- Un HTTP 429 o un "Sign in to confirm you're not a bot" reduce el ritmo a la mitad y
+  bloquea el cubo durante un backoff exponencial (o lo que indique Retry-After).
+- Cada racha de respuestas correctas lo sube un poco, hasta el máximo configurado.
+
+El estado vive en SQLite (data/jobs/ratelimit.db), de modo que todas las hebras y todos
+los procesos (lotes en paralelo, daemon) comparten el mismo presupuesto por host.
+
+La variable de entorno EKHO_RATE_LIMIT_SCALE multiplica todos los ritmos
+(0 desactiva el limitador; útil en pruebas contra servidores locales).
+"""
+
+import os
+import re
+import time
+import random
+import sqlite3
+import threading
+import contextlib
+import urllib.parse
+
+from model.conversor_model import get_data_dir
+from model.job_store import _Transaction
+from model.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Hosts canónicos (los alias comparten cubo)
+YOUTUBE_HOST = "youtube.com"
+SPOTIFY_HOST = "spotify.com"
+
+_HOST_ALIASES = {
+    "youtu.be": YOUTUBE_HOST,
+    "googlevideo.com": YOUTUBE_HOST,
+    "ytimg.com": YOUTUBE_HOST,
+    "scdn.co": SPOTIFY_HOST,
+    "spotifycdn.com": SPOTIFY_HOST,
+}
+
+# Límites por operación: ritmo inicial (peticiones/s), ráfaga, ritmo mínimo y máximo
+OPERATION_LIMITS = {
+    f"{YOUTUBE_HOST}:search": {'rate': 1.0, 'burst': 3, 'min_rate': 0.05, 'max_rate': 4.0},
+    f"{YOUTUBE_HOST}:download": {'rate': 1.0, 'burst': 4, 'min_rate': 0.05, 'max_rate': 4.0},
+    f"{SPOTIFY_HOST}:metadata": {'rate': 2.0, 'burst': 5, 'min_rate': 0.1, 'max_rate': 8.0},
+    f"{SPOTIFY_HOST}:web": {'rate': 1.0, 'burst': 3, 'min_rate': 0.05, 'max_rate': 4.0},
+}
+DEFAULT_LIMITS = {'rate': 2.0, 'burst': 5, 'min_rate': 0.05, 'max_rate': 10.0}
+
+# Backoff tras un bloqueo: BASE * 2^(penalizaciones-1), con tope y ±20% de jitter
+BACKOFF_BASE_SECONDS = 5.0
+BACKOFF_MAX_SECONDS = 300.0
+# Subida aditiva: cada INCREASE_EVERY éxitos seguidos el ritmo sube un 10% del inicial
+INCREASE_EVERY = 20
+INCREASE_STEP_RATIO = 0.1
+
+_THROTTLE_PATTERN = re.compile(
+    r"\b429\b|too many requests|sign in to confirm|rate.?limit|quota exceeded", re.IGNORECASE)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    rate REAL NOT NULL,
+    updated REAL NOT NULL,
+    blocked_until REAL NOT NULL DEFAULT 0,
+    penalties INTEGER NOT NULL DEFAULT 0,
+    successes INTEGER NOT NULL DEFAULT 0,
+    throttled INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def canonical_host(url_or_host):
+    """Host normalizado de una URL ('https://m.youtube.com/...' -> 'youtube.com')"""
+    host = urllib.parse.urlparse(url_or_host).hostname if "://" in url_or_host else url_or_host
+    host = (host or "").lower()
+    for suffix, canonical in list(_HOST_ALIASES.items()) + [(YOUTUBE_HOST, YOUTUBE_HOST),
+                                                           (SPOTIFY_HOST, SPOTIFY_HOST)]:
+        if host == suffix or host.endswith("." + suffix):
+            return canonical
+    return host
+
+
+def is_throttle_error(error):
+    """True si la excepción (o mensaje) indica que el servidor nos está limitando"""
+    status = getattr(getattr(error, "response", None), "status_code", None) or getattr(error, "http_status", None)
+    if status == 429:
+        return True
+    return bool(_THROTTLE_PATTERN.search(str(error)))
+
+
+def _retry_after(error):
+    """Segundos de la cabecera Retry-After asociada a la excepción, si existe"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or getattr(error, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+class RateLimiter:
+    """Cubos de tokens persistentes y compartidos entre hebras y procesos"""
+
+    def __init__(self, db_path=None, scale=None):
+        self.db_path = db_path or os.path.join(get_data_dir("jobs"), "ratelimit.db")
+        if scale is None:
+            scale = float(os.environ.get("EKHO_RATE_LIMIT_SCALE", "1") or 1)
+        self.scale = scale
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @property
+    def enabled(self):
+        return self.scale > 0
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return _Transaction(conn)
+
+    def _limits(self, key):
+        limits = OPERATION_LIMITS.get(key, DEFAULT_LIMITS)
+        return {name: (value * self.scale if name != 'burst' else value) for name, value in limits.items()}
+
+    def _load(self, conn, key, now):
+        """Lee (o crea) el cubo dentro de la transacción en curso"""
+        row = conn.execute("SELECT * FROM buckets WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            return dict(row)
+        limits = self._limits(key)
+        return {'key': key, 'tokens': float(limits['burst']), 'rate': limits['rate'], 'updated': now,
+                'blocked_until': 0.0, 'penalties': 0, 'successes': 0, 'throttled': 0}
+
+    @staticmethod
+    def _store(conn, bucket):
+        conn.execute(
+            "INSERT OR REPLACE INTO buckets (key, tokens, rate, updated, blocked_until, penalties, "
+            "successes, throttled) VALUES (:key, :tokens, :rate, :updated, :blocked_until, :penalties, "
+            ":successes, :throttled)", bucket)
+
+    @staticmethod
+    def key(host, operation):
+        return f"{canonical_host(host)}:{operation}"
+
+    def acquire(self, host, operation):
+        """Reserva un token y espera hasta que esté disponible; devuelve los segundos esperados"""
+        if not self.enabled:
+            return 0.0
+
+        key = self.key(host, operation)
+        burst = self._limits(key)['burst']
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            bucket = self._load(conn, key, now)
+            # Reponer tokens desde la última actualización (si el cubo está bloqueado,
+            # 'updated' apunta al final del bloqueo y no se repone nada hasta entonces)
+            elapsed = now - bucket['updated']
+            if elapsed > 0:
+                bucket['tokens'] = min(burst, bucket['tokens'] + elapsed * bucket['rate'])
+                bucket['updated'] = now
+            # Reservar: los tokens pueden quedar en negativo (cola de espera compartida)
+            bucket['tokens'] -= 1
+            wait = bucket['updated'] - now
+            if bucket['tokens'] < 0:
+                wait += -bucket['tokens'] / bucket['rate']
+            self._store(conn, bucket)
+
+        if wait > 0:
+            if wait >= 1:
+                logger.info(f"⏳ Limitando peticiones a {key}: esperando {wait:.1f}s")
+            time.sleep(wait)
+        return max(0.0, wait)
+
+    def report_success(self, host, operation):
+        """Respuesta correcta: tras una racha de éxitos el ritmo sube un poco (aumento aditivo)"""
+        if not self.enabled:
+            return
+        key = self.key(host, operation)
+        limits = self._limits(key)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            bucket = self._load(conn, key, now)
+            bucket['successes'] += 1
+            if bucket['successes'] >= INCREASE_EVERY and now >= bucket['blocked_until']:
+                bucket['rate'] = min(limits['max_rate'],
+                                     bucket['rate'] + limits['rate'] * INCREASE_STEP_RATIO)
+                bucket['penalties'] = max(0, bucket['penalties'] - 1)
+                bucket['successes'] = 0
+            self._store(conn, bucket)
+
+    def report_throttled(self, host, operation, retry_after=None):
+        """El servidor nos limitó: ritmo a la mitad y bloqueo con backoff exponencial"""
+        if not self.enabled:
+            return 0.0
+        key = self.key(host, operation)
+        limits = self._limits(key)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            bucket = self._load(conn, key, now)
+            bucket['penalties'] += 1
+            bucket['throttled'] += 1
+            bucket['successes'] = 0
+            bucket['rate'] = max(limits['min_rate'], bucket['rate'] / 2)
+            backoff = retry_after if retry_after else min(
+                BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (bucket['penalties'] - 1))
+            backoff *= random.uniform(0.8, 1.2)
+            # Varias hebras pueden chocar a la vez con el mismo bloqueo: no acumular backoffs
+            bucket['blocked_until'] = max(bucket['blocked_until'], now + backoff)
+            bucket['updated'] = bucket['blocked_until']
+            bucket['tokens'] = 0.0
+            self._store(conn, bucket)
+
+        logger.info(f"🚦 {key} limitado por el servidor: pausa de {backoff:.1f}s, "
+              f"ritmo reducido a {bucket['rate']:.2f} peticiones/s")
+        return backoff
+
+    @contextlib.contextmanager
+    def limit(self, host, operation):
+        """Context manager: reserva un token y registra si la operación fue limitada"""
+        self.acquire(host, operation)
+        try:
+            yield
+        except Exception as e:
+            if is_throttle_error(e):
+                self.report_throttled(host, operation, _retry_after(e))
+            raise
+        self.report_success(host, operation)
+
+    def call(self, host, operation, func, *args, retries=3, **kwargs):
+        """Ejecuta func respetando el límite; si el servidor limita, espera y reintenta"""
+        for attempt in range(retries + 1):
+            try:
+                with self.limit(host, operation):
+                    return func(*args, **kwargs)
+            except Exception as e:
+                if not is_throttle_error(e) or attempt >= retries or not self.enabled:
+                    raise
+                # El siguiente acquire esperará a que termine el bloqueo
+
+    def stats(self):
+        """Estado actual de todos los cubos (para diagnóstico / endpoint de salud)"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM buckets ORDER BY key").fetchall()
+        now = time.time()
+        return {row['key']: {'rate': round(row['rate'], 3),
+                             'blocked_for_s': round(max(0.0, row['blocked_until'] - now), 1),
+                             'throttled': row['throttled']}
+                for row in rows}
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Limitador compartido del proceso (creado en el primer uso)"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
@@ -0,0 +1,247 @@
+# scratch_space.py
+"""
+Espacio temporal de las conversiones: presupuesto de bytes en vuelo y limpieza al arrancar
+
+Cada pista ocupa data/temp mientras se convierte: la descarga (.webm/.m4a), la salida del
+transcodificado y sus restos hasta que entra en la biblioteca. En un lote grande las
+descargas (red) van más rápido que el transcodificado y el etiquetado (CPU), y sin límite
+los intermedios se acumulan hasta llenar el disco.
+
+ScratchBudget lleva la cuenta de los bytes de cada pista en vuelo y de la etapa en la que
+están. Antes de la etapa de descarga, la pista reserva lo que se espera que ocupe (la
+media de las descargas ya medidas) y espera si con eso se superaría EKHO_SCRATCH_LIMIT_MB,
+o si al disco de data/temp le quedan menos de EKHO_MIN_FREE_MB libres: mientras las etapas
+de CPU van por detrás, las descargas se pausan en lugar de seguir acumulando archivos.
+Tras cada etapa se mide el área de preparación de la pista y al terminar (o fallar) se
+libera. La espera es asíncrona: no ocupa hilos de los ejecutores, así que las pistas que
+ya tienen su espacio siguen avanzando y lo liberan.
+
+clean_orphaned_temp() se ejecuta al arrancar los modos por lotes, daemon y worker: borra
+lo que lleva más de EKHO_TEMP_MAX_AGE_HOURS sin tocarse (áreas de preparación, descargas
+parciales, portadas, estadísticas de sonoridad), salvo las áreas de preparación de las
+pistas reanudables según los checkpoints.
+"""
+
+import os
+import time
+import shutil
+import asyncio
+import threading
+
+from model.conversor_model import get_data_dir
+from model.library_commit import staging_name
+from model.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+MB = 1024 * 1024
+SCRATCH_LIMIT = int(float(os.environ.get("EKHO_SCRATCH_LIMIT_MB", "2048")) * MB)
+MIN_FREE_BYTES = int(float(os.environ.get("EKHO_MIN_FREE_MB", "512")) * MB)
+TEMP_MAX_AGE = float(os.environ.get("EKHO_TEMP_MAX_AGE_HOURS", "24")) * 3600
+
+# Reserva de una descarga mientras aún no hay ninguna medida
+DEFAULT_DOWNLOAD_ESTIMATE = 16 * MB
+# Cada cuánto vuelve a comprobar el presupuesto una descarga en espera
+WAIT_POLL_SECONDS = 0.2
+
+
+class InsufficientDiskSpaceError(OSError):
+    """No queda espacio libre en data/temp y no hay ninguna pista en vuelo que lo libere"""
+
+
+def _tree_size(path):
+    """Bytes de un archivo o carpeta (0 si no existe)"""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _last_modified(path):
+    """mtime más reciente dentro de un archivo o carpeta"""
+    latest = os.path.getmtime(path)
+    for root, dirs, files in os.walk(path):
+        for name in dirs + files:
+            try:
+                latest = max(latest, os.path.getmtime(os.path.join(root, name)))
+            except OSError:
+                pass
+    return latest
+
+
+def free_disk_space(path=None):
+    """Bytes libres en el disco de data/temp"""
+    return shutil.disk_usage(path or get_data_dir("temp")).free
+
+
+class ScratchBudget:
+    """Bytes de data/temp en vuelo por pista y etapa, con espera de las descargas si no caben"""
+
+    def __init__(self, limit=SCRATCH_LIMIT, min_free=MIN_FREE_BYTES):
+        self.limit = limit
+        self.min_free = min_free
+        self._lock = threading.Lock()
+        # task_key -> (etapa, bytes)
+        self._tasks = {}
+        self._measured_downloads = 0
+        self._measured_bytes = 0
+        self._waits = 0
+
+    def download_estimate(self):
+        """Lo que se espera que ocupe una descarga: la media de las ya medidas"""
+        with self._lock:
+            if not self._measured_downloads:
+                return DEFAULT_DOWNLOAD_ESTIMATE
+            return max(MB, self._measured_bytes // self._measured_downloads)
+
+    def in_flight(self):
+        """Bytes en vuelo por etapa ({'download': ..., 'transcode': ...})"""
+        by_stage = {}
+        with self._lock:
+            for stage, size in self._tasks.values():
+                by_stage[stage] = by_stage.get(stage, 0) + size
+        return by_stage
+
+    def total(self):
+        with self._lock:
+            return sum(size for _, size in self._tasks.values())
+
+    def _try_reserve(self, task_key, estimate):
+        """Reserva si cabe; devuelve None o el motivo de la espera"""
+        with self._lock:
+            others = sum(size for key, (_, size) in self._tasks.items() if key != task_key)
+            idle = not any(key != task_key for key in self._tasks)
+            if others + estimate > self.limit and not idle:
+                return f"{others / MB:.0f} MB en vuelo (límite {self.limit / MB:.0f} MB)"
+            free = free_disk_space()
+            if free - estimate < self.min_free:
+                if idle:
+                    raise InsufficientDiskSpaceError(
+                        f"Espacio insuficiente en disco: {free / MB:.0f} MB libres en data/temp "
+                        f"(mínimo {self.min_free / MB:.0f} MB)")
+                return f"quedan {free / MB:.0f} MB libres en disco"
+            self._tasks[task_key] = ("download", estimate)
+            return None
+
+    async def acquire_download(self, task_key):
+        """Espera (sin ocupar hilos) hasta que la descarga de la pista quepa en el presupuesto"""
+        estimate = self.download_estimate()
+        reason = self._try_reserve(task_key, estimate)
+        if reason is None:
+            return
+        logger.info(f"⏸️ Descarga en espera: {reason}")
+        with self._lock:
+            self._waits += 1
+        started = time.monotonic()
+        while reason is not None:
+            await asyncio.sleep(WAIT_POLL_SECONDS)
+            reason = self._try_reserve(task_key, estimate)
+        logger.debug(f"▶️ Descarga reanudada tras {time.monotonic() - started:.1f}s de espera")
+
+    def measure(self, task_key, stage):
+        """Sustituye la reserva de una pista en vuelo por lo que ocupa su área tras la etapa"""
+        with self._lock:
+            if task_key not in self._tasks:
+                return
+        size = _tree_size(os.path.join(get_data_dir("temp", "staging"), staging_name(task_key)))
+        with self._lock:
+            if task_key not in self._tasks:
+                return
+            self._tasks[task_key] = (stage, size)
+            if stage == "download" and size:
+                self._measured_downloads += 1
+                self._measured_bytes += size
+
+    def release(self, task_key):
+        """La pista terminó o falló: sus bytes dejan de contar"""
+        with self._lock:
+            self._tasks.pop(task_key, None)
+
+    def stats(self):
+        """Resumen para /health: bytes en vuelo por etapa, límite y descargas que tuvieron que esperar"""
+        in_flight = self.in_flight()
+        with self._lock:
+            tasks, waits = len(self._tasks), self._waits
+        return {
+            'limit_bytes': self.limit,
+            'in_flight_bytes': sum(in_flight.values()),
+            'in_flight_by_stage': in_flight,
+            'tasks': tasks,
+            'download_waits': waits,
+            'download_estimate_bytes': self.download_estimate(),
+            'free_bytes': free_disk_space(),
+        }
+
+
+_budget = None
+_budget_lock = threading.Lock()
+
+
+def get_scratch_budget():
+    """Presupuesto compartido del proceso"""
+    global _budget
+    with _budget_lock:
+        if _budget is None:
+            _budget = ScratchBudget()
+        return _budget
+
+
+def clean_orphaned_temp(store=None, max_age=TEMP_MAX_AGE):
+    """Borra de data/temp lo que ninguna pista reanudable va a usar.
+
+    Las áreas de preparación se conservan siempre si su pista tiene checkpoints sin
+    'finalize' (store: JobStore; por defecto data/jobs/jobs.db si existe). Todo lo demás
+    se borra solo si lleva más de max_age segundos sin modificarse: una pista en vuelo en
+    otro proceso sobre la misma carpeta de datos (varios workers en una máquina) aún no
+    tiene checkpoints mientras descarga, pero su área sí se está escribiendo.
+    Devuelve (elementos borrados, bytes liberados).
+    """
+    temp_dir = get_data_dir("temp")
+    staging_root = os.path.join(temp_dir, "staging")
+    resumable = None
+    try:
+        if store is None:
+            from model.job_store import JobStore, default_db_path
+            if os.path.exists(default_db_path()):
+                store = JobStore()
+        if store is not None:
+            resumable = {staging_name(task_key) for task_key in store.unfinished_tasks()}
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudieron leer los checkpoints ({e}): solo se limpia lo antiguo")
+
+    now = time.time()
+    candidates = []
+    if os.path.isdir(staging_root):
+        for name in os.listdir(staging_root):
+            path = os.path.join(staging_root, name)
+            if resumable is not None and name in resumable:
+                continue
+            if now - _last_modified(path) > max_age:
+                candidates.append(path)
+    for name in os.listdir(temp_dir):
+        path = os.path.join(temp_dir, name)
+        if path != staging_root and now - _last_modified(path) > max_age:
+            candidates.append(path)
+
+    removed, freed = 0, 0
+    for path in candidates:
+        size = _tree_size(path)
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        except OSError as e:
+            logger.warning(f"⚠️ No se pudo borrar {path}: {e}")
+            continue
+        removed += 1
+        freed += size
+    if removed:
+        logger.info(f"🧹 data/temp: {removed} elemento(s) huérfano(s) borrado(s), {freed / MB:.1f} MB liberados")
+    return removed, freed
@@ -2,50 +2,93 @@
 import os
 import re
 import json
-import requests
 import tempfile
 import datetime
-from model.conversor_model import BaseModel
+import threading
+import time
+from types import SimpleNamespace
+from model.conversor_model import BaseModel, get_data_dir
+from model.http_client import get_session
+from model.download_manager import (RANGE_REQUEST_SIZE, connections_per_file, job_temp_dir,
+                                    remove_job_temp_dir, validate_audio_file)
+from model.rate_limiter import SPOTIFY_HOST, YOUTUBE_HOST, get_rate_limiter, is_throttle_error
+from model.metadata_cache import get_metadata_cache
+from model.metadata_resolver import HedgedResolver
+from model.html_metadata import (EMBED_FIELDS, EMBED_META_FIELDS, MAIN_PAGE_FIELDS, pick_album, pick_image,
+                                 read_capped, scan_html)
+from model.match_scorer import ACCEPT_SCORE, select_best
+from model.youtube_info import get_resolved_info_cache, ydl_cache_options, youtube_video_id
+from model.ytdl_pool import get_ytdl_pool
+from model.async_runtime import run_blocking, run_cpu, run_network
+from model.progress_events import ytdl_postprocessor_hook, ytdl_progress_hook
+from model.loudness import LOUDNESS_ENABLED, analysis_filter, apply_stats, tag_file
+from model.output_profiles import get_profile
+from model.audio_tags import write_tags
+from model.library_commit import remove_staging_dir, staging_dir
+from model.naming import NAME_TEMPLATE, get_path_index, render_name
+from model.logging_config import get_logger
+
+logger = get_logger(__name__)
 
 # Bibliotecas esenciales simplificadas
 try:
     from moviepy.editor import AudioFileClip
-    print("✅ Usando moviepy para conversión de audio de Spotify")
+    logger.debug("✅ Usando moviepy para conversión de audio de Spotify")
 except ImportError:
-    print("⚠️ moviepy no disponible. Instala: pip install moviepy")
+    logger.warning("⚠️ moviepy no disponible. Instala: pip install moviepy")
     raise ImportError("moviepy es requerido para conversión")
 
 try:
     from mutagen.mp3 import MP3
     from mutagen.id3 import ID3, APIC, TIT2, TPE1, TALB # type: ignore
-    print("✅ Usando mutagen para metadatos de audio de Spotify")
+    logger.debug("✅ Usando mutagen para metadatos de audio de Spotify")
 except ImportError:
-    print("⚠️ mutagen no disponible. Instala: pip install mutagen")
+    logger.warning("⚠️ mutagen no disponible. Instala: pip install mutagen")
     raise ImportError("mutagen es requerido para metadatos")
 
 # Bibliotecas obligatorias
-try:
-    import yt_dlp
-    print("✅ Usando yt-dlp para descargas desde YouTube")
-except ImportError:
-    print("⚠️ yt-dlp no disponible. Instala: pip install yt-dlp")
-    raise ImportError("yt-dlp es requerido para descargas")
-
 try:
     from spotdl.search.song_gatherer import from_spotify_url as spotdl_from_spotify_url
     SPOTDL_API_MODE = "song_gatherer"
-    print("✅ Usando spotdl.search.song_gatherer para metadatos de Spotify")
+    logger.debug("✅ Usando spotdl.search.song_gatherer para metadatos de Spotify")
 except ImportError:
     try:
         from spotdl import Spotdl
         from spotdl.utils.config import get_config
         SPOTDL_API_MODE = "legacy_spotdl_class"
-        print("✅ Usando API legacy de spotdl para metadatos de Spotify")
+        logger.debug("✅ Usando API legacy de spotdl para metadatos de Spotify")
     except ImportError:
-        print("🚨 ERROR: spotdl no disponible - ES OBLIGATORIO")
-        print("   📦 INSTALAR: pip install spotdl")
+        logger.error("🚨 ERROR: spotdl no disponible - ES OBLIGATORIO")
+        logger.error("   📦 INSTALAR: pip install spotdl")
         raise ImportError("spotdl es requerido para el funcionamiento")
 
+# El archivo fijo de metadatos se lee y reescribe completo: serializar entre hilos
+_METADATA_FILE_LOCK = threading.RLock()
+
+# IDs de las pistas ya registradas en el archivo fijo durante la sesión actual
+_SESSION_TRACK_IDS = set()
+
+# Los metadatos de los métodos alternativos (sin álbum ni duración fiables) caducan antes:
+# pasado este tiempo se vuelve a intentar con spotdl
+FALLBACK_METADATA_TTL = 3600
+
+# Patrones de las páginas públicas de Spotify (compilados una sola vez)
+_SPOTIFY_SUFFIX_PATTERN = re.compile(r'\s*\|\s*Spotify.*$', re.IGNORECASE)
+_PAGE_TITLE_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'^(.+?)\s*-\s*song\s+(?:and\s+lyrics\s+)?by\s+(.+?)$',      # "Song - song and lyrics by Artist"
+    r'^(.+?)\s*-\s*song\s+(?:and\s+lyrics\s+)?(?:by\s+)?(.+?)$', # "Song - song and lyrics Artist"
+    r'^(.+?)\s+by\s+(.+?)$',                                     # "Song by Artist"
+    r'^(.+?)\s*·\s*(.+?)$',                                      # "Song · Artist"
+    r'^(.+?)\s*-\s*(.+?)$',                                      # "Song - Artist"
+)]
+_SONG_SUFFIX_PATTERN = re.compile(r'\s*-\s*(?:song|music|audio)(?:\s+and\s+lyrics)?.*$', re.IGNORECASE)
+_SONG_TAGS_PATTERN = re.compile(r'\s*\(\s*(?:official|audio|music|video).*?\)\s*', re.IGNORECASE)
+_DESCRIPTION_PATTERNS = [re.compile(pattern) for pattern in (
+    r'Listen to (.+?) (?:by|from) (.+?) on Spotify',
+    r'Escucha (.+?) de (.+?) en Spotify',
+    r'(.+?) · Song · (.+?) · \d+',
+)]
+
 class SpotifyInfoExtractor:
     """Extrae información de Spotify usando spotdl como método principal y métodos alternativos como fallback"""
     
@@ -69,128 +112,285 @@ class SpotifyInfoExtractor:
             else:
                 self.spotdl = None
 
-            print("✅ SpotDL configurado exitosamente")
+            logger.info("✅ SpotDL configurado exitosamente")
             
         except Exception as e:
-            print(f"🚨 Error configurando SpotDL: {e}")
+            logger.error(f"🚨 Error configurando SpotDL: {e}")
             raise RuntimeError("SpotDL es obligatorio para el funcionamiento")
 
+        # Sesión HTTP compartida para los métodos alternativos (páginas públicas de Spotify)
+        self.session = get_session()
+        # spotdl primero; si tarda más de lo habitual se lanzan en paralelo los métodos
+        # alternativos. (nombre, función, latencia inicial estimada, calidad de los datos)
+        self.resolver = HedgedResolver([
+            ("spotdl", self._get_info_from_spotdl, 1.0, 1.0),
+            ("oembed", self._fallback_source(self._get_info_from_oembed), 0.5, 0.4),
+            ("embed", self._fallback_source(self._get_info_from_embed), 0.8, 0.5),
+            ("main_page", self._fallback_source(self._get_info_from_main_page), 1.2, 0.5),
+        ], is_complete=self._is_complete_track_info)
+
     def get_track_info(self, spotify_url: str):
-        """Obtiene información de una pista usando SpotDL únicamente"""
+        """Obtiene información de una pista: caché, y si no, spotdl con métodos alternativos en paralelo"""
         track_id = self._extract_spotify_id(spotify_url)
         if not track_id:
             return None
         
-        # USAR SOLO SPOTDL (simplificado)
-        track_info = self._get_info_from_spotdl(spotify_url)
-        if track_info and track_info.get('artista') != 'Artista Desconocido':
-            print("✅ Metadatos obtenidos via SpotDL")
+        # Caché de metadatos (memoria + disco): pistas resueltas hace poco o junto a su
+        # álbum/playlist no vuelven a consultarse; los fallos recientes tampoco
+        cache = get_metadata_cache()
+        found, cached = cache.get(track_id)
+        if found and cached is None:
+            raise RuntimeError(f"No se pudieron obtener metadatos de Spotify para: {spotify_url} "
+                               f"(fallo reciente en caché)")
+        if found:
+            logger.info("✅ Metadatos obtenidos de la caché")
+            with _METADATA_FILE_LOCK:
+                if track_id not in _SESSION_TRACK_IDS:
+                    self._save_metadata_to_temp_file(cached, is_batch=getattr(self, '_is_batch_download', False))
+            return cached
+        
+        resolution = self.resolver.resolve(spotify_url)
+        track_info = resolution.result
+        if track_info:
+            logger.info(f"✅ Metadatos obtenidos via {resolution.source}")
+            ttl = None if resolution.source == "spotdl" else FALLBACK_METADATA_TTL
+            cache.put(track_id, track_info, ttl=ttl)
+            self._save_metadata_to_temp_file(track_info, 
+                                           clear_previous=False, 
+                                           is_batch=getattr(self, '_is_batch_download', False))
             return track_info
-        else:
-            raise RuntimeError(f"No se pudieron obtener metadatos de Spotify para: {spotify_url}")
+        
+        throttled = [e for e in resolution.errors if is_throttle_error(e)]
+        if throttled:
+            # Bloqueo temporal de Spotify: no es un fallo de la pista (no cachear como negativo)
+            raise throttled[0]
+        if resolution.timed_out:
+            raise RuntimeError(f"Tiempo agotado obteniendo metadatos de Spotify para: {spotify_url}")
+        cache.put_negative(track_id)
+        raise RuntimeError(f"No se pudieron obtener metadatos de Spotify para: {spotify_url}")
+
+    def _fetch(self, url, **kwargs):
+        """GET a una página pública de Spotify respetando el limitador (sin reintentos: es un fallback)"""
+        def get():
+            response = self.session.get(url, **kwargs)
+            if response.status_code == 429:
+                response.raise_for_status()
+            return response
+        return get_rate_limiter().call(SPOTIFY_HOST, "web", get, retries=0)
 
     def _get_info_from_spotdl(self, spotify_url: str):
         """Método PRINCIPAL: Extraer información usando SpotDL"""
         try:
             # Resolver metadatos con API de SpotDL compatible con múltiples versiones
+            # Las consultas a Spotify pasan por el limitador compartido (reintenta tras un 429)
+            limiter = get_rate_limiter()
             if SPOTDL_API_MODE == "song_gatherer":
-                song = spotdl_from_spotify_url(spotify_url) # type: ignore
+                song = limiter.call(SPOTIFY_HOST, "metadata", spotdl_from_spotify_url, spotify_url) # type: ignore
                 if song is None:
-                    print("⚠️ SpotDL: No se encontraron resultados")
+                    logger.warning("⚠️ SpotDL: No se encontraron resultados")
                     return None
             else:
-                songs = self.spotdl.search([spotify_url]) # type: ignore
+                songs = limiter.call(SPOTIFY_HOST, "metadata", self.spotdl.search, [spotify_url]) # type: ignore
                 if not songs or len(songs) == 0:
-                    print("⚠️ SpotDL: No se encontraron resultados")
+                    logger.warning("⚠️ SpotDL: No se encontraron resultados")
                     return None
                 song = songs[0]
 
-            song_name = getattr(song, 'name', None) or getattr(song, 'song_name', None)
-            song_artists = getattr(song, 'artists', None) or getattr(song, 'contributing_artists', None) or []
-            song_cover_url = getattr(song, 'cover_url', None) or getattr(song, 'album_cover_url', None) or ''
-            song_album_name = getattr(song, 'album_name', None)
-            song_duration = getattr(song, 'duration', None)
-            song_genres = getattr(song, 'genres', None) or []
-            song_isrc = getattr(song, 'isrc', None) or ''
-            song_release_date = getattr(song, 'date', None) or getattr(song, 'album_release', None) or ''
-            lyrics = (getattr(song, 'lyrics', None) or '').strip()
-
-            if isinstance(song_artists, str):
-                artists_value = song_artists
-            else:
-                artists_value = ', '.join(song_artists) if song_artists else 'Artista Desconocido'
-            
-            # Extraer metadatos completos
-            track_info = {
-                'titulo': song_name or 'Título Desconocido',
-                'artista': artists_value,
-                'album': song_album_name or 'Álbum Desconocido',
-                'duracion_seg': int(song_duration or 180),
-                'genero': ', '.join(song_genres) if song_genres else 'Género Desconocido',
-                'plataforma_origen': 'Spotify',
-                'url_origen': spotify_url,
-                'ruta_local': '',  # Se llenará cuando se descargue
-                'caratula_url': song_cover_url,
-                'letra': lyrics.strip() if lyrics else 'Letra no disponible',
-                # Campos adicionales para compatibilidad
-                'name': song_name or 'Unknown Title',
-                'artist': artists_value if artists_value else 'Unknown Artist',
-                'image_url': song_cover_url,
-                'duration': int(song_duration or 180),
-                'track_id': self._extract_spotify_id(spotify_url),
-                'isrc': song_isrc,
-                'release_date': str(song_release_date) if song_release_date else '',
-                'genres': song_genres
-            }
-            
-            # Guardar metadatos en archivo temporal
-            self._save_metadata_to_temp_file(track_info, 
-                                           clear_previous=False, 
-                                           is_batch=getattr(self, '_is_batch_download', False))
+            track_info = self._song_to_track_info(song, spotify_url)
             
             # Validar que tenemos información útil
-            if (track_info['titulo'] != 'Título Desconocido' and 
-                track_info['artista'] != 'Artista Desconocido' and
-                len(track_info['artista']) > 1):
+            if self._is_complete_track_info(track_info):
                 return track_info
             else:
-                print("⚠️ SpotDL: Metadatos incompletos")
+                logger.warning("⚠️ SpotDL: Metadatos incompletos")
                 return None
                 
         except Exception as e:
-            print(f"⚠️ Error en SpotDL: {e}")
+            if is_throttle_error(e):
+                # Bloqueo temporal de Spotify: no es un fallo de la pista (no cachear como negativo)
+                raise
+            logger.warning(f"⚠️ Error en SpotDL: {e}")
             return None
             
+    def _song_to_track_info(self, song, spotify_url):
+        """Convierte un objeto Song de spotdl al diccionario de metadatos de la pista"""
+        song_name = getattr(song, 'name', None) or getattr(song, 'song_name', None)
+        song_artists = getattr(song, 'artists', None) or getattr(song, 'contributing_artists', None) or []
+        song_cover_url = getattr(song, 'cover_url', None) or getattr(song, 'album_cover_url', None) or ''
+        song_album_name = getattr(song, 'album_name', None)
+        song_duration = getattr(song, 'duration', None)
+        song_genres = getattr(song, 'genres', None) or []
+        song_isrc = getattr(song, 'isrc', None) or ''
+        song_release_date = getattr(song, 'date', None) or getattr(song, 'album_release', None) or ''
+        lyrics = (getattr(song, 'lyrics', None) or '').strip()
+
+        if isinstance(song_artists, str):
+            artists_value = song_artists
+        else:
+            artists_value = ', '.join(song_artists) if song_artists else 'Artista Desconocido'
+        
+        # Extraer metadatos completos
+        track_info = {
+            'titulo': song_name or 'Título Desconocido',
+            'artista': artists_value,
+            'album': song_album_name or 'Álbum Desconocido',
+            'duracion_seg': int(song_duration or 180),
+            'genero': ', '.join(song_genres) if song_genres else 'Género Desconocido',
+            'plataforma_origen': 'Spotify',
+            'url_origen': spotify_url,
+            'ruta_local': '',  # Se llenará cuando se descargue
+            'caratula_url': song_cover_url,
+            'letra': lyrics.strip() if lyrics else 'Letra no disponible',
+            # Campos adicionales para compatibilidad
+            'name': song_name or 'Unknown Title',
+            'artist': artists_value if artists_value else 'Unknown Artist',
+            'image_url': song_cover_url,
+            'duration': int(song_duration or 180),
+            'duration_known': bool(song_duration),
+            'track_id': self._extract_spotify_id(spotify_url),
+            'isrc': song_isrc,
+            'release_date': str(song_release_date) if song_release_date else '',
+            'genres': song_genres
+        }
+        return track_info
+
+    def _fallback_source(self, method):
+        """Adapta un método alternativo (recibe el ID) a fuente del resolvedor (recibe la URL)"""
+        def source(spotify_url):
+            info = method(self._extract_spotify_id(spotify_url))
+            return self._fallback_to_track_info(info, spotify_url) if info else None
+        return source
+
+    def _fallback_to_track_info(self, info, spotify_url):
+        """Convierte la respuesta corta de un método alternativo al formato completo de spotdl"""
+        artist = info.get('artist') or ''
+        album = info.get('album') or ''
+        song = SimpleNamespace(
+            name=info.get('name'),
+            artists=[] if artist in ('', 'Unknown Artist') else [artist],
+            album_name=None if album in ('', 'Unknown Album') else album,
+            # 180 es el valor de relleno de los métodos alternativos cuando no la conocen
+            duration=None if info.get('duration') == 180 else info.get('duration'),
+            cover_url=info.get('image_url') or '')
+        return self._song_to_track_info(song, spotify_url)
+
+    @staticmethod
+    def _is_complete_track_info(track_info):
+        """True si los metadatos tienen título y artista reales"""
+        return (track_info['titulo'] != 'Título Desconocido' and 
+                track_info['artista'] != 'Artista Desconocido' and
+                len(track_info['artista']) > 1)
+
+    @staticmethod
+    def _song_url(song):
+        """URL de pista de un Song de spotdl (según la versión: url, spotify_url o song_id)"""
+        url = getattr(song, 'url', None) or getattr(song, 'spotify_url', None)
+        if url:
+            return url
+        song_id = getattr(song, 'song_id', None)
+        return f"https://open.spotify.com/track/{song_id}" if song_id else None
+
+    def get_collection_info(self, collection_url: str):
+        """Resuelve todas las pistas de un álbum o playlist con una sola consulta a spotdl.
+
+        spotdl pagina internamente la API de Spotify, así que una playlist de cientos de pistas
+        cuesta unas pocas peticiones en lugar de una por pista. Los metadatos se guardan en el
+        archivo fijo de una sola vez y quedan precargados para la conversión de cada pista.
+        """
+        songs = get_rate_limiter().call(SPOTIFY_HOST, "metadata", self._search_collection, collection_url)
+        
+        tracks = []
+        for song in songs or []:
+            track_url = self._song_url(song)
+            if not track_url:
+                continue
+            track_info = self._song_to_track_info(song, track_url)
+            if self._is_complete_track_info(track_info):
+                tracks.append(track_info)
+        
+        if not tracks:
+            raise RuntimeError(f"No se encontraron pistas en: {collection_url}")
+        
+        get_metadata_cache().put_many({track_info['track_id']: track_info for track_info in tracks})
+        self._save_tracks_to_temp_file(tracks, is_batch=True)
+        logger.info(f"✅ {len(tracks)} pistas resueltas con una sola consulta a SpotDL")
+        return tracks
+
+    def _search_collection(self, collection_url):
+        """Consulta a spotdl que devuelve todas las canciones de un álbum o playlist"""
+        if SPOTDL_API_MODE == "song_gatherer":
+            from spotdl.search import song_gatherer # type: ignore
+            if "playlist" in collection_url:
+                return song_gatherer.from_playlist(collection_url)
+            return song_gatherer.from_album(collection_url)
+        return self.spotdl.search([collection_url]) # type: ignore
+
     def _save_metadata_to_temp_file(self, metadata, clear_previous=False, is_batch=False):
         """Guarda los metadatos en un archivo fijo para integración con base de datos"""
+        with _METADATA_FILE_LOCK:
+            return self._write_metadata_file(metadata, clear_previous, is_batch)
+
+    @staticmethod
+    def _build_track_data(metadata):
+        """Entrada de una pista tal como se guarda en el archivo fijo"""
+        return {
+            'titulo': metadata.get('titulo', ''),
+            'artista': metadata.get('artista', ''),
+            'album': metadata.get('album', ''),
+            'duracion_seg': metadata.get('duracion_seg', 0),
+            'genero': metadata.get('genero', ''),
+            'plataforma_origen': metadata.get('plataforma_origen', 'Spotify'),
+            'url_origen': metadata.get('url_origen', ''),
+            'ruta_local': metadata.get('ruta_local', ''),
+            'caratula_url': metadata.get('caratula_url', ''),
+            'letra': metadata.get('letra', ''),
+            'track_id': metadata.get('track_id', ''),
+            'isrc': metadata.get('isrc', ''),
+            'fecha_extraccion': datetime.datetime.now().isoformat(),
+            'release_date': metadata.get('release_date', ''),
+            'genres_list': metadata.get('genres', [])
+        }
+
+    def _save_tracks_to_temp_file(self, tracks, is_batch=True):
+        """Guarda muchas pistas en el archivo fijo con una sola lectura y escritura"""
+        with _METADATA_FILE_LOCK:
+            try:
+                filepath = self.get_metadata_file_path()
+                try:
+                    with open(filepath, 'r', encoding='utf-8') as f:
+                        metadata_to_save = json.load(f)
+                except Exception:
+                    metadata_to_save = {'tracks': [], 'track_actual': {}}
+                
+                # Sustituir entradas previas de las mismas pistas (reanudaciones, playlists solapadas)
+                new_tracks = [self._build_track_data(track) for track in tracks]
+                new_ids = {track['track_id'] for track in new_tracks}
+                metadata_to_save['tracks'] = [t for t in metadata_to_save.get('tracks', [])
+                                              if t.get('track_id') not in new_ids] + new_tracks
+                metadata_to_save['tipo_descarga'] = 'album' if is_batch else 'cancion_individual'
+                metadata_to_save['track_actual'] = new_tracks[-1] if new_tracks else {}
+                metadata_to_save['total_tracks'] = len(metadata_to_save['tracks'])
+                metadata_to_save['ultima_actualizacion'] = datetime.datetime.now().isoformat()
+                
+                with open(filepath, 'w', encoding='utf-8') as f:
+                    json.dump(metadata_to_save, f, ensure_ascii=False, indent=2)
+                _SESSION_TRACK_IDS.update(new_ids)
+                
+                logger.debug(f"💾 Metadatos de {len(new_tracks)} pistas guardados: {filepath}")
+                return filepath
+                
+            except Exception as e:
+                logger.warning(f"⚠️ Error guardando metadatos: {e}")
+                return None
+
+    def _write_metadata_file(self, metadata, clear_previous, is_batch):
+        """Lee, actualiza y reescribe el archivo fijo (llamar con _METADATA_FILE_LOCK tomado)"""
         try:
-            # Directorio fijo en la raíz del proyecto
-            project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-            metadata_dir = os.path.join(project_root, 'data', 'metadata')
-            os.makedirs(metadata_dir, exist_ok=True)
-            
             # Archivo fijo con nombre constante
-            filename = "spotify_metadata.json"
-            filepath = os.path.join(metadata_dir, filename)
+            filepath = self.get_metadata_file_path()
             
             # Preparar datos del track actual
-            track_data = {
-                'titulo': metadata.get('titulo', ''),
-                'artista': metadata.get('artista', ''),
-                'album': metadata.get('album', ''),
-                'duracion_seg': metadata.get('duracion_seg', 0),
-                'genero': metadata.get('genero', ''),
-                'plataforma_origen': metadata.get('plataforma_origen', 'Spotify'),
-                'url_origen': metadata.get('url_origen', ''),
-                'ruta_local': metadata.get('ruta_local', ''),
-                'caratula_url': metadata.get('caratula_url', ''),
-                'letra': metadata.get('letra', ''),
-                'track_id': metadata.get('track_id', ''),
-                'isrc': metadata.get('isrc', ''),
-                'fecha_extraccion': datetime.datetime.now().isoformat(),
-                'release_date': metadata.get('release_date', ''),
-                'genres_list': metadata.get('genres', [])
-            }
+            track_data = self._build_track_data(metadata)
             
             # Cargar datos existentes o crear nueva estructura
             if clear_previous or not os.path.exists(filepath):
@@ -202,7 +402,7 @@ class SpotifyInfoExtractor:
                     'tracks': [track_data],
                     'track_actual': track_data  # Para compatibilidad
                 }
-                print("🧹 Contenido anterior eliminado - Nueva sesión de descarga iniciada")
+                logger.debug("🧹 Contenido anterior eliminado - Nueva sesión de descarga iniciada")
             else:
                 # Cargar existente y agregar
                 try:
@@ -222,9 +422,12 @@ class SpotifyInfoExtractor:
                     metadata_to_save['tracks'] = []
                     metadata_to_save['tipo_descarga'] = 'album'
                     self._batch_session_started = True
-                    print("🧹 Iniciando descarga de álbum/playlist - Contenido limpiado")
+                    logger.debug("🧹 Iniciando descarga de álbum/playlist - Contenido limpiado")
                 
-                # Agregar nuevo track
+                # Agregar nuevo track (sustituyendo una entrada previa de la misma pista)
+                metadata_to_save['tracks'] = [t for t in metadata_to_save['tracks']
+                                              if not track_data['track_id'] or
+                                              t.get('track_id') != track_data['track_id']]
                 metadata_to_save['tracks'].append(track_data)
                 metadata_to_save['track_actual'] = track_data
                 metadata_to_save['ultima_actualizacion'] = datetime.datetime.now().isoformat()
@@ -233,20 +436,19 @@ class SpotifyInfoExtractor:
             # Guardar en archivo JSON
             with open(filepath, 'w', encoding='utf-8') as f:
                 json.dump(metadata_to_save, f, ensure_ascii=False, indent=2)
+            _SESSION_TRACK_IDS.add(track_data['track_id'])
             
             track_num = len(metadata_to_save['tracks'])
-            print(f"💾 Metadatos guardados ({track_num}/{metadata_to_save['total_tracks']}): {filepath}")
+            logger.debug(f"💾 Metadatos guardados ({track_num}/{metadata_to_save['total_tracks']}): {filepath}")
             return filepath
             
         except Exception as e:
-            print(f"⚠️ Error guardando metadatos: {e}")
+            logger.warning(f"⚠️ Error guardando metadatos: {e}")
             return None
     
     def get_metadata_file_path(self):
         """Retorna la ruta del archivo de metadatos fijo"""
-        project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-        metadata_dir = os.path.join(project_root, 'data', 'metadata')
-        return os.path.join(metadata_dir, 'spotify_metadata.json')
+        return os.path.join(get_data_dir('metadata'), 'spotify_metadata.json')
     
     def get_current_metadata(self):
         """Obtiene los metadatos actuales del archivo fijo"""
@@ -258,7 +460,7 @@ class SpotifyInfoExtractor:
                     return data.get('track_actual', {})
             return {}
         except Exception as e:
-            print(f"⚠️ Error leyendo metadatos: {e}")
+            logger.warning(f"⚠️ Error leyendo metadatos: {e}")
             return {}
     
     def get_all_tracks_metadata(self):
@@ -271,7 +473,7 @@ class SpotifyInfoExtractor:
                     return data.get('tracks', [])
             return []
         except Exception as e:
-            print(f"⚠️ Error leyendo tracks: {e}")
+            logger.warning(f"⚠️ Error leyendo tracks: {e}")
             return []
     
     def get_download_session_info(self):
@@ -289,7 +491,7 @@ class SpotifyInfoExtractor:
                     }
             return {}
         except Exception as e:
-            print(f"⚠️ Error leyendo info de sesión: {e}")
+            logger.warning(f"⚠️ Error leyendo info de sesión: {e}")
             return {}
 
     @staticmethod
@@ -310,78 +512,42 @@ class SpotifyInfoExtractor:
         """Método 1: Extraer información de la página principal de Spotify"""
         try:
             main_url = f"https://open.spotify.com/track/{track_id}"
-            response = self.session.get(main_url, timeout=15) # type: ignore
+            response = self._fetch(main_url, timeout=15, stream=True)
             
             if response.status_code == 200:
-                html = response.text
+                # Una sola pasada sobre como mucho MAX_HTML_BYTES: título, meta tags, álbum y portada
+                fields = scan_html(read_capped(response), MAIN_PAGE_FIELDS)
                 
                 # Método 1: Buscar en el título de la página
-                title_pattern = r'<title>([^<]+)</title>'
-                title_match = re.search(title_pattern, html, re.IGNORECASE)
-                
-                if title_match:
-                    page_title = title_match.group(1).strip()
+                if fields.get('title'):
                     # Formato típico: "Song - song by Artist | Spotify"
-                    page_title = re.sub(r'\s*\|\s*Spotify.*$', '', page_title)
-                    
-                    # Diferentes patrones de título
-                    patterns_to_try = [
-                        r'^(.+?)\s*-\s*song\s+(?:and\s+lyrics\s+)?by\s+(.+?)$',  # "Song - song and lyrics by Artist"
-                        r'^(.+?)\s*-\s*song\s+(?:and\s+lyrics\s+)?(?:by\s+)?(.+?)$',  # "Song - song and lyrics Artist"
-                        r'^(.+?)\s+by\s+(.+?)$',                                # "Song by Artist"
-                        r'^(.+?)\s*·\s*(.+?)$',                                 # "Song · Artist"
-                        r'^(.+?)\s*-\s*(.+?)$',                                 # "Song - Artist"
-                    ]
+                    page_title = _SPOTIFY_SUFFIX_PATTERN.sub('', fields['title'])
                     
-                    for pattern in patterns_to_try:
-                        match = re.search(pattern, page_title, re.IGNORECASE)
+                    for pattern in _PAGE_TITLE_PATTERNS:
+                        match = pattern.search(page_title)
                         if match:
-                            song = match.group(1).strip()
-                            artist = match.group(2).strip()
-                            
-                            # Limpiar el nombre de la canción
-                            song = re.sub(r'\s*-\s*(?:song|music|audio)(?:\s+and\s+lyrics)?.*$', '', song, flags=re.IGNORECASE)
-                            song = re.sub(r'\s*\(\s*(?:official|audio|music|video).*?\)\s*', '', song, flags=re.IGNORECASE)
-                            
-                            # Limpiar el artista
-                            artist = re.sub(r'\s*-\s*(?:song|music|audio)(?:\s+and\s+lyrics)?.*$', '', artist, flags=re.IGNORECASE)
+                            # Limpiar el nombre de la canción y el artista
+                            song = _SONG_SUFFIX_PATTERN.sub('', match.group(1).strip())
+                            song = _SONG_TAGS_PATTERN.sub('', song)
+                            artist = _SONG_SUFFIX_PATTERN.sub('', match.group(2).strip())
                             
                             # Validaciones básicas
                             if (len(song) > 0 and len(artist) > 1 and 
                                 not artist.isdigit() and 
                                 artist.lower() not in ['song', 'music', 'audio', 'lyrics']):
-                                
-                                # Buscar álbum en el HTML
-                                album = self._extract_album_from_html(html)
-                                
-                                # Buscar imagen
-                                image_url = self._extract_image_from_html(html)
-                                
                                 return {
                                     'name': song,
                                     'artist': artist,
-                                    'album': album,
-                                    'image_url': image_url,
+                                    'album': pick_album(fields),
+                                    'image_url': pick_image(fields),
                                     'duration': 180,
                                     'track_id': track_id
                                 }
                 
                 # Método 2: Buscar meta tags como fallback
-                meta_patterns = {
-                    'title': r'<meta\s+property="og:title"\s+content="([^"]+)"',
-                    'description': r'<meta\s+property="og:description"\s+content="([^"]+)"',
-                    'image': r'<meta\s+property="og:image"\s+content="([^"]+)"',
-                }
-                
-                extracted = {}
-                for key, pattern in meta_patterns.items():
-                    match = re.search(pattern, html, re.IGNORECASE)
-                    if match:
-                        extracted[key] = match.group(1)
-                
-                if extracted.get('title'):
-                    title = extracted['title']
-                    description = extracted.get('description', '')
+                title = fields.get('og:title')
+                if title:
+                    description = fields.get('og:description', '')
                     
                     # Intentar extraer información del meta título
                     if ' · ' in title:
@@ -390,85 +556,44 @@ class SpotifyInfoExtractor:
                             name = parts[0].strip()
                             potential_artist = parts[1].strip()
                             if not potential_artist.isdigit() and len(potential_artist) > 1:
-                                album = self._extract_album_from_html(html)
                                 return {
                                     'name': name,
                                     'artist': potential_artist,
-                                    'album': album,
-                                    'image_url': extracted.get('image', ''),
+                                    'album': pick_album(fields),
+                                    'image_url': fields.get('og:image', ''),
                                     'duration': 180,
                                     'track_id': track_id
                                 }
                     
                     # Buscar en descripción
                     if description:
-                        desc_patterns = [
-                            r'Listen to (.+?) (?:by|from) (.+?) on Spotify',
-                            r'Escucha (.+?) de (.+?) en Spotify',
-                            r'(.+?) · Song · (.+?) · \d+',
-                        ]
-                        
-                        for desc_pattern in desc_patterns:
-                            desc_match = re.search(desc_pattern, description)
-                            if desc_match and len(desc_match.groups()) >= 2:
+                        for desc_pattern in _DESCRIPTION_PATTERNS:
+                            desc_match = desc_pattern.search(description)
+                            if desc_match:
                                 song = desc_match.group(1).strip()
                                 artist = desc_match.group(2).strip()
                                 if not artist.isdigit() and len(artist) > 1:
-                                    album = self._extract_album_from_html(html)
                                     return {
                                         'name': song,
                                         'artist': artist,
-                                        'album': album,
-                                        'image_url': extracted.get('image', ''),
+                                        'album': pick_album(fields),
+                                        'image_url': fields.get('og:image', ''),
                                         'duration': 180,
                                         'track_id': track_id
                                     }
                 
         except Exception as e:
-            print(f"⚠️ Página principal falló: {e}")
+            if is_throttle_error(e):
+                # El 429 lo decide el resolvedor (no cachear la pista como fallida)
+                raise
+            logger.warning(f"⚠️ Página principal falló: {e}")
         return None
-    
-    @staticmethod
-    def _extract_album_from_html(html):
-        """Extrae información del álbum del HTML"""
-        album_patterns = [
-            r'"album"[^}]*?"name"\s*:\s*"([^"]+)"',
-            r'"albumName"\s*:\s*"([^"]+)"',
-            r'data-testid="album"[^>]*>([^<]+)<',
-            r'album.*?name.*?"([^"]+)"',
-            r'<meta\s+property="music:album"\s+content="([^"]+)"',
-            r'"collection_name"\s*:\s*"([^"]+)"',
-        ]
-        
-        for pattern in album_patterns:
-            match = re.search(pattern, html, re.IGNORECASE | re.DOTALL)
-            if match:
-                album = match.group(1).strip()
-                if (album and not album.isdigit() and len(album) > 1 and 
-                    album.lower() not in ['track', 'single', 'music:album:track']):
-                    return album
-        return 'Unknown Album'
-    
-    @staticmethod
-    def _extract_image_from_html(html):
-        """Extrae URL de imagen del HTML"""
-        image_patterns = [
-            r'<meta\s+property="og:image"\s+content="([^"]+)"',
-            r'"image"[^}]*?"url"\s*:\s*"([^"]+)"',
-            r'"cover"[^}]*?"url"\s*:\s*"([^"]+)"',
-        ]
-        
-        for pattern in image_patterns:
-            match = re.search(pattern, html, re.IGNORECASE)
-            if match:
-                return match.group(1)
-        return ''
 
     def _get_info_from_oembed(self, track_id: str):
         """Método 2: Usar endpoint OEmbed público de Spotify"""
         try:
             oembed_url = f"https://open.spotify.com/oembed?url=https://open.spotify.com/track/{track_id}"
-            response = self.session.get(oembed_url, timeout=10) # type: ignore
+            response = self._fetch(oembed_url, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -505,123 +630,59 @@ class SpotifyInfoExtractor:
                         'track_id': track_id
                     }
         except Exception as e:
-            print(f"⚠️ OEmbed falló: {e}")
+            if is_throttle_error(e):
+                raise
+            logger.warning(f"⚠️ OEmbed falló: {e}")
         return None
 
     def _get_info_from_embed(self, track_id: str):
         """Método 2: Extraer de página embed de Spotify"""
         try:
             embed_url = f"https://open.spotify.com/embed/track/{track_id}"
-            response = self.session.get(embed_url, timeout=10) # type: ignore
+            response = self._fetch(embed_url, timeout=10, stream=True)
             
             if response.status_code == 200:
-                html = response.text
-                
-                # Buscar JSON embebido
-                json_pattern = r'<script[^>]*type=["\']application/json["\'][^>]*>([^<]+)</script>'
-                matches = re.finditer(json_pattern, html, re.DOTALL)
-                
-                for match in matches:
-                    try:
-                        json_str = match.group(1)
-                        data = json.loads(json_str)
-                        track_info = self._extract_from_json_recursive(data)
-                        if track_info and track_info.get('name'):
-                            track_info['track_id'] = track_id
-                            return track_info
-                    except json.JSONDecodeError:
-                        continue
+                # Buscar JSON embebido (se para en la primera pista encontrada)
+                html = read_capped(response)
+                track_info = scan_html(html, EMBED_FIELDS).get('json_track')
+                if track_info and track_info.get('name'):
+                    track_info['track_id'] = track_id
+                    return track_info
                 
                 # Fallback: meta tags
-                return self._parse_meta_tags(html, track_id)
-        except Exception:
-            pass
-        return None
-
-    def _extract_from_json_recursive(self, data, depth=0):
-        """Busca información de track recursivamente en JSON"""
-        if depth > 8:
-            return None
-            
-        try:
-            if isinstance(data, dict):
-                if 'name' in data and ('artist' in data or 'artists' in data):
-                    result = {'name': data.get('name', '')}
-                    
-                    if 'artists' in data and isinstance(data['artists'], list):
-                        artists = [artist.get('name', '') if isinstance(artist, dict) else str(artist) 
-                                 for artist in data['artists']]
-                        result['artist'] = ', '.join(filter(None, artists))
-                    elif 'artist' in data:
-                        result['artist'] = data['artist'].get('name', '') if isinstance(data['artist'], dict) else str(data['artist'])
-                    
-                    if 'album' in data and isinstance(data['album'], dict):
-                        result['album'] = data['album'].get('name', 'Unknown Album')
-                        if 'images' in data['album'] and data['album']['images']:
-                            result['image_url'] = data['album']['images'][0].get('url', '')
-                    
-                    if 'duration_ms' in data:
-                        result['duration'] = int(data['duration_ms']) // 1000
-                    
-                    return result if result['name'] else None
-                
-                for key, value in data.items():
-                    if key in ['track', 'item', 'entity', 'data']:
-                        result = self._extract_from_json_recursive(value, depth + 1)
-                        if result:
-                            return result
-                            
-            elif isinstance(data, list) and data:
-                for item in data[:3]:
-                    result = self._extract_from_json_recursive(item, depth + 1)
-                    if result:
-                        return result
-        except Exception:
-            pass
+                return self._parse_meta_tags(scan_html(html, EMBED_META_FIELDS), track_id)
+        except Exception as e:
+            if is_throttle_error(e):
+                raise
         return None
 
     @staticmethod
-    def _parse_meta_tags(html_content: str, track_id: str):
-        """Parsea meta tags del HTML"""
-        try:
-            patterns = {
-                'title': r'<title>([^<]+)</title>',
-                'og_title': r'<meta property="og:title" content="([^"]*)"',
-                'og_image': r'<meta property="og:image" content="([^"]*)"'
-            }
-            
-            extracted = {}
-            for key, pattern in patterns.items():
-                match = re.search(pattern, html_content, re.IGNORECASE)
-                if match:
-                    extracted[key] = match.group(1).strip()
+    def _parse_meta_tags(fields, track_id: str):
+        """Construye los metadatos a partir del título / og:title ya extraídos del HTML"""
+        title = fields.get('og:title', '') or fields.get('title', '')
+        if title:
+            title = _SPOTIFY_SUFFIX_PATTERN.sub('', title)
             
-            title = extracted.get('og_title', '') or extracted.get('title', '')
-            if title:
-                title = re.sub(r'\s*\|\s*spotify.*$', '', title, flags=re.IGNORECASE)
-                
-                if ' by ' in title:
-                    parts = title.split(' by ', 1)
-                    return {
-                        'name': parts[0].strip(),
-                        'artist': parts[1].strip(),
-                        'album': 'Unknown Album',
-                        'image_url': extracted.get('og_image', ''),
-                        'duration': 180,
-                        'track_id': track_id
-                    }
-                elif ' - ' in title:
-                    parts = title.split(' - ', 1)
-                    return {
-                        'name': parts[1].strip(),
-                        'artist': parts[0].strip(),
-                        'album': 'Unknown Album',
-                        'image_url': extracted.get('og_image', ''),
-                        'duration': 180,
-                        'track_id': track_id
-                    }
-        except Exception:
-            pass
+            if ' by ' in title:
+                parts = title.split(' by ', 1)
+                return {
+                    'name': parts[0].strip(),
+                    'artist': parts[1].strip(),
+                    'album': 'Unknown Album',
+                    'image_url': fields.get('og:image', ''),
+                    'duration': 180,
+                    'track_id': track_id
+                }
+            elif ' - ' in title:
+                parts = title.split(' - ', 1)
+                return {
+                    'name': parts[1].strip(),
+                    'artist': parts[0].strip(),
+                    'album': 'Unknown Album',
+                    'image_url': fields.get('og:image', ''),
+                    'duration': 180,
+                    'track_id': track_id
+                }
         return None
 
     def _search_alternative_apis(self, track_id: str):
@@ -630,7 +691,7 @@ class SpotifyInfoExtractor:
             # iTunes Search API
             url = "https://itunes.apple.com/search"
             params = {'term': track_id, 'media': 'music', 'entity': 'song', 'limit': 1}
-            response = self.session.get(url, params=params, timeout=5) # type: ignore
+            response = self.session.get(url, params=params, timeout=5)
             
             if response.status_code == 200:
                 data = response.json()
@@ -704,27 +765,79 @@ class Spotify2MP3Converter(BaseModel):
     def get_track_info(self, spotify_url):
         """Obtiene información de una pista de Spotify usando métodos alternativos"""
         try:
-            print("🔍 Obteniendo información con métodos alternativos...")
+            logger.info("🔍 Obteniendo información con métodos alternativos...")
             track_info = self.info_extractor.get_track_info(spotify_url)
             
             if not track_info:
                 raise Exception("No se pudo obtener información con métodos alternativos")
             
-            # Convertir formato al formato esperado
-            return {
-                'name': track_info.get('name', 'Unknown'),
-                'artists': [track_info.get('artist', 'Unknown Artist')],
-                'album': track_info.get('album', 'Unknown Album'),
-                'duration_ms': track_info.get('duration', 0) * 1000,
-                'preview_url': None,
-                'images': [{'url': track_info.get('image_url', '')}] if track_info.get('image_url') else []
-            }
+            return self._to_converter_format(track_info)
                 
         except Exception as e:
             raise Exception(f"Error al obtener información de Spotify: {e}")
 
-    def search_on_youtube(self, track_name, artist_name):
-        """Busca la pista en YouTube usando yt-dlp con múltiples estrategias"""
+    @staticmethod
+    def _to_converter_format(track_info):
+        """Convierte los metadatos del extractor al formato que usa el conversor"""
+        return {
+            'name': track_info.get('name', 'Unknown'),
+            'artists': [track_info.get('artist', 'Unknown Artist')],
+            'album': track_info.get('album', 'Unknown Album'),
+            # Los métodos alternativos no siempre conocen la duración: 0 = desconocida
+            'duration_ms': track_info.get('duration', 0) * 1000 if track_info.get('duration_known', True) else 0,
+            'preview_url': None,
+            'images': [{'url': track_info.get('image_url', '')}] if track_info.get('image_url') else [],
+            'track_id': track_info.get('track_id', ''),
+            'isrc': track_info.get('isrc', '')
+        }
+
+    def is_collection_url(self, url):
+        """True si la URL es un álbum o una playlist"""
+        try:
+            return self.extract_spotify_id(url)[1] in ("album", "playlist")
+        except ValueError:
+            return False
+
+    def expand_collection(self, spotify_url):
+        """Devuelve las URLs de las pistas de un álbum/playlist (una pista devuelve [url]).
+
+        Todas las pistas se resuelven con una sola consulta y quedan precargadas, de modo
+        que convertir cada una ya no necesita su propia petición de metadatos.
+        """
+        if not self.is_collection_url(spotify_url):
+            return [spotify_url]
+        
+        _, content_type = self.extract_spotify_id(spotify_url)
+        logger.info(f"📀 Resolviendo {content_type} completo...")
+        tracks = self.info_extractor.get_collection_info(spotify_url)
+        return [track['url_origen'] for track in tracks]
+
+    def convert_collection(self, spotify_url):
+        """Convierte todas las pistas de un álbum o playlist; devuelve las rutas generadas"""
+        return run_blocking(self.aconvert_collection(spotify_url))
+
+    async def aconvert_collection(self, spotify_url, concurrency=None):
+        """Versión asíncrona de convert_collection: las pistas se convierten a la vez"""
+        track_urls = await run_network(self.expand_collection, spotify_url)
+        results = await self.aconvert_many(track_urls, concurrency)
+        paths = []
+        for track_url, result in zip(track_urls, results):
+            if isinstance(result, BaseException):
+                logger.error(f"❌ {track_url}: {result}")
+            else:
+                paths.append(result)
+        
+        if not paths:
+            raise Exception("No se pudo convertir ninguna pista")
+        logger.info(f"✅ {len(paths)}/{len(track_urls)} pistas convertidas")
+        return paths
+
+    def search_on_youtube(self, track_name, artist_name, duration=None, isrc=None, track_id=None):
+        """Busca la pista en YouTube usando yt-dlp con múltiples estrategias.
+
+        La duración (s) y el ISRC de Spotify, si se conocen, ayudan a elegir la versión correcta.
+        """
+        track_id = track_id or self.current_track_id
 
         # Si tenemos información específica, usarla
         if track_name and not track_name.startswith("Track ") and artist_name and artist_name != "Unknown Artist":
@@ -734,9 +847,8 @@ class Spotify2MP3Converter(BaseModel):
                 f'"{track_name}" "{artist_name}"'
             ]
         # Si solo tenemos información básica/limitada, usar ID de Spotify
-        elif hasattr(self, 'current_track_id'):
+        elif track_id:
             # Usar el ID de Spotify para búsquedas más específicas
-            track_id = self.current_track_id
             search_queries = [
                 f"spotify {track_id}",
                 f"{track_name} music",
@@ -750,132 +862,181 @@ class Spotify2MP3Converter(BaseModel):
             'quiet': True,
             'no_warnings': True,
             'default_search': 'ytsearch5:',  # Buscar 5 resultados para mejor selección
+            # Solo la lista de resultados (título, canal, duración): los formatos se
+            # resuelven después únicamente para el vídeo elegido
+            'extract_flat': 'in_playlist',
+            **ydl_cache_options(),
         }
         
-        # Probar múltiples consultas de búsqueda
-        for search_query in search_queries:
-            try:
-                print(f"🔍 Buscando: {search_query}")
-                
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl: # type: ignore
-                    info = ydl.extract_info(search_query, download=False)
+        limiter = get_rate_limiter()
+        best_video, best_score = None, None
+        
+        # YoutubeDL caliente del hilo (extractores y conexiones ya preparados)
+        with get_ytdl_pool().lease("search", ydl_opts) as ydl:
+            # Probar múltiples consultas de búsqueda: se para en cuanto un resultado es
+            # claramente bueno; si ninguno lo es, se queda el mejor de todas las consultas
+            for search_query in search_queries:
+                try:
+                    logger.info(f"🔍 Buscando: {search_query}")
+                    
+                    info = limiter.call(YOUTUBE_HOST, "search", ydl.extract_info, search_query, download=False)
                     if info and 'entries' in info and info['entries']:
                         # Filtrar resultados para encontrar el mejor match
-                        best_video = self._select_best_youtube_result(
-                            info['entries'], track_name, artist_name
+                        video, score = self._select_best_youtube_result(
+                            info['entries'], track_name, artist_name, duration, isrc
                         )
                         
-                        if best_video:
-                            return {
-                                'url': best_video['webpage_url'],
-                                'title': best_video['title'],
-                                'duration': best_video.get('duration', 0),
-                                'uploader': best_video.get('uploader', '')
-                            }
+                        if video and (best_score is None or score > best_score):
+                            best_video, best_score = video, score
+                        if best_score is not None and best_score >= ACCEPT_SCORE:
+                            break
                             
-            except Exception as e:
-                print(f"⚠️ Error en búsqueda '{search_query}': {e}")
-                continue
+                except Exception as e:
+                    if is_throttle_error(e):
+                        # Seguir con otra consulta solo provocaría más bloqueos
+                        raise Exception(f"YouTube sigue limitando las búsquedas: {e}")
+                    logger.warning(f"⚠️ Error en búsqueda '{search_query}': {e}")
+                    continue
+            
+            if best_video:
+                video_url = best_video.get('webpage_url') or best_video['url']
+                resolved = self._resolve_youtube_video(ydl, video_url)
         
-        raise Exception("No se encontraron resultados en YouTube")
+        if not best_video:
+            raise Exception("No se encontraron resultados en YouTube")
+        return {
+            'url': video_url,
+            'title': best_video['title'],
+            'duration': best_video.get('duration') or (resolved or {}).get('duration', 0),
+            'uploader': best_video.get('uploader') or best_video.get('channel', '')
+        }
 
     @staticmethod
-    def _select_best_youtube_result(entries, track_name, artist_name):
-        """Selecciona el mejor resultado de YouTube basado en criterios"""
-        if not entries:
+    def _resolve_youtube_video(ydl, video_url):
+        """Extrae la información completa (formatos) del vídeo elegido y la deja para la descarga.
+
+        Si falla no es grave: la descarga volverá a extraerla por su cuenta.
+        """
+        try:
+            info = get_rate_limiter().call(YOUTUBE_HOST, "search", ydl.extract_info, video_url,
+                                           download=False, process=False)
+        except Exception as e:
+            if is_throttle_error(e):
+                raise Exception(f"YouTube sigue limitando las búsquedas: {e}")
+            logger.warning(f"⚠️ No se pudo resolver el vídeo elegido ({e}); se extraerá al descargar")
             return None
-        
-        # Si solo hay un resultado, devolverlo
-        if len(entries) == 1:
-            return entries[0]
-        
-        # Criterios de puntuación para seleccionar mejor resultado
-        scored_entries = []
-        
-        for entry in entries:
-            if not entry:
-                continue
-                
-            title = entry.get('title', '').lower()
-            uploader = entry.get('uploader', '').lower()
-            duration = entry.get('duration', 0)
-            
-            score = 0
-            
-            # Penalizar videos muy cortos o muy largos
-            if duration:
-                if 30 <= duration <= 600:  # Entre 30 segundos y 10 minutos
-                    score += 10
-                elif duration > 600:
-                    score -= 5
-            
-            # Bonificar si contiene las palabras de búsqueda
-            if track_name and track_name.lower() in title:
-                score += 15
-            if artist_name and artist_name.lower() in title:
-                score += 15
-                
-            # Bonificar si es de canal musical oficial
-            music_keywords = ['official', 'music', 'records', 'entertainment']
-            for keyword in music_keywords:
-                if keyword in uploader:
-                    score += 5
-                    break
-            
-            # Penalizar covers, remixes, etc.
-            avoid_keywords = ['cover', 'remix', 'live', 'concert', 'karaoke', 'instrumental']
-            for keyword in avoid_keywords:
-                if keyword in title:
-                    score -= 3
-            
-            scored_entries.append((score, entry))
-        
-        # Ordenar por puntuación y devolver el mejor
-        scored_entries.sort(key=lambda x: x[0], reverse=True)
-        
-        if scored_entries:
-            best_entry = scored_entries[0][1]
-            print(f"✅ Mejor resultado: {best_entry.get('title', 'Sin título')}")
-            return best_entry
-        
-        return entries[0]  # Fallback al primer resultado
+        if info:
+            get_resolved_info_cache().put(video_url, info)
+        return info
 
     @staticmethod
-    def download_from_youtube(youtube_url, output_path):
-        """Descarga audio desde YouTube usando yt-dlp"""
-        import yt_dlp as yt_dlp_module
+    def _select_best_youtube_result(entries, track_name, artist_name, duration=None, isrc=None):
+        """Selecciona el mejor resultado de YouTube: (entrada, puntuación) o (None, None)"""
+        best_entry, score = select_best(
+            {'name': track_name, 'artist': artist_name, 'duration': duration, 'isrc': isrc}, entries)
+        if best_entry:
+            logger.info(f"✅ Mejor resultado: {best_entry.get('title', 'Sin título')} (puntuación {score:.2f})")
+        return best_entry, score
+
+    @staticmethod
+    def download_from_youtube(youtube_url, output_path, profile=None, attempts=3):
+        """Descarga audio desde YouTube usando yt-dlp (reanudable: los .part quedan en data/temp).
+
+        La extracción de audio codifica según el perfil de salida (MP3 192k por defecto).
+        """
         from typing import Any, Dict
 
+        profile = profile or get_profile()
+        extract_audio = {'key': 'FFmpegExtractAudio', 'preferredcodec': profile.ytdl_codec}
+        if profile.ytdl_quality:
+            extract_audio['preferredquality'] = profile.ytdl_quality
+        # Con opus/aac/passthrough yt-dlp copia el audio si la fuente ya está en ese códec:
+        # sin decodificación no hay pasada en la que medir la sonoridad
+        may_copy = profile.ytdl_codec not in ("mp3", "flac")
+
+        video_id = re.search(r'(?:v=|youtu\.be/)([\w-]+)', youtube_url)
+        job_key = f"youtube_{video_id.group(1) if video_id else youtube_url}"
+
         # Configuración para yt-dlp
         ydl_opts: Dict[str, Any] = {
             'format': 'bestaudio/best',
-            'outtmpl': os.path.join(output_path, '%(title)s.%(ext)s'),
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }],
+            # El progreso llega por el bus de eventos, no por la barra de yt-dlp en stdout
+            'quiet': True,
+            'noprogress': True,
+            'outtmpl': '%(title)s.%(ext)s',
+            'continuedl': True,
+            'nopart': False,
+            'retries': 10,
+            'fragment_retries': 10,
+            # Formatos fragmentados (DASH/HLS): varios fragmentos en paralelo; en los de un solo
+            # archivo, peticiones por trozos que esquivan el límite de velocidad por conexión
+            'concurrent_fragment_downloads': connections_per_file(),
+            'http_chunk_size': RANGE_REQUEST_SIZE,
+            'postprocessors': [extract_audio],
+            # Bytes descargados y extracción de audio -> bus de eventos de progreso
+            'progress_hooks': [ytdl_progress_hook],
+            'postprocessor_hooks': [ytdl_postprocessor_hook],
+            **ydl_cache_options(),
         }
         
-        try:
-            with yt_dlp_module.YoutubeDL(ydl_opts) as ydl: # type: ignore
-                ydl.download([youtube_url])
+        # Información ya extraída durante la búsqueda: se descarga sin volver a pedir la
+        # página del vídeo (solo en el primer intento; un reintento extrae de nuevo)
+        resolved = get_resolved_info_cache().take(youtube_url)
+        # Los fragmentos parciales viven en el área temporal del trabajo y se continúan
+        # con peticiones por rango si la descarga se corta (solo cambia por descarga, así
+        # que no obliga a crear otro YoutubeDL del pool)
+        paths = {'home': output_path, 'temp': job_temp_dir(job_key)}
+        # El FFmpeg de la extracción a MP3 mide también la sonoridad (ReplayGain) al codificar
+        overrides = {'paths': paths}
+        stats_path = os.path.join(job_temp_dir(job_key), "loudness.txt")
+        if LOUDNESS_ENABLED and not may_copy:
+            overrides['postprocessor_args'] = {'extractaudio': ["-af", analysis_filter(stats_path)]}
+        
+        last_error = None
+        for attempt in range(1, attempts + 1):
+            try:
+                with get_ytdl_pool().lease("download", ydl_opts, **overrides) as ydl, \
+                        get_rate_limiter().limit(YOUTUBE_HOST, "download"):
+                    if resolved is not None:
+                        pending, resolved = resolved, None
+                        info = ydl.process_ie_result(pending, download=True)
+                    else:
+                        info = ydl.extract_info(youtube_url, download=True)
+                    
+                    # Localizar el archivo generado por esta descarga (no cualquier MP3 de la carpeta)
+                    downloads = (info or {}).get('requested_downloads') or []
+                    if downloads and downloads[-1].get('filepath'):
+                        mp3_file = downloads[-1]['filepath']
+                    else:
+                        extension = profile.extension or f".{(info or {}).get('ext', 'mp3')}"
+                        mp3_file = os.path.splitext(ydl.prepare_filename(info))[0] + extension
+                    
+                if not os.path.exists(mp3_file):
+                    raise Exception("No se encontró el archivo de audio descargado")
                 
-                # Encontrar el archivo descargado
-                for file in os.listdir(output_path):
-                    if file.endswith('.mp3'):
-                        return os.path.join(output_path, file)
-                        
-                raise Exception("No se encontró el archivo MP3 descargado")
+                validate_audio_file(mp3_file, expected_duration=(info or {}).get('duration'))
+                if LOUDNESS_ENABLED and may_copy:
+                    tag_file(mp3_file, force=True)
+                elif LOUDNESS_ENABLED:
+                    apply_stats(mp3_file, stats_path)
+                remove_job_temp_dir(job_key)
+                return mp3_file
                 
-        except Exception as e:
-            raise Exception(f"Error al descargar desde YouTube: {e}")
+            except Exception as e:
+                last_error = e
+                if attempt < attempts:
+                    logger.warning(f"⚠️ Descarga incompleta ({e}) - reanudando (intento {attempt + 1}/{attempts})")
+                    # Si fue un bloqueo, el limitador ya impone la espera en el siguiente intento
+                    if not is_throttle_error(e):
+                        time.sleep(2 ** attempt)
+        
+        raise Exception(f"Error al descargar desde YouTube: {last_error}")
 
     @staticmethod
     def download_album_art(image_url, save_path):
         """Descarga la portada del álbum"""
         try:
-            response = requests.get(image_url, stream=True, timeout=10)
+            response = get_session().get(image_url, stream=True, timeout=10)
             response.raise_for_status()
             
             with open(save_path, 'wb') as f:
@@ -886,21 +1047,27 @@ class Spotify2MP3Converter(BaseModel):
             return save_path
             
         except Exception as e:
-            print(f"⚠️ No se pudo descargar la portada: {e}")
+            logger.warning(f"⚠️ No se pudo descargar la portada: {e}")
             return None
 
     def add_metadata_to_mp3(self, file_path, track_info, album_art_path=None):
         """Añade metadatos al archivo MP3 usando mutagen"""
         try:
-            print("🏷️ Añadiendo metadatos con mutagen...")
-            
-            audio = MP3(file_path, ID3=ID3) # type: ignore
+            logger.info("🏷️ Añadiendo metadatos con mutagen...")
             
             # Añadir tags básicos usando la nueva estructura de metadatos
             titulo = track_info.get('titulo', track_info.get('name', ''))
             artista = track_info.get('artista', ', '.join(track_info.get('artists', [])))
             album = track_info.get('album', track_info.get('album', {}).get('name', '') if isinstance(track_info.get('album'), dict) else track_info.get('album', ''))
             
+            # Otros formatos de salida (Opus, M4A, FLAC): etiquetas propias de cada formato
+            if not file_path.lower().endswith(".mp3"):
+                write_tags(file_path, title=titulo, artist=artista, album=album, cover_path=album_art_path)
+                logger.info("✅ Metadatos guardados")
+                return
+            
+            audio = MP3(file_path, ID3=ID3) # type: ignore
+            
             audio.tags.add(TIT2(encoding=3, text=titulo)) # type: ignore
             audio.tags.add(TPE1(encoding=3, text=artista)) # type: ignore
             audio.tags.add(TALB(encoding=3, text=album)) # type: ignore
@@ -915,90 +1082,163 @@ class Spotify2MP3Converter(BaseModel):
                         desc='Cover',
                         data=img.read()
                     ))
-                print("🖼️ Portada agregada")
+                logger.info("🖼️ Portada agregada")
             
             audio.save()
-            print("✅ Metadatos guardados")
+            logger.info("✅ Metadatos guardados")
                 
         except Exception as e:
-            print(f"⚠️ Error al añadir metadatos: {e}")
+            logger.warning(f"⚠️ Error al añadir metadatos: {e}")
+
+    def get_task_key(self, url):
+        """Clave estable por pista de Spotify (ignora ?si=... y variantes intl-xx)"""
+        try:
+            spotify_id, content_type = self.extract_spotify_id(url)
+            return f"spotify:{content_type}:{spotify_id}" + self.profile_key_suffix()
+        except ValueError:
+            return super().get_task_key(url)
+
+    async def aconvert(self, spotify_url): # type: ignore
+        """Convierte una URL de Spotify a MP3 (álbumes y playlists devuelven la lista de rutas).
 
-    def convert(self, spotify_url): # type: ignore
-        """Convierte una URL de Spotify a MP3"""
-        # Crear carpeta de descargas si no existe
-        downloads_dir = os.path.join(os.path.dirname(__file__), "..", "..", "data", "music")
-        os.makedirs(downloads_dir, exist_ok=True)
+        Metadatos, búsqueda, descarga y portada esperan en el ejecutor de red; la huella
+        acústica, las etiquetas (mutagen) y el renombrado, en el de CPU. La extracción a MP3
+        la hace el postprocesador FFmpeg de yt-dlp dentro de la propia descarga.
+
+        Descarga, huella y etiquetas trabajan en el área de preparación de la tarea; la
+        pista entra en data/music ya terminada, en un único paso (library_commit).
+        """
+        if self.is_collection_url(spotify_url):
+            return await self.aconvert_collection(spotify_url)
+        
+        task_key = self.get_task_key(spotify_url)
         
         try:
-            # Extraer track_id para búsquedas mejoradas
+            # Extraer track_id para búsquedas mejoradas (se pasa a la búsqueda: varias
+            # conversiones pueden estar en vuelo a la vez sobre este conversor)
             try:
                 track_id, _ = self.extract_spotify_id(spotify_url)
-                self.current_track_id = track_id  # Guardar para búsquedas de YouTube
-            except:
-                pass
+            except ValueError:
+                track_id = None
+            
+            # 0. Si una ejecución anterior ya terminó esta pista, no repetir trabajo
+            final_path = self.get_completed_stage(task_key, "finalize", validate=os.path.exists)
+            if final_path:
+                logger.info(f"⏭️ Pista ya convertida anteriormente: {final_path}")
+                return final_path
             
             # 1. Obtener información de la pista de Spotify
-            print("🔍 Obteniendo información de Spotify...")
-            track_info = self.get_track_info(spotify_url)
+            logger.info("🔍 Obteniendo información de Spotify...")
+            track_info = await self.arun_stage(task_key, "metadata", run_network, self.get_track_info,
+                                               spotify_url)
             
             # 2. Buscar la pista en YouTube
-            print("🔍 Buscando en YouTube...")
-            youtube_info = self.search_on_youtube(
+            logger.info("🔍 Buscando en YouTube...")
+            youtube_info = await self.arun_stage(
+                task_key, "search", run_network, self.search_on_youtube,
                 track_info['name'], 
-                track_info['artists'][0]
+                track_info['artists'][0],
+                track_info['duration_ms'] // 1000 or None,
+                track_info.get('isrc'),
+                track_id
             )
             
-            print(f"✅ Encontrado en YouTube: {youtube_info['title']}")
+            logger.info(f"✅ Encontrado en YouTube: {youtube_info['title']}")
+            
+            # El mismo vídeo ya convertido (con otro nombre u otra URL) no se vuelve a descargar
+            video_id = youtube_video_id(youtube_info['url'])
+            existing_path = self.find_converted_source(self.source_key(video_id))
+            if existing_path:
+                logger.info(f"♻️ Vídeo ya convertido en la biblioteca: {existing_path}")
+                return existing_path
             
-            # 3. Descargar desde YouTube
-            print("⬇️ Descargando desde YouTube...")
-            mp3_path = self.download_from_youtube(
+            # 3. Descargar desde YouTube (al área de preparación, no a la biblioteca)
+            logger.info("⬇️ Descargando desde YouTube...")
+            mp3_path = await self.arun_stage(
+                task_key, "download", run_network, self.download_from_youtube,
                 youtube_info['url'], 
-                downloads_dir
+                staging_dir(task_key),
+                self.profile,
+                validate=os.path.exists
             )
+            fingerprint = await self.arun_stage(task_key, "fingerprint", run_cpu, self.fingerprint_audio,
+                                                mp3_path)
             
-            # 4. Descargar portada del álbum
+            # 4-6. Portada, metadatos y ruta local (la portada solo si la etapa está pendiente)
             album_art_path = None
-            if track_info['images']:
-                print("🖼️ Descargando portada del álbum...")
-                album_art_url = track_info['images'][0]['url']
-                album_art_path = os.path.join(downloads_dir, "temp_cover.jpg")
-                album_art_path = self.download_album_art(album_art_url, album_art_path)
-            
-            # 5. Añadir metadatos de Spotify
-            print("🏷️ Añadiendo metadatos...")
-            self.add_metadata_simple(mp3_path, track_info, album_art_path) # type: ignore
+            if not self.get_completed_stage(task_key, "tag", validate=os.path.exists):
+                album_art_path = await run_network(self._download_cover, track_info)
+            mp3_path = await self.arun_stage(task_key, "tag", run_cpu, self._tag_track, track_info, mp3_path,
+                                             album_art_path, validate=os.path.exists)
             
-            # 6. Actualizar metadatos temporales con la ruta local
-            print("📝 Actualizando metadatos temporales...")
-            self._update_metadata_with_local_path(track_info, mp3_path)
+            # 7. Confirmar en la biblioteca con el nombre de la plantilla (sin pisar otras pistas)
+            mp3_path = await self.arun_stage(task_key, "finalize", run_cpu, self._finalize_track, track_info,
+                                             mp3_path, task_key, video_id, validate=os.path.exists)
+            await run_cpu(self.index_fingerprint, mp3_path, fingerprint, self.source_key(video_id))
             
-            # 7. Limpiar archivo temporal de portada
-            if album_art_path and os.path.exists(album_art_path):
-                os.remove(album_art_path)
-            
-            # 7. Renombrar archivo con formato estándar
-            safe_title = self._sanitize_filename(track_info['name'])
-            safe_artist = self._sanitize_filename(track_info['artists'][0])
-            new_filename = f"{safe_artist} - {safe_title}.mp3"
-            new_path = os.path.join(downloads_dir, new_filename)
-            
-            if mp3_path != new_path:
-                os.rename(mp3_path, new_path)
-                mp3_path = new_path
-            
-            print(f"✅ Conversión completada: {mp3_path}")
+            logger.info(f"✅ Conversión completada: {mp3_path}")
             return mp3_path
             
         except Exception as e:
             raise Exception(f"Error en la conversión: {e}")
+        finally:
+            self.release_scratch(task_key)
+
+    def _download_cover(self, track_info):
+        """Descarga la portada del álbum a data/temp (None si no hay o falla)"""
+        if not track_info['images']:
+            return None
+        logger.info("🖼️ Descargando portada del álbum...")
+        album_art_url = track_info['images'][0]['url']
+        # Nombre único por pista: varias conversiones pueden correr en paralelo
+        cover_name = f"cover_{track_info.get('track_id') or id(track_info)}.jpg"
+        album_art_path = os.path.join(get_data_dir("temp"), cover_name)
+        return self.download_album_art(album_art_url, album_art_path)
+
+    def _tag_track(self, track_info, mp3_path, album_art_path=None):
+        """Añade los metadatos de Spotify (y la portada ya descargada) al archivo preparado"""
+        # 5. Añadir metadatos de Spotify
+        logger.info("🏷️ Añadiendo metadatos...")
+        self.add_metadata_to_mp3(mp3_path, track_info, album_art_path)
+        
+        # Limpiar archivo temporal de portada
+        if album_art_path and os.path.exists(album_art_path):
+            os.remove(album_art_path)
+        
+        return mp3_path
+
+    def _finalize_track(self, track_info, mp3_path, task_key=None, video_id=None):
+        """Mueve el archivo etiquetado a la biblioteca con el nombre de EKHO_NAME_TEMPLATE"""
+        album = track_info.get('album')
+        relative_name = render_name(
+            NAME_TEMPLATE,
+            artist=track_info['artists'][0],
+            title=track_info['name'],
+            album=album.get('name') if isinstance(album, dict) else album,
+            origin="spotify",
+            id=video_id,
+        )
+        extension = os.path.splitext(mp3_path)[1] or ".mp3"
+        new_path = get_path_index().commit(mp3_path, relative_name, extension, self.source_key(video_id))
+        if task_key:
+            remove_staging_dir(task_key)
+        
+        # 6. Actualizar metadatos temporales con la ruta local (la definitiva)
+        logger.debug("📝 Actualizando metadatos temporales...")
+        self._update_metadata_with_local_path(track_info, new_path)
+        return new_path
 
     def _update_metadata_with_local_path(self, track_info, local_path):
         """Actualiza los metadatos con la ruta local del archivo descargado"""
+        with _METADATA_FILE_LOCK:
+            self._write_local_path(track_info, local_path)
+
+    def _write_local_path(self, track_info, local_path):
+        """Escribe la ruta local en el archivo fijo (llamar con _METADATA_FILE_LOCK tomado)"""
         try:
             filepath = self.info_extractor.get_metadata_file_path()
             if not os.path.exists(filepath):
-                print("⚠️ Archivo de metadatos no encontrado")
+                logger.warning("⚠️ Archivo de metadatos no encontrado")
                 return
             
             # Leer archivo existente
@@ -1026,19 +1266,28 @@ class Spotify2MP3Converter(BaseModel):
             with open(filepath, 'w', encoding='utf-8') as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
             
-            print(f"✅ Metadatos actualizados con ruta local: {local_path}")
+            logger.info(f"✅ Metadatos actualizados con ruta local: {local_path}")
                         
         except Exception as e:
-            print(f"⚠️ Error en actualización de metadatos: {e}")
+            logger.warning(f"⚠️ Error en actualización de metadatos: {e}")
     
-    def start_download_session(self, is_batch=False):
-        """Inicia una nueva sesión de descarga, limpiando contenido anterior"""
+    def start_download_session(self, is_batch=False, resume=False):
+        """Inicia una nueva sesión de descarga, limpiando contenido anterior.
+
+        Con resume=True (lote reanudable) se conserva lo ya registrado en el archivo fijo:
+        las pistas completadas en la ejecución interrumpida no vuelven a procesarse.
+        """
+        filepath = self.info_extractor.get_metadata_file_path()
+        if resume and os.path.exists(filepath):
+            logger.info(f"♻️ Reanudando sesión de descarga: {filepath}")
+            return
+        
         try:
             if is_batch:
                 self._batch_session_started = False  # Reset para permitir limpieza
-                print("🎵 Iniciando descarga de álbum/playlist...")
+                logger.info("🎵 Iniciando descarga de álbum/playlist...")
             else:
-                print("🎵 Iniciando descarga de canción individual...")
+                logger.info("🎵 Iniciando descarga de canción individual...")
                 
             # Crear archivo vacío o limpiar existente
             filepath = self.info_extractor.get_metadata_file_path()
@@ -1050,17 +1299,14 @@ class Spotify2MP3Converter(BaseModel):
                 'track_actual': {}
             }
             
-            project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-            metadata_dir = os.path.join(project_root, 'data', 'metadata')
-            os.makedirs(metadata_dir, exist_ok=True)
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
+            with _METADATA_FILE_LOCK, open(filepath, 'w', encoding='utf-8') as f:
                 json.dump(empty_structure, f, ensure_ascii=False, indent=2)
+                _SESSION_TRACK_IDS.clear()
                 
-            print(f"✅ Sesión iniciada - Archivo limpiado: {filepath}")
+            logger.info(f"✅ Sesión iniciada - Archivo limpiado: {filepath}")
             
         except Exception as e:
-            print(f"⚠️ Error iniciando sesión: {e}")
+            logger.warning(f"⚠️ Error iniciando sesión: {e}")
     
     def finish_download_session(self):
         """Finaliza la sesión de descarga"""
@@ -1069,19 +1315,8 @@ class Spotify2MP3Converter(BaseModel):
                 delattr(self, '_batch_session_started')
             
             session_info = self.info_extractor.get_download_session_info()
-            print(f"🎉 Sesión completada: {session_info.get('tracks_count', 0)} tracks procesados")
-            print(f"📁 Tipo: {session_info.get('tipo', 'individual')}")
+            logger.info(f"🎉 Sesión completada: {session_info.get('tracks_count', 0)} tracks procesados")
+            logger.debug(f"📁 Tipo: {session_info.get('tipo', 'individual')}")
             
         except Exception as e:
-            print(f"⚠️ Error finalizando sesión: {e}")
-
-    @staticmethod
-    def _sanitize_filename(filename):
-        """Limpia el nombre de archivo de caracteres no válidos"""
-        # Remover caracteres no válidos para nombres de archivo
-        invalid_chars = '<>:"/\\|?*'
-        for char in invalid_chars:
-            filename = filename.replace(char, '')
-        
-        # Limitar longitud
-        return filename[:50] if len(filename) > 50 else filename
\ No newline at end of file
+            logger.warning(f"⚠️ Error finalizando sesión: {e}")
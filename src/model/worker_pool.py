@@ -0,0 +1,207 @@
+# worker_pool.py
+"""
+Pool de workers de larga duración que consumen la cola persistente de trabajos
+
+Cada worker es un hilo que vive mientras el daemon está activo y conserva sus conversores
+(estado de spotdl, sesión HTTP compartida) entre trabajos, de modo que el coste de
+arranque se paga una sola vez y no por cada URL.
+
+Con lease_seconds el pool trabaja en modo distribuido: reclama los trabajos con lease y un
+hilo de heartbeat lo renueva cada tercio del plazo, guardando la etapa y los bytes de cada
+conversión en curso para que el coordinador vea el progreso de todos los workers.
+"""
+
+import os
+import json
+import socket
+import threading
+import contextvars
+
+from model.batch_model import BatchConverter, STATUS_OK
+from model.conversor_model import ConversionCancelled, stage_guard
+from model.job_store import JobStore
+from model.progress_events import DownloadProgress, StageStarted, TranscodeProgress, get_event_bus
+from model.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Estado del trabajo que se convierte en este contexto (lo heredan los hilos de descarga)
+_current_job = contextvars.ContextVar("ekho_worker_job", default=None)
+
+
+class ConversionWorkerPool:
+    """Hilos que reclaman trabajos de un JobStore y los convierten"""
+
+    def __init__(self, store: JobStore, workers=2, poll_interval=1.0, lease_seconds=None):
+        self.store = store
+        self.workers = max(1, int(workers))
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        # BatchConverter mantiene un conversor por plataforma y por hilo (conversores "calientes")
+        # y comparte el JobStore para dejar checkpoints por etapa de cada pista
+        self.converter = BatchConverter(jobs=self.workers, checkpoints=store)
+        self.changed = threading.Condition()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self.worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        # Trabajos en curso de este proceso: id del hilo -> {'job', 'worker', 'progress'}
+        self._running = {}
+        self._running_lock = threading.Lock()
+        self._heartbeat_stop = threading.Event()
+        self._heartbeat_thread = None
+        self._unsubscribe = None
+
+    def start(self):
+        """Arranca los hilos de trabajo (recupera trabajos interrumpidos antes)"""
+        recovered = self.store.requeue_interrupted()
+        if recovered:
+            logger.info(f"♻️ {recovered} trabajo(s) interrumpido(s) devuelto(s) a la cola")
+
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, args=(f"{self.worker_prefix}:{index}",),
+                                      name=f"ekho-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+        if self.lease_seconds:
+            self._unsubscribe = get_event_bus().subscribe(
+                self._on_progress, (StageStarted, DownloadProgress, TranscodeProgress))
+            self._heartbeat_stop.clear()
+            self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop,
+                                                      name="ekho-heartbeat", daemon=True)
+            self._heartbeat_thread.start()
+
+    def stop(self, timeout=None):
+        """Detiene los workers; los trabajos en curso terminan antes de salir"""
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        # Los heartbeats siguen hasta que termina el último trabajo en curso
+        self._heartbeat_stop.set()
+        if self._heartbeat_thread:
+            self._heartbeat_thread.join(timeout)
+            self._heartbeat_thread = None
+        if self._unsubscribe:
+            self._unsubscribe()
+            self._unsubscribe = None
+
+    def running_jobs(self):
+        """Número de trabajos que este proceso está convirtiendo ahora"""
+        with self._running_lock:
+            return len(self._running)
+
+    def _on_progress(self, event):
+        """Progreso del trabajo en cuyo contexto se publica el evento (para el siguiente heartbeat).
+
+        No se busca por hilo: los eventos llegan también desde los hilos de fragmentos de
+        yt-dlp y de la descarga segmentada, que heredan el contexto del trabajo.
+        """
+        state = _current_job.get()
+        if state is None:
+            return
+        progress = state['progress']
+        if isinstance(event, StageStarted):
+            progress.clear()
+            progress['stage'] = event.stage
+        elif isinstance(event, DownloadProgress):
+            progress['downloaded'], progress['total'] = event.downloaded, event.total
+        elif isinstance(event, TranscodeProgress):
+            progress['transcode'] = round(event.percent, 1)
+
+    def _heartbeat_loop(self):
+        interval = max(0.5, self.lease_seconds / 3)
+        while not self._heartbeat_stop.wait(interval):
+            with self._running_lock:
+                states = list(self._running.values())
+            for state in states:
+                job = state['job']
+                try:
+                    owned = self.store.heartbeat(job['id'], state['worker'], self.lease_seconds,
+                                                 dict(state['progress']))
+                except Exception as e:
+                    logger.warning(f"⚠️ Heartbeat fallido ({job['url']}): {e}")
+                    continue
+                if not owned:
+                    self._mark_lost(state)
+
+    @staticmethod
+    def _mark_lost(state):
+        if not state['lost']:
+            state['lost'] = True
+            logger.warning(f"⚠️ Lease perdido: otro worker ha retomado {state['job']['url']}")
+
+    def _lease_guard(self, state):
+        """Detiene la conversión entre etapas si el trabajo ya es de otro worker.
+
+        Antes de 'finalize' (mover el archivo a la biblioteca) se comprueba el lease en la
+        base de datos en lugar de esperar al siguiente heartbeat.
+        """
+        def check(stage):
+            if not state['lost'] and stage == "finalize":
+                if not self.store.heartbeat(state['job']['id'], state['worker'], self.lease_seconds,
+                                            dict(state['progress'])):
+                    self._mark_lost(state)
+            if state['lost']:
+                raise ConversionCancelled(f"Lease perdido antes de la etapa '{stage}'")
+        return check
+
+    def notify_submitted(self):
+        """Despierta a los workers dormidos cuando llega un trabajo nuevo"""
+        self._wakeup.set()
+        self._notify_changed()
+
+    def _notify_changed(self):
+        with self.changed:
+            self.changed.notify_all()
+
+    def wait_for_change(self, timeout):
+        """Bloquea hasta que algún trabajo cambie de estado (o venza el timeout)"""
+        with self.changed:
+            self.changed.wait(timeout)
+
+    def _worker_loop(self, worker_name):
+        thread_id = threading.get_ident()
+        while not self._stop.is_set():
+            job = self.store.claim_next(worker_name, self.lease_seconds)
+            if job is None:
+                # Cola vacía: dormir hasta nuevo trabajo o hasta el siguiente sondeo
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            state = {'job': job, 'worker': worker_name, 'progress': {}, 'lost': False}
+            with self._running_lock:
+                self._running[thread_id] = state
+            self._notify_changed()
+            token = _current_job.set(state)
+            try:
+                if self.lease_seconds:
+                    with stage_guard(self._lease_guard(state)):
+                        self.process_job(job)
+                else:
+                    self.process_job(job)
+            finally:
+                _current_job.reset(token)
+                with self._running_lock:
+                    del self._running[thread_id]
+            self._notify_changed()
+
+    def process_job(self, job):
+        """Convierte un trabajo reclamado y guarda el resultado en la cola"""
+        result = self.converter.convert_url(job['url'], job.get('collection'))
+        # Con lease, el resultado solo se guarda si el trabajo sigue siendo de este worker
+        owner = job['worker'] if self.lease_seconds else None
+        if result['status'] == STATUS_OK:
+            output = result['output']
+            if isinstance(output, list):
+                # Álbum o playlist convertido dentro del mismo trabajo
+                output = json.dumps(output, ensure_ascii=False)
+            saved = self.store.complete(job['id'], output, worker=owner)
+        else:
+            saved = self.store.fail(job['id'], result['error'], worker=owner)
+        if not saved:
+            logger.warning(f"⚠️ Resultado descartado: {job['url']} pertenece ya a otro worker")
+        return result
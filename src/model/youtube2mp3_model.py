@@ -1,7 +1,22 @@
 # youtube2mp3_model.py
 import os
-import requests
 from pytubefix import YouTube
+from model.conversor_model import BaseModel, get_data_dir
+from model.http_client import get_session
+from model.download_manager import (IncompleteDownloadError, job_temp_dir, remove_job_temp_dir,
+                                    resumable_download, validate_audio_file)
+from model.rate_limiter import YOUTUBE_HOST, get_rate_limiter
+from model.async_runtime import run_cpu, run_network
+from model.progress_events import moviepy_logger
+from model.youtube_info import youtube_video_id
+from model.loudness import LOUDNESS_ENABLED, analysis_filter, apply_stats, stats_path_for, tag_file
+from model.output_profiles import get_profile, passthrough_path, remux_audio
+from model.audio_tags import write_tags
+from model.library_commit import remove_staging_dir, staging_dir
+from model.naming import YOUTUBE_NAME_TEMPLATE, get_path_index, render_name
+from model.logging_config import get_logger
+
+logger = get_logger(__name__)
 
 # Intentar múltiples bibliotecas de audio para conversión
 HAS_CONVERSION = False
@@ -11,18 +26,18 @@ try:
     from moviepy.editor import AudioFileClip
     HAS_CONVERSION = True
     CONVERTER_TYPE = "moviepy"
-    print("✅ Usando moviepy para conversión de audio de YouTube")
+    logger.debug("✅ Usando moviepy para conversión de audio de YouTube")
 except ImportError:
     try:
         from pydub import AudioSegment
         HAS_CONVERSION = True
         CONVERTER_TYPE = "pydub"
-        print("✅ Usando pydub para conversión de audio de YouTube")
+        logger.debug("✅ Usando pydub para conversión de audio de YouTube")
     except ImportError:
         HAS_CONVERSION = False
-        print("⚠️ No hay bibliotecas de conversión disponibles. Solo cambio de extensión.")
-        print("   Instala moviepy: pip install moviepy")
-        print("   O instala pydub: pip install pydub")
+        logger.warning("⚠️ No hay bibliotecas de conversión disponibles. Solo cambio de extensión.")
+        logger.warning("   Instala moviepy: pip install moviepy")
+        logger.warning("   O instala pydub: pip install pydub")
 
 # Intentar importar bibliotecas para metadatos de audio
 HAS_METADATA = False
@@ -34,84 +49,116 @@ try:
     from mutagen.id3._frames import APIC, TIT2, TPE1, TALB
     HAS_METADATA = True
     METADATA_TYPE = "mutagen"
-    print("✅ Usando mutagen para metadatos de audio de YouTube")
+    logger.debug("✅ Usando mutagen para metadatos de audio de YouTube")
 except ImportError:
     try:
         import eyed3
         HAS_METADATA = True
         METADATA_TYPE = "eyed3"
-        print("✅ Usando eyed3 para metadatos de audio")
+        logger.debug("✅ Usando eyed3 para metadatos de audio")
     except ImportError:
         HAS_METADATA = False
-        print("⚠️ Sin bibliotecas de metadatos. Las portadas no se incrustarán.")
-        print("   Instala mutagen: pip install mutagen")
-        print("   O instala eyed3: pip install eyed3")
+        logger.warning("⚠️ Sin bibliotecas de metadatos. Las portadas no se incrustarán.")
+        logger.warning("   Instala mutagen: pip install mutagen")
+        logger.warning("   O instala eyed3: pip install eyed3")
 
 
-class YouTube2MP3Converter:
+class YouTube2MP3Converter(BaseModel):
     def __init__(self):
-        self.origin = "YouTube"
+        super().__init__(BaseModel.ORIGIN_YOUTUBE)
+
+    def get_supported_urls(self):
+        """Retorna lista de patrones de URL soportados por YouTube"""
+        return [
+            r"https://(?:www\.|m\.)?youtube\.com/watch\?v=[\w-]+",
+            r"https://youtu\.be/[\w-]+"
+        ]
 
     @staticmethod
-    def download_video(url):
-        # Crear carpeta de descargas si no existe
-        downloads_dir = os.path.join(os.path.dirname(__file__), "..", "..", "data", "music")
-        os.makedirs(downloads_dir, exist_ok=True)
+    def download_video(url, output_dir=None):
+        """Descarga el audio del video en output_dir (por defecto, directamente en data/music)"""
+        downloads_dir = output_dir or get_data_dir("music")
         
         try:
-            yt = YouTube(url)
-            print(f"Título: {yt.title}")
-            print(f"Autor: {yt.author}")
-            
-            # Primero intentar obtener streams de audio de mejor calidad
-            audio_streams = yt.streams.filter(only_audio=True).order_by('abr').desc()
-            
-            if not audio_streams:
-                raise Exception("No se encontraron streams de audio disponibles")
-            
-            # Preferir M4A o MP4 que suelen tener mejor compatibilidad
-            preferred_stream = None
-            for stream in audio_streams:
-                if stream.mime_type in ['audio/mp4', 'audio/webm']:
-                    preferred_stream = stream
-                    break
-            
-            if not preferred_stream:
-                preferred_stream = audio_streams.first()
-            
-            print(f"Descargando stream: {preferred_stream.mime_type} - {preferred_stream.abr}") # type: ignore
-            out_file = preferred_stream.download(output_path=downloads_dir) # type: ignore
-            
-            # Retornar tanto el archivo como la información del video
-            video_info = {
-                'file_path': out_file,
-                'title': yt.title,
-                'author': yt.author,
-                'thumbnail_url': yt.thumbnail_url,
-                'length': yt.length
-            }
-            
-            return video_info
-            
+            # pytubefix habla con YouTube en cada paso: reservar turno en el limitador compartido
+            return get_rate_limiter().call(YOUTUBE_HOST, "download",
+                                           YouTube2MP3Converter._fetch_video, url, downloads_dir)
         except Exception as e:
             raise Exception(f"Error al descargar el video: {e}")
 
+    @staticmethod
+    def _fetch_video(url, downloads_dir):
+        """Obtiene la información del video y descarga su mejor stream de audio"""
+        yt = YouTube(url)
+        logger.debug(f"Título: {yt.title}")
+        logger.debug(f"Autor: {yt.author}")
+        
+        # Primero intentar obtener streams de audio de mejor calidad
+        audio_streams = yt.streams.filter(only_audio=True).order_by('abr').desc()
+        
+        if not audio_streams:
+            raise Exception("No se encontraron streams de audio disponibles")
+        
+        # Preferir M4A o MP4 que suelen tener mejor compatibilidad
+        preferred_stream = None
+        for stream in audio_streams:
+            if stream.mime_type in ['audio/mp4', 'audio/webm']:
+                preferred_stream = stream
+                break
+        
+        if not preferred_stream:
+            preferred_stream = audio_streams.first()
+        
+        logger.debug(f"Descargando stream: {preferred_stream.mime_type} - {preferred_stream.abr}") # type: ignore
+        out_file = YouTube2MP3Converter._download_stream(yt, preferred_stream, url, downloads_dir)
+        
+        # Retornar tanto el archivo como la información del video
+        video_info = {
+            'file_path': out_file,
+            'title': yt.title,
+            'author': yt.author,
+            'thumbnail_url': yt.thumbnail_url,
+            'length': yt.length
+        }
+        
+        return video_info
+
+    @staticmethod
+    def _download_stream(yt, stream, url, downloads_dir):
+        """Descarga el stream dejando un .part reanudable en el área temporal del video"""
+        job_key = f"youtube_{getattr(yt, 'video_id', None) or url}"
+        out_file = os.path.join(downloads_dir, stream.default_filename)
+        
+        try:
+            resumable_download(stream.url, out_file, expected_size=getattr(stream, 'filesize', None),
+                               temp_dir=job_temp_dir(job_key))
+        except IncompleteDownloadError:
+            raise
+        except Exception as e:
+            # URL del stream no accesible directamente: descarga clásica de pytubefix
+            logger.warning(f"⚠️ Descarga por rangos no disponible ({e}) - usando pytubefix")
+            out_file = stream.download(output_path=downloads_dir)
+        
+        validate_audio_file(out_file, expected_duration=yt.length)
+        remove_job_temp_dir(job_key)
+        return out_file
+
     @staticmethod
     def download_thumbnail(thumbnail_url, save_path):
         """Descarga la thumbnail del video"""
         try:
-            print("🖼️ Descargando portada del video...")
-            response = requests.get(thumbnail_url, timeout=10)
+            logger.info("🖼️ Descargando portada del video...")
+            response = get_session().get(thumbnail_url, timeout=10)
             response.raise_for_status()
             
             with open(save_path, 'wb') as f:
                 f.write(response.content)
             
-            print(f"✅ Portada descargada: {save_path}")
+            logger.info(f"✅ Portada descargada: {save_path}")
             return True
             
         except Exception as e:
-            print(f"❌ Error descargando portada: {e}")
+            logger.error(f"❌ Error descargando portada: {e}")
             return False
 
     @staticmethod
@@ -119,19 +166,27 @@ class YouTube2MP3Converter:
         """Añade metadatos al archivo MP3 incluyendo la portada y origen"""
         try:
             if not HAS_METADATA:
-                print("⚠️ Sin bibliotecas de metadatos disponibles")
+                logger.warning("⚠️ Sin bibliotecas de metadatos disponibles")
                 return False
 
             # Verificar que el archivo MP3 existe y tiene contenido
             if not os.path.exists(mp3_path):
-                print(f"❌ El archivo MP3 no existe: {mp3_path}")
+                logger.error(f"❌ El archivo MP3 no existe: {mp3_path}")
                 return False
                 
             if os.path.getsize(mp3_path) == 0:
-                print(f"❌ El archivo MP3 está vacío: {mp3_path}")
+                logger.error(f"❌ El archivo MP3 está vacío: {mp3_path}")
                 return False
 
-            print("🏷️ Añadiendo metadatos al MP3...")
+            # Otros formatos de salida (Opus, M4A, FLAC): etiquetas propias de cada formato
+            if not mp3_path.lower().endswith(".mp3"):
+                logger.info("🏷️ Añadiendo metadatos...")
+                write_tags(mp3_path, title=title, artist=artist, comment=f"Origen: {origin}",
+                           cover_path=thumbnail_path)
+                logger.info(f"✅ Metadatos añadidos correctamente (Origen: {origin})")
+                return True
+
+            logger.info("🏷️ Añadiendo metadatos al MP3...")
             
             if METADATA_TYPE == "mutagen":
                 # Usar mutagen - con verificación de archivo válido
@@ -144,14 +199,14 @@ class YouTube2MP3Converter:
                     
                     # Verificar que se pudo cargar correctamente
                     if audio_file.info is None:
-                        print("❌ El archivo MP3 no es válido o está corrupto")
+                        logger.error("❌ El archivo MP3 no es válido o está corrupto")
                         return False
                         
-                    print(f"📊 Duración del MP3: {audio_file.info.length:.1f} segundos")
+                    logger.debug(f"📊 Duración del MP3: {audio_file.info.length:.1f} segundos")
                     
                 except Exception as e:
-                    print(f"❌ Error cargando archivo MP3: {e}")
-                    print("🔧 Intentando reparar/recrear metadatos...")
+                    logger.error(f"❌ Error cargando archivo MP3: {e}")
+                    logger.debug("🔧 Intentando reparar/recrear metadatos...")
                     
                     # Intentar crear un objeto MP3 básico
                     try:
@@ -159,7 +214,7 @@ class YouTube2MP3Converter:
                         if audio_file.tags is None:
                             audio_file.add_tags()
                     except Exception as repair_error:
-                        print(f"❌ No se pudo reparar el archivo: {repair_error}")
+                        logger.error(f"❌ No se pudo reparar el archivo: {repair_error}")
                         return False
                 
                 # Añadir ID3 tag si no existe
@@ -193,21 +248,21 @@ class YouTube2MP3Converter:
                                     desc='Cover',
                                     data=image_data
                                 ))
-                                print(f"✅ Portada incrustada ({len(image_data)} bytes)")
+                                logger.info(f"✅ Portada incrustada ({len(image_data)} bytes)")
                             else:
-                                print("⚠️ Archivo de portada vacío")
+                                logger.warning("⚠️ Archivo de portada vacío")
                     except Exception as img_error:
-                        print(f"⚠️ Error añadiendo portada: {img_error}")
+                        logger.warning(f"⚠️ Error añadiendo portada: {img_error}")
                 else:
-                    print("ℹ️ No hay portada para añadir")
+                    logger.debug("ℹ️ No hay portada para añadir")
                 
                 # Guardar cambios con manejo de errores
                 try:
                     audio_file.save()
-                    print(f"✅ Metadatos añadidos correctamente (Origen: {origin})")
+                    logger.info(f"✅ Metadatos añadidos correctamente (Origen: {origin})")
                     return True
                 except Exception as save_error:
-                    print(f"❌ Error guardando metadatos: {save_error}")
+                    logger.error(f"❌ Error guardando metadatos: {save_error}")
                     return False
                 
             elif METADATA_TYPE == "eyed3":
@@ -217,7 +272,7 @@ class YouTube2MP3Converter:
                 try:
                     audio_file = eyed3.load(mp3_path)
                     if audio_file is None:
-                        print("❌ El archivo MP3 no es válido para eyed3")
+                        logger.error("❌ El archivo MP3 no es válido para eyed3")
                         return False
                         
                     if audio_file.tag is None:
@@ -237,74 +292,85 @@ class YouTube2MP3Converter:
                             with open(thumbnail_path, 'rb') as img:
                                 image_data = img.read()
                                 audio_file.tag.images.set(3, image_data, 'image/jpeg') # type: ignore
-                                print(f"✅ Portada incrustada ({len(image_data)} bytes)")
+                                logger.info(f"✅ Portada incrustada ({len(image_data)} bytes)")
                         except Exception as img_error:
-                            print(f"⚠️ Error añadiendo portada: {img_error}")
+                            logger.warning(f"⚠️ Error añadiendo portada: {img_error}")
                     
                     audio_file.tag.save() # type: ignore
-                    print(f"✅ Metadatos añadidos correctamente (Origen: {origin})")
+                    logger.info(f"✅ Metadatos añadidos correctamente (Origen: {origin})")
                     return True
                     
                 except Exception as e:
-                    print(f"❌ Error con eyed3: {e}")
+                    logger.error(f"❌ Error con eyed3: {e}")
                     return False
             
             return False
             
         except Exception as e:
-            print(f"❌ Error crítico añadiendo metadatos: {e}")
-            import traceback
-            print(f"📋 Detalles: {traceback.format_exc()}")
+            logger.error(f"❌ Error crítico añadiendo metadatos: {e}")
+            logger.debug("📋 Detalles del error de metadatos", exc_info=True)
             return False
 
     @staticmethod
-    def convert_to_mp3(file_path):
-        """Convierte el archivo de audio descargado a MP3"""
+    def convert_to_mp3(file_path, profile=None):
+        """Convierte el archivo de audio descargado al formato del perfil de salida (MP3 por defecto)"""
+        profile = profile or get_profile()
         try:
             # Obtener información del archivo
             base_name = os.path.splitext(file_path)[0]
             file_ext = os.path.splitext(file_path)[1].lower()
-            mp3_path = base_name + ".mp3"
+            if profile.extension is None:
+                return YouTube2MP3Converter._passthrough(file_path)
+            mp3_path = base_name + profile.extension
             
-            print(f"🔄 Archivo a convertir: {file_path}")
-            print(f"📁 Extensión detectada: {file_ext}")
-            print(f"🎯 Ruta MP3 objetivo: {mp3_path}")
+            logger.debug(f"🔄 Archivo a convertir: {file_path}")
+            logger.debug(f"📁 Extensión detectada: {file_ext}")
+            logger.debug(f"🎯 Ruta objetivo ({profile.name}): {mp3_path}")
             
-            # Si ya es MP3, no convertir
-            if file_ext == '.mp3':
-                print("✅ El archivo ya es MP3")
+            # Si ya está en el formato del perfil, no convertir
+            if file_ext == profile.extension:
+                logger.info(f"✅ El archivo ya es {profile.extension[1:].upper()}")
+                if LOUDNESS_ENABLED:
+                    tag_file(file_path, force=True)
                 return file_path
             
-            print(f"🔄 Convirtiendo {file_ext} a MP3...")
+            logger.info(f"🔄 Convirtiendo {file_ext} a {profile.description}...")
             
             conversion_success = False
+            # Sonoridad (ReplayGain) medida por el mismo FFmpeg que codifica la salida
+            stats_path = stats_path_for(mp3_path)
+            loudness_params = ["-af", analysis_filter(stats_path)] if LOUDNESS_ENABLED else None
             
             # Intentar moviepy primero (más confiable)
             if HAS_CONVERSION and CONVERTER_TYPE == "moviepy":
                 try:
-                    print("🎬 Usando moviepy para conversión...")
+                    logger.debug("🎬 Usando moviepy para conversión...")
                     from moviepy.editor import AudioFileClip
                     
                     audio_clip = AudioFileClip(file_path)
-                    audio_clip.write_audiofile(mp3_path, verbose=False, logger=None)
+                    audio_clip.write_audiofile(mp3_path, fps=profile.sample_rate or 44100, codec=profile.codec,
+                                               bitrate=profile.bitrate, verbose=False,
+                                               logger=moviepy_logger(), ffmpeg_params=loudness_params)
                     audio_clip.close()
                     
                     # Verificar que el archivo se creó correctamente
                     if os.path.exists(mp3_path) and os.path.getsize(mp3_path) > 0:
                         os.remove(file_path)  # Eliminar original
-                        print("✅ Conversión completada con moviepy")
+                        if loudness_params:
+                            apply_stats(mp3_path, stats_path)
+                        logger.info("✅ Conversión completada con moviepy")
                         conversion_success = True
                         return mp3_path
                     else:
-                        print("❌ Archivo MP3 no se creó correctamente con moviepy")
+                        logger.error("❌ Archivo MP3 no se creó correctamente con moviepy")
                         
                 except Exception as e:
-                    print(f"❌ Error con moviepy: {e}")
+                    logger.error(f"❌ Error con moviepy: {e}")
             
             # Intentar pydub como segunda opción
             if not conversion_success and HAS_CONVERSION and CONVERTER_TYPE == "pydub":
                 try:
-                    print("🎵 Usando pydub para conversión...")
+                    logger.debug("🎵 Usando pydub para conversión...")
                     from pydub import AudioSegment
                     
                     if file_ext == '.webm':
@@ -314,132 +380,200 @@ class YouTube2MP3Converter:
                     else:
                         audio = AudioSegment.from_file(file_path)
                     
-                    audio.export(mp3_path, format="mp3", bitrate="192k")
+                    audio.export(mp3_path, format=profile.container, codec=profile.codec,
+                                 bitrate=profile.bitrate, parameters=loudness_params)
                     
                     # Verificar que el archivo se creó correctamente
                     if os.path.exists(mp3_path) and os.path.getsize(mp3_path) > 0:
                         os.remove(file_path)  # Eliminar original
-                        print("✅ Conversión completada con pydub")
+                        if loudness_params:
+                            apply_stats(mp3_path, stats_path)
+                        logger.info("✅ Conversión completada con pydub")
                         conversion_success = True
                         return mp3_path
                     else:
-                        print("❌ Archivo MP3 no se creó correctamente con pydub")
+                        logger.error("❌ Archivo MP3 no se creó correctamente con pydub")
                         
                 except Exception as e:
-                    print(f"❌ Error con pydub: {e}")
+                    logger.error(f"❌ Error con pydub: {e}")
             
             # Si no se pudo convertir con bibliotecas especializadas
             if not conversion_success:
-                print("⚠️ Sin bibliotecas de conversión disponibles o falló la conversión")
-                print("📝 Usando conversión simple (cambio de extensión)")
-                print("💡 Para conversión real, instala: pip install moviepy")
+                logger.warning("⚠️ Sin bibliotecas de conversión disponibles o falló la conversión")
+                logger.debug("💡 Para conversión real, instala: pip install moviepy")
+                # Una salida a medias no debe llegar a la biblioteca
+                if os.path.exists(mp3_path):
+                    os.remove(mp3_path)
                 
-                # Cambio de extensión como fallback
-                if file_path != mp3_path:
-                    os.rename(file_path, mp3_path)
-                    print(f"✅ Archivo renombrado a: {mp3_path}")
-                    print("ℹ️ NOTA: Este es solo un cambio de extensión.")
-                    print("ℹ️ Para conversión real del contenido, instala moviepy.")
-                else:
-                    print("ℹ️ El archivo ya tiene el nombre correcto")
-                
-            return mp3_path
+                # Sin recodificar: el mismo audio en el contenedor de su códec (renombrar a
+                # .mp3 dejaría un archivo cuya extensión no corresponde a su contenido)
+                try:
+                    return YouTube2MP3Converter._passthrough(file_path)
+                except Exception as e:
+                    logger.warning(f"⚠️ No se pudo cambiar de contenedor ({e}) - se conserva el original")
+                    return file_path
             
         except Exception as e:
-            print(f"❌ Error crítico en la conversión: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.error(f"❌ Error crítico en la conversión: {e}")
+            logger.debug("📋 Detalles del error de conversión", exc_info=True)
             return file_path
 
-    def convert(self, url):
-        """Descarga y convierte el video de YouTube a MP3 con portada"""
+    @staticmethod
+    def _passthrough(file_path):
+        """Perfil passthrough: el mismo audio en el contenedor de su códec, sin recodificar"""
+        target_path = passthrough_path(file_path)
+        if target_path != file_path:
+            logger.info(f"📦 Cambiando de contenedor sin recodificar: {os.path.basename(target_path)}")
+            remux_audio(file_path, target_path)
+            os.remove(file_path)
+        # Sin decodificación en la conversión: la sonoridad necesita su propia pasada
+        if LOUDNESS_ENABLED:
+            tag_file(target_path, force=True)
+        return target_path
+
+    async def aconvert(self, url):
+        """Descarga y convierte el video de YouTube a MP3 con portada.
+
+        La descarga espera en el ejecutor de red; la conversión (moviepy/FFmpeg), la huella
+        acústica y las etiquetas (mutagen), en el de CPU. Todo ocurre en el área de
+        preparación de la tarea: el archivo entra en data/music ya etiquetado (library_commit).
+        """
+        task_key = self.get_task_key(url)
         try:
-            print(f"🔄 Descargando: {url}")
+            logger.info(f"🔄 Descargando: {url}")
             
             # Auto-detect source from URL
             source = "youtube" if "youtube" in url.lower() or "youtu.be" in url.lower() else "unknown"
-            print(f"📍 Fuente detectada: {source}")
+            logger.debug(f"📍 Fuente detectada: {source}")
+            
+            # Si una ejecución anterior ya terminó este video, no repetir trabajo
+            final_path = self.get_completed_stage(task_key, "finalize", validate=os.path.exists)
+            if final_path:
+                logger.info(f"⏭️ Video ya convertido anteriormente: {final_path}")
+                return final_path
             
-            video_info = self.download_video(url)
-            print(f"📁 Archivo descargado: {video_info['file_path']}")
+            # El mismo vídeo convertido desde otra URL (o desde Spotify) no se vuelve a descargar
+            video_id = youtube_video_id(url)
+            source_id = self.source_key(video_id)
+            existing_path = self.find_converted_source(source_id)
+            if existing_path:
+                logger.info(f"♻️ Vídeo ya convertido en la biblioteca: {existing_path}")
+                return existing_path
             
-            print(f"🔄 Convirtiendo a MP3...")
-            mp3_file = self.convert_to_mp3(video_info['file_path'])
-            print(f"🎵 MP3 guardado en: {mp3_file}")
+            # La transcodificación borra el archivo descargado: si ya terminó (y su salida
+            # sigue ahí), la descarga vale aunque su archivo no exista; repetirla
+            # invalidaría los checkpoints de las etapas posteriores
+            def download_still_valid(info):
+                return os.path.exists(info['file_path']) or bool(
+                    self.get_completed_stage(task_key, "transcode", validate=os.path.exists))
             
-            # Pequeña pausa para asegurar que el archivo esté completamente escrito
-            import time
-            time.sleep(0.5)
+            video_info = await self.arun_stage(task_key, "download", run_network, self.download_video, url,
+                                               staging_dir(task_key), validate=download_still_valid)
+            logger.debug(f"📁 Archivo descargado: {video_info['file_path']}")
+            
+            logger.info(f"🔄 Convirtiendo a {self.profile.description}...")
+            mp3_file = await self.arun_stage(task_key, "transcode", run_cpu, self.convert_to_mp3,
+                                             video_info['file_path'], self.profile, validate=os.path.exists)
+            logger.debug(f"🔄 Audio convertido: {mp3_file}")
             
             # Verificar que el archivo MP3 se creó correctamente
             if not os.path.exists(mp3_file) or os.path.getsize(mp3_file) == 0:
-                print("❌ Error: El archivo MP3 no se creó correctamente")
+                logger.error("❌ Error: El archivo de audio no se creó correctamente")
                 return mp3_file
             
-            # Descargar y agregar portada si las bibliotecas están disponibles
-            if HAS_METADATA and video_info['thumbnail_url']:
-                try:
-                    print("🖼️ Procesando portada...")
-                    # Crear nombre para la thumbnail
-                    thumbnail_filename = os.path.splitext(mp3_file)[0] + "_thumbnail.jpg"
-                    
-                    # Descargar thumbnail
-                    if self.download_thumbnail(video_info['thumbnail_url'], thumbnail_filename):
-                        # Verificar que la thumbnail se descargó correctamente
-                        if os.path.exists(thumbnail_filename) and os.path.getsize(thumbnail_filename) > 0:
-                            print("📸 Portada descargada, añadiendo metadatos...")
-                            
-                            # Agregar metadatos incluyendo la portada y origen
-                            success = self.add_metadata_to_mp3(
-                                mp3_file, 
-                                video_info['title'], 
-                                video_info['author'],
-                                thumbnail_filename,
-                                origin=source
-                            )
-                            
-                            if success:
-                                print("✅ Metadatos y portada añadidos correctamente")
-                            else:
-                                print("⚠️ Metadatos añadidos sin portada")
-                                
-                            # Eliminar archivo de thumbnail temporal
-                            try:
-                                os.remove(thumbnail_filename)
-                                print("🗑️ Thumbnail temporal eliminada")
-                            except:
-                                pass
+            fingerprint = await self.arun_stage(task_key, "fingerprint", run_cpu, self.fingerprint_audio,
+                                                mp3_file)
+            mp3_file = await self.arun_stage(task_key, "tag", run_cpu, self._tag_video, mp3_file, video_info,
+                                             source, validate=os.path.exists)
+            mp3_file = await self.arun_stage(task_key, "finalize", run_cpu, self._finalize_video, mp3_file,
+                                             video_info, task_key, video_id, source_id, validate=os.path.exists)
+            await run_cpu(self.index_fingerprint, mp3_file, fingerprint, source_id)
+            logger.info(f"🎵 Audio guardado en: {mp3_file}")
+            return mp3_file
+            
+        except Exception as e:
+            logger.error(f"❌ Error en el proceso de conversión: {e}")
+            raise
+        finally:
+            self.release_scratch(task_key)
+
+    def _tag_video(self, mp3_file, video_info, source):
+        """Descarga la thumbnail y añade título, autor, portada y origen al MP3"""
+        # Descargar y agregar portada si las bibliotecas están disponibles
+        if HAS_METADATA and video_info['thumbnail_url']:
+            try:
+                logger.info("🖼️ Procesando portada...")
+                # Crear nombre para la thumbnail
+                thumbnail_filename = os.path.splitext(mp3_file)[0] + "_thumbnail.jpg"
+                
+                # Descargar thumbnail
+                if self.download_thumbnail(video_info['thumbnail_url'], thumbnail_filename):
+                    # Verificar que la thumbnail se descargó correctamente
+                    if os.path.exists(thumbnail_filename) and os.path.getsize(thumbnail_filename) > 0:
+                        logger.debug("📸 Portada descargada, añadiendo metadatos...")
+                        
+                        # Agregar metadatos incluyendo la portada y origen
+                        success = self.add_metadata_to_mp3(
+                            mp3_file, 
+                            video_info['title'], 
+                            video_info['author'],
+                            thumbnail_filename,
+                            origin=source
+                        )
+                        
+                        if success:
+                            logger.info("✅ Metadatos y portada añadidos correctamente")
                         else:
-                            print("❌ Error: Thumbnail descargada pero vacía o inválida")
-                            # Agregar metadatos sin portada
-                            self.add_metadata_to_mp3(
-                                mp3_file, 
-                                video_info['title'], 
-                                video_info['author'],
-                                origin=source
-                            )
+                            logger.warning("⚠️ Metadatos añadidos sin portada")
+                            
+                        # Eliminar archivo de thumbnail temporal
+                        try:
+                            os.remove(thumbnail_filename)
+                            logger.debug("🗑️ Thumbnail temporal eliminada")
+                        except:
+                            pass
                     else:
-                        print("❌ No se pudo descargar la portada")
-                        # Agregar metadatos sin portada pero con origen
+                        logger.error("❌ Error: Thumbnail descargada pero vacía o inválida")
+                        # Agregar metadatos sin portada
                         self.add_metadata_to_mp3(
                             mp3_file, 
                             video_info['title'], 
                             video_info['author'],
                             origin=source
                         )
-                        
-                except Exception as e:
-                    print(f"⚠️ Error con metadatos/portada: {e}")
-                    print("🎵 El archivo MP3 se creó correctamente sin metadatos")
-            else:
-                if not HAS_METADATA:
-                    print("💡 Tip: Instala 'mutagen' para agregar portadas a tus MP3")
-                    print("   Comando: pip install mutagen")
-                elif not video_info.get('thumbnail_url'):
-                    print("⚠️ No se encontró URL de portada en el video")
-            
-            return mp3_file
-            
-        except Exception as e:
-            print(f"❌ Error en el proceso de conversión: {e}")
-            raise
+                else:
+                    logger.error("❌ No se pudo descargar la portada")
+                    # Agregar metadatos sin portada pero con origen
+                    self.add_metadata_to_mp3(
+                        mp3_file, 
+                        video_info['title'], 
+                        video_info['author'],
+                        origin=source
+                    )
+                    
+            except Exception as e:
+                logger.warning(f"⚠️ Error con metadatos/portada: {e}")
+                logger.info("🎵 El archivo MP3 se creó correctamente sin metadatos")
+        else:
+            if not HAS_METADATA:
+                logger.debug("💡 Tip: Instala 'mutagen' para agregar portadas a tus MP3")
+                logger.debug("   Comando: pip install mutagen")
+            elif not video_info.get('thumbnail_url'):
+                logger.warning("⚠️ No se encontró URL de portada en el video")
+        
+        return mp3_file
+
+    @staticmethod
+    def _finalize_video(mp3_file, video_info, task_key, video_id=None, source_id=None):
+        """Mueve el archivo etiquetado a data/music con el nombre de EKHO_YOUTUBE_NAME_TEMPLATE"""
+        relative_name = render_name(
+            YOUTUBE_NAME_TEMPLATE,
+            artist=video_info.get('author'),
+            title=video_info.get('title') or os.path.splitext(os.path.basename(mp3_file))[0],
+            origin="youtube",
+            id=video_id,
+        )
+        extension = os.path.splitext(mp3_file)[1]
+        final_path = get_path_index().commit(mp3_file, relative_name, extension, source_id or video_id)
+        remove_staging_dir(task_key)
+        return final_path
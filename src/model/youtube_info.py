@@ -0,0 +1,152 @@
+# youtube_info.py
+"""
+Información de vídeos de YouTube ya resuelta, compartida entre la búsqueda y la descarga
+
+La búsqueda pide a yt-dlp solo la lista plana de resultados (extract_flat): título, canal y
+duración llegan en la propia página de resultados, sin abrir cada vídeo. Únicamente el
+candidato elegido se resuelve por completo (página del vídeo, reproductor y formatos), y
+ese resultado sin procesar se guarda aquí para que la descarga lo pase directamente a
+YoutubeDL.process_ie_result en lugar de volver a extraer el mismo vídeo.
+
+Las URLs de formato de YouTube caducan al cabo de unas horas (parámetro 'expire'); la
+información se guarda poco tiempo, nunca más allá de esa caducidad, y se entrega una sola
+vez (un reintento de descarga vuelve a extraer).
+
+Además, el código del reproductor de YouTube y las firmas/desafíos 'n' ya resueltos se
+comparten entre todas las instancias de YoutubeDL del proceso (yt-dlp los guarda por
+instancia del extractor, que muere con cada YoutubeDL) y se persisten en
+data/cache/yt-dlp, de modo que un trabajo nuevo no vuelve a descargar ni a interpretar
+el mismo reproductor.
+"""
+
+import time
+import threading
+import urllib.parse
+from collections import OrderedDict
+
+from model.conversor_model import get_data_dir
+
+# Segundos que se conserva la información resuelta de un vídeo a la espera de su descarga
+RESOLVED_INFO_TTL = 15 * 60
+MAX_RESOLVED_INFOS = 64
+# Margen antes de la caducidad de las URLs de formato para no empezar una descarga condenada
+EXPIRE_MARGIN_SECONDS = 5 * 60
+
+# Cachés de reproductor compartidas (ver share_player_cache): versiones del reproductor y
+# resultados de firmas que se conservan antes de empezar de cero
+MAX_PLAYER_VERSIONS = 4
+MAX_PLAYER_ENTRIES = 10000
+
+
+def youtube_video_id(url):
+    """Id del vídeo de una URL de YouTube (watch?v=, youtu.be/, shorts/), o None"""
+    parsed = urllib.parse.urlparse(url.strip())
+    video_id = urllib.parse.parse_qs(parsed.query).get('v', [None])[0]
+    if not video_id:
+        host = parsed.netloc.lower()
+        parts = [part for part in parsed.path.split("/") if part]
+        if host.endswith("youtu.be") and parts:
+            video_id = parts[0]
+        elif len(parts) >= 2 and parts[0] in ("shorts", "embed", "live"):
+            video_id = parts[1]
+    return video_id or None
+
+
+def ydl_cache_options():
+    """Opciones de YoutubeDL para persistir la caché de firmas del reproductor en data/"""
+    return {'cachedir': get_data_dir("cache", "yt-dlp")}
+
+
+def _url_expiry(info):
+    """Instante (time.time) en que caduca la primera URL de formato, o None si no lo indican"""
+    expiries = []
+    for fmt in info.get('formats') or [info]:
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(fmt.get('url') or '').query)
+        try:
+            expiries.append(float(query['expire'][0]))
+        except (KeyError, IndexError, ValueError):
+            continue
+    return min(expiries) if expiries else None
+
+
+class ResolvedInfoCache:
+    """URL del vídeo -> info dict de yt-dlp (sin procesar), con TTL y tamaño acotado"""
+
+    def __init__(self, ttl=RESOLVED_INFO_TTL, max_entries=MAX_RESOLVED_INFOS):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._infos = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'stored': 0, 'reused': 0, 'expired': 0}
+
+    def put(self, url, info):
+        ttl = self.ttl
+        expiry = _url_expiry(info)
+        if expiry is not None:
+            ttl = min(ttl, expiry - EXPIRE_MARGIN_SECONDS - time.time())
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._infos.pop(url, None)
+            self._infos[url] = (info, time.monotonic() + ttl)
+            self._stats['stored'] += 1
+            while len(self._infos) > self.max_entries:
+                self._infos.popitem(last=False)
+
+    def take(self, url):
+        """Saca la información de un vídeo (None si no está o ha caducado)"""
+        with self._lock:
+            info, expires_at = self._infos.pop(url, (None, 0))
+            if info is None:
+                return None
+            if expires_at < time.monotonic():
+                self._stats['expired'] += 1
+                return None
+            self._stats['reused'] += 1
+            return info
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, pending=len(self._infos))
+
+
+_resolved = None
+_resolved_lock = threading.Lock()
+
+
+def get_resolved_info_cache():
+    """Caché compartida del proceso (creada en el primer uso)"""
+    global _resolved
+    with _resolved_lock:
+        if _resolved is None:
+            _resolved = ResolvedInfoCache()
+        return _resolved
+
+
+_player_code = {}
+_player_data = {}
+_player_lock = threading.Lock()
+
+
+def share_player_cache(ydl):
+    """Conecta el extractor de YouTube de este YoutubeDL a las cachés de reproductor del proceso.
+
+    yt-dlp guarda el JS del reproductor (_code_cache) y las firmas resueltas (_player_cache)
+    en la instancia del extractor; al compartir los diccionarios, cada trabajo aprovecha lo
+    que ya resolvieron los anteriores. Devuelve el mismo ydl.
+    """
+    global _player_code, _player_data
+    # Solo si este YoutubeDL tiene registrado el extractor de YouTube (no crearlo si no)
+    if 'Youtube' not in getattr(ydl, '_ies', {}):
+        return ydl
+    extractor = ydl.get_info_extractor('Youtube')
+    if not hasattr(extractor, '_code_cache') or not hasattr(extractor, '_player_cache'):
+        return ydl
+    with _player_lock:
+        # Al pasar el tope se empieza con diccionarios nuevos: los YoutubeDL que aún usan
+        # los anteriores siguen funcionando con ellos
+        if len(_player_code) > MAX_PLAYER_VERSIONS or len(_player_data) > MAX_PLAYER_ENTRIES:
+            _player_code, _player_data = {}, {}
+        extractor._code_cache = _player_code
+        extractor._player_cache = _player_data
+    return ydl
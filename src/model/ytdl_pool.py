@@ -0,0 +1,193 @@
+# ytdl_pool.py
+"""
+Instancias de yt_dlp.YoutubeDL "calientes", una por hilo y por uso (búsqueda, descarga)
+
+Crear un YoutubeDL registra cientos de extractores, carga cookies, prepara los
+postprocesadores y los manejadores de peticiones; al cerrarlo se pierden las conexiones y
+las cachés de los extractores. En lotes y en el daemon cada hilo repite búsquedas y
+descargas continuamente, así que cada hilo conserva su propia instancia por rol y la
+reutiliza entre pistas (YoutubeDL no es seguro entre hilos, de ahí una por hilo).
+
+Ciclo de vida: una instancia se recicla (se cierra y se crea otra) cuando
+- ha servido EKHO_YTDL_MAX_USES operaciones o lleva EKHO_YTDL_MAX_AGE segundos viva,
+- cambian sus opciones o la clase YoutubeDL (p.ej. al activar el entorno offline),
+- una operación termina con una excepción: el estado interno puede haber quedado a medias.
+
+yt-dlp llama a los progress_hooks desde sus propios hilos (fragmentos en paralelo), que no
+heredan las variables de contexto de quien descarga (pista en curso, trabajo del worker).
+Cada instancia del pool envuelve sus hooks para ejecutarlos en el contexto del último
+lease().
+"""
+
+import os
+import time
+import threading
+import functools
+import contextlib
+import contextvars
+
+import yt_dlp
+
+from model.youtube_info import share_player_cache
+from model.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+MAX_USES = int(os.environ.get("EKHO_YTDL_MAX_USES", "500"))
+MAX_AGE_SECONDS = float(os.environ.get("EKHO_YTDL_MAX_AGE", "3600"))
+
+_MISSING = object()
+
+# Hooks de yt-dlp que se ejecutan en el contexto de quien tiene la instancia
+_CONTEXT_HOOKS = ('progress_hooks', 'postprocessor_hooks')
+
+
+class _PooledYoutubeDL:
+    """Instancia del pool con sus opciones y contadores de uso"""
+
+    def __init__(self, role, opts):
+        self.role = role
+        self.opts = opts
+        self.factory = yt_dlp.YoutubeDL
+        # Contexto del lease en curso (lo fija YoutubeDLPool.lease)
+        self.context = None
+        params = dict(opts)
+        for name in _CONTEXT_HOOKS:
+            if params.get(name):
+                params[name] = [functools.partial(self._call_hook, hook) for hook in params[name]]
+        self.ydl = share_player_cache(self.factory(params))
+        self.created = time.monotonic()
+        self.uses = 0
+
+    def _call_hook(self, hook, status):
+        context = self.context
+        if context is None:
+            return hook(status)
+        # Una copia por llamada: un mismo Context no puede estar activo en dos hilos a la vez
+        return context.copy().run(hook, status)
+
+    def health_problem(self, opts, max_uses, max_age):
+        """Motivo para reciclar la instancia antes de usarla (None si está sana)"""
+        if self.factory is not yt_dlp.YoutubeDL:
+            return "clase YoutubeDL distinta"
+        if self.opts != opts:
+            return "opciones distintas"
+        if self.uses >= max_uses:
+            return "usos agotados"
+        if time.monotonic() - self.created >= max_age:
+            return "antigüedad"
+        return None
+
+    def close(self):
+        try:
+            self.ydl.close()
+        except Exception as e:
+            logger.warning(f"⚠️ Error al cerrar YoutubeDL ({self.role}): {e}")
+
+
+class YoutubeDLPool:
+    """Pool de YoutubeDL por hilo y rol, con reciclado y estadísticas"""
+
+    def __init__(self, max_uses=MAX_USES, max_age=MAX_AGE_SECONDS):
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._instances = set()
+        self._stats = {'created': 0, 'reused': 0, 'recycled': 0, 'discarded': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _acquire(self, role, opts):
+        instances = getattr(self._local, "instances", None)
+        if instances is None:
+            instances = self._local.instances = {}
+
+        pooled = instances.get(role)
+        if pooled is not None:
+            problem = pooled.health_problem(opts, self.max_uses, self.max_age)
+            if problem is None:
+                self._count('reused')
+                return pooled
+            logger.info(f"♻️ Reciclando YoutubeDL de {role}: {problem}")
+            self._retire(pooled, 'recycled')
+
+        pooled = _PooledYoutubeDL(role, opts)
+        instances[role] = pooled
+        with self._lock:
+            self._instances.add(pooled)
+            self._stats['created'] += 1
+        return pooled
+
+    def _retire(self, pooled, reason):
+        instances = getattr(self._local, "instances", {})
+        if instances.get(pooled.role) is pooled:
+            del instances[pooled.role]
+        with self._lock:
+            self._instances.discard(pooled)
+            self._stats[reason] += 1
+        pooled.close()
+
+    @contextlib.contextmanager
+    def lease(self, role, opts, **overrides):
+        """YoutubeDL del hilo actual para `role` con las opciones dadas.
+
+        overrides cambia parámetros solo durante este uso (p.ej. 'paths', que depende de
+        cada descarga) sin obligar a crear otra instancia.
+        """
+        pooled = self._acquire(role, opts)
+        pooled.context = contextvars.copy_context()
+        params = pooled.ydl.params
+        previous = {name: params.get(name, _MISSING) for name in overrides}
+        params.update(overrides)
+        try:
+            yield pooled.ydl
+        except BaseException:
+            self._retire(pooled, 'discarded')
+            raise
+        else:
+            pooled.context = None
+            pooled.uses += 1
+            for name, value in previous.items():
+                if value is _MISSING:
+                    params.pop(name, None)
+                else:
+                    params[name] = value
+
+    def close(self):
+        """Cierra todas las instancias (de todos los hilos)"""
+        with self._lock:
+            instances, self._instances = list(self._instances), set()
+        for pooled in instances:
+            pooled.close()
+
+    def stats(self):
+        with self._lock:
+            by_role = {}
+            for pooled in self._instances:
+                by_role[pooled.role] = by_role.get(pooled.role, 0) + 1
+            return dict(self._stats, live=by_role)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_ytdl_pool():
+    """Pool compartido del proceso (creado en el primer uso)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = YoutubeDLPool()
+        return _pool
+
+
+def close_ytdl_pool():
+    """Cierra el pool compartido (al apagar el daemon o terminar un lote)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
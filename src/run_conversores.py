@@ -17,8 +17,92 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, current_dir)
 
 
-def main():
+def build_parser():
+    """Construye el parser de línea de comandos (sin argumentos se abre el menú interactivo)"""
+    import argparse
+    from controller.batch_controller import BatchController
+    from controller.daemon_controller import DaemonController
+    from controller.distributed_controller import CoordinatorController, WorkerController
+    from controller.dedupe_controller import DedupeController
+    from controller.loudness_controller import LoudnessController
+
+    parser = argparse.ArgumentParser(
+        prog="conversores.py",
+        description="Ekho Music Converter. Sin argumentos abre el menú interactivo."
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    batch_parser = subparsers.add_parser(
+        "batch", help="Convertir listas de URLs sin interacción (archivos o stdin)"
+    )
+    BatchController.add_arguments(batch_parser)
+
+    serve_parser = subparsers.add_parser(
+        "serve", help="Daemon con API HTTP local y cola persistente de trabajos"
+    )
+    DaemonController.add_arguments(serve_parser)
+
+    coordinate_parser = subparsers.add_parser(
+        "coordinate", help="Repartir las pistas de listas de URLs en una cola compartida entre workers"
+    )
+    CoordinatorController.add_arguments(coordinate_parser)
+
+    work_parser = subparsers.add_parser(
+        "work", help="Worker que convierte pistas de una cola compartida (varios procesos o máquinas)"
+    )
+    WorkerController.add_arguments(work_parser)
+
+    dedupe_parser = subparsers.add_parser(
+        "dedupe", help="Detectar (y borrar) canciones repetidas en la biblioteca por huella acústica"
+    )
+    DedupeController.add_arguments(dedupe_parser)
+
+    loudness_parser = subparsers.add_parser(
+        "loudness", help="Medir la sonoridad (EBU R128) y etiquetar ReplayGain en archivos ya convertidos"
+    )
+    LoudnessController.add_arguments(loudness_parser)
+
+    return parser
+
+
+def run_command(argv):
+    """Ejecuta un subcomando headless y devuelve el código de salida"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.command == "batch":
+        from controller.batch_controller import BatchController
+        return BatchController.from_args(args).run(args.sources)
+    if args.command == "serve":
+        from controller.daemon_controller import DaemonController
+        return DaemonController.from_args(args).run()
+    if args.command == "coordinate":
+        from controller.distributed_controller import CoordinatorController
+        return CoordinatorController.from_args(args).run(args.sources)
+    if args.command == "work":
+        from controller.distributed_controller import WorkerController
+        return WorkerController.from_args(args).run()
+    if args.command == "dedupe":
+        from controller.dedupe_controller import DedupeController
+        return DedupeController.from_args(args).run()
+    if args.command == "loudness":
+        from controller.loudness_controller import LoudnessController
+        return LoudnessController.from_args(args).run(args.paths)
+
+    parser.print_help()
+    return 2
+
+
+def main(argv=None):
     """Función principal que ejecuta la aplicación"""
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv:
+        return run_command(argv)
+
+    from model.logging_config import configure_logging
+    configure_logging(asynchronous=False)
+
     print(f"\n🎵 Iniciando Ekho Music Converter...")
     print(f"\n⚙️  Configurando terminal...")
 
@@ -39,6 +123,7 @@ def main():
         print("   Windows: winget install Gyan.FFmpeg")
         print("   Linux: sudo apt install ffmpeg")
         print("   macOS: brew install ffmpeg")
+        return 1
         
     except KeyboardInterrupt:
         print("\n\n👋 Programa interrumpido por el usuario. ¡Hasta luego!")
@@ -53,7 +138,10 @@ def main():
         print("1. Verificar que todas las dependencias estén correctamente instaladas")
         print("2. Ejecutar el instalador de dependencias: python install_dependencies.py")
         print("3. Verificar que FFmpeg esté disponible en el PATH del sistema")
+        return 1
+
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
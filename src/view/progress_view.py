@@ -0,0 +1,197 @@
+# progress_view.py
+"""Vistas de terminal que se alimentan del bus de eventos de progreso"""
+
+import sys
+import time
+import threading
+from collections import deque
+
+from model.progress_events import (BatchStarted, DownloadProgress, StageFinished, StageStarted,
+                                   TrackFinished, TranscodeProgress, get_event_bus)
+
+# Etiquetas de las etapas de conversión
+STAGE_LABELS = {
+    'metadata': "🔍 Metadatos",
+    'search': "🔍 Búsqueda",
+    'download': "⬇️ Descarga",
+    'transcode': "🔄 Conversión",
+    'fingerprint': "🧬 Huella",
+    'tag': "🏷️ Etiquetas",
+    'finalize': "📁 Guardando",
+}
+# Segundos entre redibujados de la línea de progreso
+REFRESH_SECONDS = 0.5
+# Ventana para calcular el ritmo de pistas por segundo
+RATE_WINDOW_SECONDS = 60
+
+
+def _format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size:.0f} B"
+        size /= 1024
+
+
+def _format_duration(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+class _ProgressLine:
+    """Base: suscripción al bus y una única línea redibujada con \\r"""
+
+    EVENT_TYPES = ()
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stderr
+        self._lock = threading.Lock()
+        self._unsubscribe = None
+        self._last_render = 0.0
+        self._width = 0
+
+    def attach(self):
+        self._unsubscribe = get_event_bus().subscribe(self.on_event, self.EVENT_TYPES)
+        return self
+
+    def detach(self):
+        if self._unsubscribe:
+            self._unsubscribe()
+            self._unsubscribe = None
+        with self._lock:
+            self._render(force=True)
+            if self._width:
+                self.stream.write("\n")
+                self.stream.flush()
+                self._width = 0
+
+    def __enter__(self):
+        return self.attach()
+
+    def __exit__(self, *exc):
+        self.detach()
+
+    def on_event(self, event):
+        with self._lock:
+            self.update(event)
+            self._render()
+
+    def update(self, event):
+        raise NotImplementedError
+
+    def line(self):
+        raise NotImplementedError
+
+    def _render(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_render < REFRESH_SECONDS:
+            return
+        text = self.line()
+        if not text:
+            return
+        self._last_render = now
+        # Rellenar con espacios para borrar lo que quede de una línea anterior más larga
+        self.stream.write("\r" + text.ljust(self._width))
+        self.stream.flush()
+        self._width = len(text)
+
+
+class TrackProgressView(_ProgressLine):
+    """Porcentaje descargado/convertido y velocidad de una conversión suelta.
+
+    Solo dibuja mientras hay progreso medible (descarga, conversión) y termina la línea al
+    acabar la etapa, para no mezclarse con los mensajes del resto de etapas.
+    """
+
+    EVENT_TYPES = (StageStarted, StageFinished, DownloadProgress, TranscodeProgress)
+
+    def __init__(self, stream=None):
+        super().__init__(stream)
+        self.stage = None
+        self.detail = ""
+
+    def update(self, event):
+        if isinstance(event, StageStarted):
+            self.stage, self.detail = event.stage, ""
+        elif isinstance(event, StageFinished):
+            if self.detail:
+                self._render(force=True)
+            if self._width:
+                self.stream.write("\n")
+                self.stream.flush()
+                self._width = 0
+            self.detail = ""
+        elif isinstance(event, DownloadProgress):
+            if event.total:
+                self.detail = f"{100 * event.downloaded / event.total:5.1f}% de {_format_bytes(event.total)}"
+            else:
+                self.detail = _format_bytes(event.downloaded)
+            if event.speed:
+                self.detail += f"  {_format_bytes(event.speed)}/s"
+        elif isinstance(event, TranscodeProgress):
+            self.detail = f"{event.percent:5.1f}%"
+
+    def line(self):
+        if not self.detail:
+            return ""
+        return f"{STAGE_LABELS.get(self.stage, self.stage or '')}  {self.detail}"
+
+
+class BatchProgressView(_ProgressLine):
+    """Pistas completadas y fallidas, ritmo, volumen descargado y ETA de un lote"""
+
+    EVENT_TYPES = (BatchStarted, TrackFinished, DownloadProgress, StageFinished)
+
+    def __init__(self, stream=None):
+        super().__init__(stream)
+        self.total = 0
+        self.ok = 0
+        self.failed = 0
+        self.started = time.monotonic()
+        self.finished_at = deque()
+        # Bytes: lo ya terminado más lo que llevan las descargas en curso
+        self.bytes_done = 0
+        self.in_flight = {}
+
+    def update(self, event):
+        if isinstance(event, BatchStarted):
+            self.total += event.total
+        elif isinstance(event, TrackFinished):
+            if event.ok:
+                self.ok += 1
+            else:
+                self.failed += 1
+            now = time.monotonic()
+            self.finished_at.append(now)
+            while self.finished_at and now - self.finished_at[0] > RATE_WINDOW_SECONDS:
+                self.finished_at.popleft()
+        elif isinstance(event, DownloadProgress):
+            self.in_flight[event.task] = event.downloaded
+        elif isinstance(event, StageFinished) and event.stage == 'download':
+            self.bytes_done += self.in_flight.pop(event.task, 0)
+
+    def rate(self):
+        """Pistas por segundo en la ventana reciente (o desde el inicio si es más corta)"""
+        if not self.finished_at:
+            return 0.0
+        window = min(RATE_WINDOW_SECONDS, time.monotonic() - self.started)
+        return len(self.finished_at) / max(window, 1.0)
+
+    def line(self):
+        done = self.ok + self.failed
+        elapsed = time.monotonic() - self.started
+        downloaded = self.bytes_done + sum(self.in_flight.values())
+        text = f"🎵 {done}/{self.total}  ✅ {self.ok}  ❌ {self.failed}"
+        rate = self.rate()
+        if rate:
+            text += f"  🚀 {rate:.2f} pistas/s"
+        if downloaded:
+            text += f"  ⬇️ {_format_bytes(downloaded / max(elapsed, 1e-3))}/s"
+        remaining = self.total - done
+        if rate and remaining > 0:
+            text += f"  ⏳ ETA {_format_duration(remaining / rate)}"
+        text += f"  ⏱️ {_format_duration(elapsed)}"
+        return text